@@ -1,35 +1,144 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 from io import BytesIO
 from datetime import datetime
 import json
 import os
 import time
 import traceback
+import gzip
+import hashlib
+import itertools
+import shutil
+import sqlite3
+import threading
+import uuid
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import NamedTuple
+from openpyxl import Workbook, load_workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font
+from pandas.io.parsers import TextParser
+from PIL import Image, ImageOps
 
 # PDF 관련 imports (선택사항)
 try:
     from reportlab.lib import colors
     from reportlab.lib.pagesizes import A4
-    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
+    from reportlab.platypus import SimpleDocTemplate, LongTable, TableStyle, Paragraph, Spacer, PageBreak, KeepTogether
+    from reportlab.platypus import Image as PDFImage
+    from reportlab.lib.pagesizes import landscape
     from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
     from reportlab.lib.units import inch
     from reportlab.pdfbase import pdfmetrics
     from reportlab.pdfbase.ttfonts import TTFont
+    from reportlab.pdfbase.cidfonts import UnicodeCIDFont
     from reportlab.lib.enums import TA_CENTER
     PDF_AVAILABLE = True
 except ImportError:
     PDF_AVAILABLE = False
 
+# 편집 영역 부분 재실행 (st.fragment 미지원 버전에서는 전체 다시 실행)
+fragment_decorator = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None)
+fragment = fragment_decorator or (lambda func: func)
+
+# 주기적으로 다시 그리는 영역 (미지원 버전에서는 다른 위젯을 조작해 다시 실행될 때만 갱신)
+def polling_fragment(interval):
+    return fragment_decorator(run_every=interval) if fragment_decorator else (lambda func: func)
+
+# 세션 파일 잠금 (POSIX는 fcntl, Windows는 msvcrt)
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+# 빠른 Excel 읽기 (선택사항)
+try:
+    from python_calamine import CalamineWorkbook
+    CALAMINE_AVAILABLE = True
+except ImportError:
+    CALAMINE_AVAILABLE = False
+
 st.set_page_config(layout="wide", page_title="근골격계 유해요인조사")
 
 # Excel 파일 저장 디렉토리 생성
 SAVE_DIR = "saved_sessions"
 BACKUP_DIR = "saved_sessions/backups"
+
+# 세션 저장소 백엔드 ("sqlite": 행 단위 저장, "excel": 세션별 .xlsx 파일)
+STORAGE_BACKEND = os.environ.get("WMSD_STORAGE_BACKEND", "sqlite")
+SQLITE_PATH = os.path.join(SAVE_DIR, "sessions.db")
+
+# 백업 저장소 (내용 해시로 중복 제거, 보존 정책에 따라 정리)
+BACKUP_OBJECTS_DIR = os.path.join(BACKUP_DIR, "objects")
+BACKUP_INDEX_PATH = os.path.join(BACKUP_DIR, "index.json")
+BACKUP_KEEP_LAST = 10      # 최근 스냅샷 보존 개수
+BACKUP_KEEP_HOURLY = 24    # 시간별 최신 스냅샷 보존 시간 수
+BACKUP_KEEP_DAILY = 7      # 일별 최신 스냅샷 보존 일 수
+BACKUP_COMPRESS = False    # xlsx는 이미 압축 형식이므로 기본값은 비압축
+BACKUP_MIN_INTERVAL = 600  # SQLite 저장소의 스냅샷 최소 간격(초)
+
+# Excel 세션 파일 카탈로그 (파일명 → session_id, workplace, saved_at, size, mtime)
+CATALOG_PATH = os.path.join(SAVE_DIR, "catalog.json")
+
+# 세션별 잠금 파일 (여러 브라우저 세션이 같은 세션을 동시에 저장할 때 직렬화)
+LOCK_DIR = os.path.join(SAVE_DIR, "locks")
+LOCK_TIMEOUT = 10  # 잠금 대기 최대 시간(초)
+
+# 사진 저장소 (내용 해시로 원본 1회 저장, 화면에는 축소 이미지만 사용)
+PHOTO_DIR = os.path.join(SAVE_DIR, "photos")
+PHOTO_OBJECTS_DIR = os.path.join(PHOTO_DIR, "objects")
+PHOTO_THUMBS_DIR = os.path.join(PHOTO_DIR, "thumbs")
+PHOTO_REPORT_DIR = os.path.join(PHOTO_DIR, "report")
+PHOTO_RENDITIONS = {
+    # 용도: (디렉토리, 최대 크기, JPEG 품질)
+    "thumb": (PHOTO_THUMBS_DIR, (480, 480), 80),
+    "report": (PHOTO_REPORT_DIR, (1600, 1600), 88),
+}
+PHOTO_CACHE_ENTRIES = 256  # 화면용 축소 이미지 메모리 캐시 항목 수
+PHOTO_MAX_PER_반 = 10
+
+# 작업현장 캐시 (최근 사용한 작업현장의 파싱된 세션을 모든 브라우저 세션이 공유, 초과 시 오래된 것부터 제거)
+WORKSPACE_CACHE_SIZE = 8
+
+# 보고서 산출물 캐시 (session_id + 데이터 지문별 파일, 백그라운드 작업으로 생성)
+REPORT_DIR = os.path.join(SAVE_DIR, "reports")
+REPORT_WORKERS = 2
+REPORT_CACHE_MAX_FILES = 50  # 보관할 산출물 수 (초과 시 오래 사용하지 않은 것부터 삭제)
+REPORT_JOB_TTL = 3600        # 마지막 조회 후 이 시간(초) 동안은 작업과 산출물을 유지
+REPORT_POLL_INTERVAL = 0.5  # 생성 중인 보고서 진행률 갱신 간격(초)
+
+# PDF 보고서 한글 글꼴 (앞에서부터 처음 발견된 TTF 사용, 없으면 reportlab 내장 CID 글꼴)
+PDF_FONT_CANDIDATES = [
+    os.environ.get("WMSD_PDF_FONT", ""),
+    "fonts/NanumGothic.ttf",
+    "/usr/share/fonts/truetype/nanum/NanumGothic.ttf",
+    "C:/Windows/Fonts/malgun.ttf",
+    "/Library/Fonts/AppleGothic.ttf",
+    "/System/Library/Fonts/Supplemental/AppleGothic.ttf",
+]
+PDF_FALLBACK_FONT = "HYSMyeongJo-Medium"
+PDF_TABLE_CHUNK_ROWS = 500  # LongTable 하나에 담을 최대 행 수 (메모리 상한)
+
 if not os.path.exists(SAVE_DIR):
     os.makedirs(SAVE_DIR)
 if not os.path.exists(BACKUP_DIR):
     os.makedirs(BACKUP_DIR)
+if not os.path.exists(BACKUP_OBJECTS_DIR):
+    os.makedirs(BACKUP_OBJECTS_DIR)
+if not os.path.exists(REPORT_DIR):
+    os.makedirs(REPORT_DIR)
+if not os.path.exists(LOCK_DIR):
+    os.makedirs(LOCK_DIR)
+for photo_dir in [PHOTO_OBJECTS_DIR, PHOTO_THUMBS_DIR, PHOTO_REPORT_DIR]:
+    if not os.path.exists(photo_dir):
+        os.makedirs(photo_dir)
 
 # 데이터 무결성 검증 함수
 def validate_dataframe(df):
@@ -40,314 +149,2646 @@ def validate_dataframe(df):
         return False
     return True
 
-# 안전한 데이터 저장 함수
-def safe_save_to_excel(session_id, workplace=None):
-    """데이터를 안전하게 Excel 파일로 저장 (백업 포함)"""
+# 임시 파일 경로 생성 함수
+def make_temp_path(path, suffix=".tmp"):
+    """프로세스/스레드 간에 겹치지 않는 임시 파일 경로 (같은 디렉토리에 만들어 os.replace로 교체)"""
+    return f"{path}.{os.getpid()}.{uuid.uuid4().hex[:8]}{suffix}"
+
+# 세션 잠금 함수
+@contextmanager
+def session_lock(name, timeout=LOCK_TIMEOUT):
+    """이름별 배타적 advisory 잠금 (timeout 안에 얻지 못하면 TimeoutError)
+
+    잠금 파일마다 따로 열어 잠그므로 같은 프로세스의 다른 스레드(브라우저 세션)끼리도 직렬화된다.
+    """
+    lock_path = os.path.join(LOCK_DIR, hashlib.sha1(str(name).encode("utf-8")).hexdigest()[:16] + ".lock")
+    deadline = time.monotonic() + timeout
+    with open(lock_path, "a+b") as handle:
+        while True:
+            try:
+                if fcntl is not None:
+                    fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                else:
+                    handle.seek(0)
+                    msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+                break
+            except OSError:
+                if time.monotonic() >= deadline:
+                    raise TimeoutError(f"다른 사용자가 저장 중입니다. 잠시 후 다시 시도해주세요. ({name})")
+                time.sleep(0.05)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+            else:
+                handle.seek(0)
+                msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+
+# 저장 충돌 예외 (불러온 뒤 다른 사용자가 같은 세션을 먼저 저장한 경우)
+class SessionConflictError(ValueError):
+    pass
+
+# JSON 파일 읽기 함수
+def read_json_file(path):
+    """JSON 딕셔너리 파일 읽기 (없거나 손상된 경우 빈 딕셔너리)"""
     try:
-        # 임시 파일명
-        temp_filename = os.path.join(SAVE_DIR, f"{session_id}_temp.xlsx")
-        final_filename = os.path.join(SAVE_DIR, f"{session_id}.xlsx")
-        backup_filename = os.path.join(BACKUP_DIR, f"{session_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx")
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            return data
+    except (OSError, ValueError):
+        pass
+    return {}
+
+# JSON 파일 쓰기 함수
+def write_json_file(path, data):
+    """임시 파일에 쓴 뒤 교체하여 JSON 파일 기록"""
+    temp_path = make_temp_path(path)
+    try:
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(temp_path, path)
+    except OSError:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+# 반별 데이터 저장소 (같은 이름의 반이 다른 회사/소속에 있어도 섞이지 않도록 (회사명, 소속, 반) 전체 경로로 구분)
+상황조사_항목 = ["작업설비", "작업량", "작업속도", "업무변화"]
+상황조사_세부_필드 = {"감소": "감소_시작", "증가": "증가_시작", "기타": "기타_내용"}
+조사표_필드 = ["조사일시", "부서명", "조사자", "작업공정명", "작업명"]
+평가_필드 = ["1단계_작업공정", "1단계_작업내용", "3단계_작업명", "3단계_근로자수"]
+# 반별 입력란 전체 (조사표 개요, 1·3단계 입력, 상황조사 상태/세부사항, 사진 개수/설명)
+반_입력_필드 = (
+    조사표_필드 + 평가_필드 + [f"{항목}_상태" for 항목 in 상황조사_항목]
+    + [f"{항목}_{세부_필드}" for 항목 in 상황조사_항목 for 세부_필드 in 상황조사_세부_필드.values()]
+    + ["사진개수"] + [f"사진_{순번}_설명" for 순번 in range(1, PHOTO_MAX_PER_반 + 1)]
+)
+반_시트_접두사_길이 = len("작업조건_")
+
+class 반경로(NamedTuple):
+    회사명: str
+    소속: str
+    반: str
+    
+    @property
+    def key(self):
+        """위젯/세션 키 접미사 (화면 확인용 반 이름 + 전체 경로 해시)"""
+        digest = hashlib.sha1("\x1f".join(self).encode("utf-8")).hexdigest()[:8]
+        return f"{self.반}@{digest}"
+
+@dataclass
+class 반기록:
+    """반 하나의 편집 표/목록 데이터 (입력란 값은 Streamlit 위젯이 소유하므로 반_키로 만든 세션 키에 둠)"""
+    __slots__ = ("작업조건", "원인분석", "사진")
+    작업조건: object  # 2단계 작업부하/작업빈도 DataFrame (입력 전이면 None)
+    원인분석: object  # 원인분석 항목 목록 (화면에서 초기화하기 전이면 None)
+    사진: dict        # 순번 → 사진 참조
+    
+    def copy(self):
+        return 반기록(
+            None if self.작업조건 is None else self.작업조건.copy(),
+            None if self.원인분석 is None else [dict(entry) for entry in self.원인분석],
+            dict(self.사진)
+        )
+
+def 반_키(필드, 경로):
+    """반별 입력란의 위젯/세션 키"""
+    return f"{필드}_{경로.key}"
+
+def is_반_키(key):
+    """반_키로 만든 키인지 (끝이 '@' + 경로 해시 8자리)"""
+    return isinstance(key, str) and len(key) > 9 and key[-9] == "@" and all(c in "0123456789abcdef" for c in key[-8:])
+
+def make_반경로(회사명, 소속, 반):
+    return 반경로(*("" if pd.isna(v) else str(v) for v in (회사명, 소속, 반)))
+
+def checklist_반경로_목록(checklist_df):
+    """체크리스트의 (회사명, 소속, 반) 경로 목록 (입력 순서 유지)"""
+    if not validate_dataframe(checklist_df) or checklist_df.empty or "반" not in checklist_df.columns:
+        return []
+    paths = checklist_df.reindex(columns=["회사명", "소속", "반"]).dropna(subset=["반"]).drop_duplicates()
+    return list(dict.fromkeys(make_반경로(*row) for row in paths.itertuples(index=False, name=None)))
+
+def get_반경로_목록(state):
+    return checklist_반경로_목록(state.get("checklist_df"))
+
+def get_반기록(state, 경로):
+    """반 기록 조회 (없으면 빈 기록을 저장소에 추가)"""
+    저장소 = state.setdefault("반_기록", {})
+    기록 = 저장소.get(경로)
+    if 기록 is None:
+        기록 = 저장소[경로] = 반기록(None, None, {})
+    return 기록
+
+def find_반기록(state, 경로):
+    """읽기 전용 조회 (보고서 사본 등 저장소를 바꾸면 안 되는 경우, 없으면 None)"""
+    return (state.get("반_기록") or {}).get(경로)
+
+def 상황조사_세부사항(state, 항목, 경로):
+    """작업장 상황조사 (상태, 선택한 상태의 세부사항)"""
+    상태 = state.get(반_키(f"{항목}_상태", 경로), "변화없음")
+    세부_필드 = 상황조사_세부_필드.get(상태)
+    return 상태, state.get(반_키(f"{항목}_{세부_필드}", 경로), "") if 세부_필드 else ""
+
+def read_반_입력값(state, 경로):
+    """반별 입력란 값 {필드: 값} (조사표 개요, 상황조사 상태/세부사항, 1·3단계 입력)"""
+    values = {필드: state.get(반_키(필드, 경로), "") for 필드 in 조사표_필드}
+    for 항목 in 상황조사_항목:
+        values[f"{항목}_상태"], values[f"{항목}_세부사항"] = 상황조사_세부사항(state, 항목, 경로)
+    values.update({필드: state.get(반_키(필드, 경로), "") for 필드 in 평가_필드})
+    return values
+
+def 반_입력값_to_state(경로, values):
+    """read_반_입력값 형식의 값을 위젯 키로 변환 (세부사항은 저장된 상태의 입력란으로 복원)"""
+    restored = {}
+    for 필드 in 조사표_필드 + 평가_필드:
+        value = values.get(필드)
+        if value is not None and pd.notna(value):
+            restored[반_키(필드, 경로)] = str(value) if value else ""
+    for 항목 in 상황조사_항목:
+        상태 = values.get(f"{항목}_상태")
+        if 상태 not in ["변화없음", "감소", "증가", "기타"]:
+            continue
+        restored[반_키(f"{항목}_상태", 경로)] = 상태
+        세부사항 = values.get(f"{항목}_세부사항")
+        if 상태 in 상황조사_세부_필드 and 세부사항 is not None and pd.notna(세부사항):
+            restored[반_키(f"{항목}_{상황조사_세부_필드[상태]}", 경로)] = str(세부사항)
+    return restored
+
+def assign_반_시트명(경로_목록):
+    """경로별 시트명 접미사 ('작업조건_' 등 접두사를 붙여도 31자 안에서 겹치지 않게)"""
+    used = set()
+    return {경로: make_sheet_name(경로.반, used, 31 - 반_시트_접두사_길이) for 경로 in 경로_목록}
+
+def resolve_반_시트(sheets, checklist_df):
+    """시트명 접미사 → 경로 목록 ('반목록' 시트가 없던 이전 파일은 이름이 같은 반 모두에 적용)"""
+    if '반목록' in sheets:
+        df = sheets['반목록'][0][1].reindex(columns=["시트", "회사명", "소속", "반"])
+        return {
+            str(시트): [make_반경로(회사명, 소속, 반)]
+            for 시트, 회사명, 소속, 반 in df.itertuples(index=False, name=None) if pd.notna(시트)
+        }
+    mapping = {}
+    for 경로 in checklist_반경로_목록(checklist_df):
+        mapping.setdefault(경로.반.replace('/', '_').replace('\\', '_')[:31], []).append(경로)
+    return mapping
+
+# 세션 상태를 시트 단위로 구성하는 함수
+def build_session_sheets():
+    """세션 상태를 {시트명: [(시작행, DataFrame), ...]} 형태로 구성 (메타데이터 제외)"""
+    sheets = {}
+    
+    # 체크리스트
+    if "checklist_df" in st.session_state and validate_dataframe(st.session_state.get("checklist_df")):
+        if not st.session_state["checklist_df"].empty:
+            sheets['체크리스트'] = [(0, st.session_state["checklist_df"])]
+    
+    # 각 반별 데이터 (시트명 접미사와 경로의 대응은 '반목록' 시트에 기록)
+    반_시트명 = assign_반_시트명(get_반경로_목록(st.session_state))
+    for 경로, 시트 in 반_시트명.items():
+        sheets[f'조사표_{시트}'] = [(0, pd.DataFrame([read_반_입력값(st.session_state, 경로)]))]
         
-        # 기존 파일이 있으면 백업
-        if os.path.exists(final_filename):
+        기록 = find_반기록(st.session_state, 경로)
+        if 기록 is None:
+            continue
+        if validate_dataframe(기록.작업조건):
+            sheets[f'작업조건_{시트}'] = [(0, 기록.작업조건)]
+        if 기록.원인분석:
+            sheets[f'원인분석_{시트}'] = [(0, pd.DataFrame(기록.원인분석))]
+    if 반_시트명:
+        sheets['반목록'] = [(0, pd.DataFrame(
+            [[시트, *경로] for 경로, 시트 in 반_시트명.items()], columns=["시트", "회사명", "소속", "반"]
+        ))]
+    
+    # 정밀조사 데이터 (개요 1행 + 4행부터 원인분석 표)
+    if "정밀조사_목록" in st.session_state:
+        for 조사명 in st.session_state["정밀조사_목록"]:
+            safe_조사명 = str(조사명).replace('/', '_').replace('\\', '_')[:31]
+            정밀_data = {
+                "작업공정명": st.session_state.get(f"정밀_작업공정명_{조사명}", ""),
+                "작업명": st.session_state.get(f"정밀_작업명_{조사명}", "")
+            }
+            
+            원인분석_key = f"정밀_원인분석_data_{조사명}"
+            if 원인분석_key in st.session_state and validate_dataframe(st.session_state.get(원인분석_key)):
+                sheets[f'정밀_{safe_조사명}'] = [
+                    (0, pd.DataFrame([정밀_data])),
+                    (3, st.session_state[원인분석_key])
+                ]
+    
+    # 사진 (파일은 사진 저장소에 두고 시트에는 참조와 설명만 저장)
+    사진_df = build_photo_table(st.session_state)
+    if not 사진_df.empty:
+        sheets['사진'] = [(0, 사진_df)]
+    
+    # 증상조사 분석 데이터
+    증상조사_시트 = {
+        "기초현황": "기초현황_data_저장",
+        "작업기간": "작업기간_data_저장",
+        "육체적부담": "육체적부담_data_저장",
+        "통증호소자": "통증호소자_data_저장"
+    }
+    
+    for 시트명, 키 in 증상조사_시트.items():
+        if 키 in st.session_state and validate_dataframe(st.session_state.get(키)):
+            if not st.session_state[키].empty:
+                sheets[f'증상_{시트명}'] = [(0, st.session_state[키])]
+    
+    # 작업환경개선계획서
+    if "개선계획_data_저장" in st.session_state and validate_dataframe(st.session_state.get("개선계획_data_저장")):
+        if not st.session_state["개선계획_data_저장"].empty:
+            sheets['개선계획서'] = [(0, st.session_state["개선계획_data_저장"])]
+    
+    return sheets
+
+# 메타데이터 구성 함수
+def build_session_metadata(session_id, workplace=None):
+    """메타데이터 딕셔너리 구성 (saved_at은 저장 시점에 채움)"""
+    return {
+        "session_id": session_id,
+        "workplace": workplace or st.session_state.get("workplace", ""),
+        "saved_at": "",
+        "사업장명": st.session_state.get("사업장명", ""),
+        "소재지": st.session_state.get("소재지", ""),
+        "업종": st.session_state.get("업종", ""),
+        "예비조사": str(st.session_state.get("예비조사", "")),
+        "본조사": str(st.session_state.get("본조사", "")),
+        "수행기관": st.session_state.get("수행기관", ""),
+        "성명": st.session_state.get("성명", "")
+    }
+
+# 시트 지문(fingerprint) 계산 함수
+def fingerprint_sheet(parts):
+    """시트를 구성하는 DataFrame들의 내용 해시 계산"""
+    hasher = hashlib.sha1()
+    for startrow, df in parts:
+        hasher.update(str(startrow).encode("utf-8"))
+        hasher.update(repr(list(df.columns)).encode("utf-8"))
+        try:
+            hasher.update(pd.util.hash_pandas_object(df, index=True).values.tobytes())
+        except TypeError:
+            # 리스트 등 해시 불가능한 값이 있으면 문자열로 대체
+            hasher.update(df.to_json(force_ascii=False).encode("utf-8"))
+    return hasher.hexdigest()
+
+# 시트 쓰기 함수
+def write_sheet(writer, sheet_name, parts):
+    for startrow, df in parts:
+        df.to_excel(writer, sheet_name=sheet_name, startrow=startrow, index=False)
+
+# 세션 전체를 Excel 통합문서로 쓰는 함수
+def write_session_workbook(target, metadata, sheets):
+    """메타데이터와 시트들을 Excel로 기록 (target은 파일 경로 또는 BytesIO)"""
+    with pd.ExcelWriter(target, engine='openpyxl') as writer:
+        pd.DataFrame([metadata]).to_excel(writer, sheet_name='메타데이터', index=False)
+        for name, parts in sheets.items():
+            write_sheet(writer, name, parts)
+
+# 백업 블롭 경로
+def get_backup_blob_path(digest, compressed):
+    return os.path.join(BACKUP_OBJECTS_DIR, f"{digest}.xlsx.gz" if compressed else f"{digest}.xlsx")
+
+# 백업 보존 정책 적용
+def apply_backup_retention(snapshots):
+    """최근 N개 + 시간별/일별 최신 스냅샷만 남기기 (오래된 순 정렬 유지)"""
+    newest_first = sorted(snapshots, key=lambda s: s["created_at"], reverse=True)
+    keep = set(range(min(BACKUP_KEEP_LAST, len(newest_first))))
+    
+    for bucket_length, limit in [(13, BACKUP_KEEP_HOURLY), (10, BACKUP_KEEP_DAILY)]:
+        # created_at 앞부분("YYYY-MM-DD HH" / "YYYY-MM-DD")으로 시간/일 단위 구분
+        buckets = []
+        for idx, snapshot in enumerate(newest_first):
+            bucket = snapshot["created_at"][:bucket_length]
+            if bucket not in buckets:
+                buckets.append(bucket)
+                if len(buckets) > limit:
+                    break
+                keep.add(idx)
+    
+    return sorted((newest_first[idx] for idx in keep), key=lambda s: s["created_at"])
+
+# 참조되지 않는 백업 블롭 삭제
+def collect_backup_garbage(index):
+    referenced = set()
+    for snapshots in index.values():
+        for snapshot in snapshots:
+            referenced.add(os.path.basename(get_backup_blob_path(snapshot["hash"], snapshot.get("compressed", False))))
+    for filename in os.listdir(BACKUP_OBJECTS_DIR):
+        if filename not in referenced and not filename.endswith('.tmp'):
             try:
-                import shutil
-                shutil.copy2(final_filename, backup_filename)
-            except:
+                os.remove(os.path.join(BACKUP_OBJECTS_DIR, filename))
+            except OSError:
                 pass
+
+# 예전 방식 백업 옮기기 ("<session_id>_YYYYmmdd_HHMMSS.xlsx" 사본, 프로세스당 한 번)
+@st.cache_resource
+def migrate_legacy_backups():
+    """BACKUP_DIR의 타임스탬프 사본을 색인에 스냅샷으로 등록한 뒤 보존 정책을 적용하고 원본 삭제
+    
+    옮긴 파일 수 반환. 이름 형식이 맞지 않는 파일은 건드리지 않는다.
+    """
+    if not os.path.isdir(BACKUP_DIR):
+        return 0
+    legacy = []
+    for entry in os.scandir(BACKUP_DIR):
+        if not entry.is_file() or not entry.name.endswith('.xlsx'):
+            continue
+        session_id, _, stamp = entry.name[:-len('.xlsx')].rpartition('_')
+        session_id, _, day = session_id.rpartition('_')
+        try:
+            created_at = datetime.strptime(f"{day}_{stamp}", "%Y%m%d_%H%M%S")
+        except ValueError:
+            continue
+        if session_id:
+            legacy.append((entry.path, session_id, created_at.strftime("%Y-%m-%d %H:%M:%S")))
+    if not legacy:
+        return 0
+    
+    with session_lock(BACKUP_INDEX_PATH):
+        index = read_json_file(BACKUP_INDEX_PATH)
+        for path, session_id, created_at in legacy:
+            with open(path, 'rb') as f:
+                data = f.read()
+            digest = hashlib.sha256(data).hexdigest()
+            snapshots = index.setdefault(session_id, [])
+            if not any(s["hash"] == digest and s["created_at"] == created_at for s in snapshots):
+                blob_path = get_backup_blob_path(digest, False)
+                if not os.path.exists(blob_path):
+                    temp_path = make_temp_path(blob_path)
+                    with open(temp_path, 'wb') as f:
+                        f.write(data)
+                    os.replace(temp_path, blob_path)
+                snapshots.append({"hash": digest, "created_at": created_at, "size": len(data), "compressed": False})
+        for session_id in {session_id for _, session_id, _ in legacy}:
+            index[session_id] = apply_backup_retention(index[session_id])
+        write_json_file(BACKUP_INDEX_PATH, index)
+        collect_backup_garbage(index)
+        # 색인에 기록한 뒤에 원본 삭제 (중간에 실패해도 다음 실행에서 다시 옮김)
+        for path, _, _ in legacy:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+    return len(legacy)
+
+# 백업 생성 함수
+def create_backup(session_id, data):
+    """세션 파일 내용(bytes)을 내용 해시 기준으로 백업 (직전 백업과 같으면 생략)"""
+    digest = hashlib.sha256(data).hexdigest()
+    migrate_legacy_backups()
+    
+    # 백업 색인은 모든 세션이 공유하므로 읽기-수정-쓰기를 잠금 안에서 수행
+    with session_lock(BACKUP_INDEX_PATH):
+        index = read_json_file(BACKUP_INDEX_PATH)
+        snapshots = index.get(session_id, [])
+        if snapshots and snapshots[-1]["hash"] == digest:
+            return False
         
-        # 임시 파일에 먼저 저장
-        with pd.ExcelWriter(temp_filename, engine='openpyxl') as writer:
-            # 메타데이터 저장
-            metadata = {
-                "session_id": session_id,
-                "workplace": workplace or st.session_state.get("workplace", ""),
-                "saved_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                "사업장명": st.session_state.get("사업장명", ""),
-                "소재지": st.session_state.get("소재지", ""),
-                "업종": st.session_state.get("업종", ""),
-                "예비조사": str(st.session_state.get("예비조사", "")),
-                "본조사": str(st.session_state.get("본조사", "")),
-                "수행기관": st.session_state.get("수행기관", ""),
-                "성명": st.session_state.get("성명", "")
-            }
+        # 같은 내용의 블롭이 이미 있으면 재사용
+        blob_path = get_backup_blob_path(digest, BACKUP_COMPRESS)
+        if not os.path.exists(blob_path):
+            temp_path = make_temp_path(blob_path)
+            with open(temp_path, 'wb') as f:
+                f.write(gzip.compress(data) if BACKUP_COMPRESS else data)
+            os.replace(temp_path, blob_path)
+        
+        snapshots.append({
+            "hash": digest,
+            "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "size": len(data),
+            "compressed": BACKUP_COMPRESS
+        })
+        index[session_id] = apply_backup_retention(snapshots)
+        write_json_file(BACKUP_INDEX_PATH, index)
+        collect_backup_garbage(index)
+    return True
+
+# 백업 목록 함수
+def list_backups(session_id):
+    """세션의 백업 스냅샷 목록 (최신순)"""
+    migrate_legacy_backups()
+    snapshots = read_json_file(BACKUP_INDEX_PATH).get(session_id, [])
+    return sorted(snapshots, key=lambda s: s["created_at"], reverse=True)
+
+# 백업 복원 함수
+def restore_backup(session_id, digest):
+    """선택한 스냅샷을 safe_load_from_excel로 불러오기"""
+    snapshot = next((s for s in list_backups(session_id) if s["hash"] == digest), None)
+    if snapshot is None:
+        return False, "백업이 존재하지 않습니다."
+    
+    blob_path = get_backup_blob_path(digest, snapshot.get("compressed", False))
+    if not snapshot.get("compressed", False):
+        return safe_load_from_excel(blob_path)
+    
+    # 압축된 백업은 임시 파일로 풀어서 불러오기
+    temp_path = make_temp_path(os.path.join(BACKUP_DIR, f"restore_{digest[:12]}"), ".tmp.xlsx")
+    try:
+        with gzip.open(blob_path, 'rb') as src, open(temp_path, 'wb') as dst:
+            shutil.copyfileobj(src, dst)
+        return safe_load_from_excel(temp_path)
+    except OSError as e:
+        return False, f"백업 복원 중 오류 발생: {str(e)}"
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+# 사진 원본/축소 이미지 경로 (참조는 "<sha256><확장자>" 형식)
+def get_photo_path(ref):
+    return os.path.join(PHOTO_OBJECTS_DIR, os.path.basename(ref))
+
+def get_photo_rendition_path(ref, rendition):
+    return os.path.join(PHOTO_RENDITIONS[rendition][0], os.path.splitext(os.path.basename(ref))[0] + ".jpg")
+
+def decode_photo(source, max_size=None):
+    """사진을 디코딩하여 방향 보정 후 RGB로 변환 (JPEG는 필요한 크기까지만 디코딩)"""
+    with Image.open(source) as image:
+        if max_size is not None:
+            image.draft("RGB", max_size)
+        image = ImageOps.exif_transpose(image)
+        if image.mode in ("RGBA", "LA", "P"):
+            image = image.convert("RGBA")
+            background = Image.new("RGB", image.size, "white")
+            background.paste(image, mask=image.split()[-1])
+            image = background
+        return image.convert("RGB")
+
+def save_photo_rendition(image, ref, rendition):
+    """디코딩된 사진에서 용도별 축소본 저장"""
+    _, size, quality = PHOTO_RENDITIONS[rendition]
+    path = get_photo_rendition_path(ref, rendition)
+    rendered = image.copy()
+    rendered.thumbnail(size)
+    temp_path = make_temp_path(path)
+    rendered.save(temp_path, "JPEG", quality=quality, optimize=True)
+    os.replace(temp_path, path)
+    return path
+
+def ensure_photo_rendition(ref, rendition):
+    """용도별 축소본 경로 반환 (없으면 원본에서 한 번 생성)"""
+    path = get_photo_rendition_path(ref, rendition)
+    if not os.path.exists(path):
+        save_photo_rendition(decode_photo(get_photo_path(ref), PHOTO_RENDITIONS[rendition][1]), ref, rendition)
+    return path
+
+@st.cache_data(max_entries=PHOTO_CACHE_ENTRIES, show_spinner=False)
+def load_photo_rendition(ref, rendition="thumb"):
+    """화면 표시용 축소본 bytes (참조가 내용 해시이므로 LRU 캐시 무효화 불필요)"""
+    with open(ensure_photo_rendition(ref, rendition), "rb") as f:
+        return f.read()
+
+def show_photo(ref, caption):
+    """연결된 사진 표시 (다른 PC/백업에서 복원해 사진 파일이 없으면 자리 표시만 하고 참조는 유지)"""
+    if not (os.path.exists(get_photo_rendition_path(ref, "thumb")) or os.path.exists(get_photo_path(ref))):
+        st.warning(f"{caption}: 사진 파일 없음")
+        return
+    try:
+        st.image(load_photo_rendition(ref), caption=caption, use_column_width=True)
+    except (OSError, ValueError):
+        st.warning(f"{caption}: 사진 파일 없음")
+
+# 사진 저장 함수
+def store_photo(data, filename):
+    """업로드된 사진을 내용 해시로 저장하고 참조 반환 (한 번 디코딩해 모든 축소본 생성)"""
+    largest = max((size for _, size, _ in PHOTO_RENDITIONS.values()), key=lambda s: s[0] * s[1])
+    image = decode_photo(BytesIO(data), largest)
+    extension = os.path.splitext(filename)[1].lower() or ".jpg"
+    ref = hashlib.sha256(data).hexdigest() + extension
+    photo_path = get_photo_path(ref)
+    if not os.path.exists(photo_path):
+        temp_path = make_temp_path(photo_path)
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, photo_path)
+    for rendition in PHOTO_RENDITIONS:
+        if not os.path.exists(get_photo_rendition_path(ref, rendition)):
+            save_photo_rendition(image, ref, rendition)
+    return ref
+
+# 사진 목록 구성 함수
+PHOTO_TABLE_COLUMNS = ["구분", "회사명", "소속", "대상", "순번", "파일", "설명"]
+
+def iter_photo_records(state):
+    """세션에 연결된 사진 참조와 설명을 (구분, 회사명, 소속, 대상, 순번, 파일, 설명) 형태로 생성"""
+    for 경로 in get_반경로_목록(state):
+        기록 = find_반기록(state, 경로)
+        사진 = 기록.사진 if 기록 is not None else {}
+        for 순번 in range(1, PHOTO_MAX_PER_반 + 1):
+            ref = 사진.get(순번) or ""
+            설명 = state.get(반_키(f"사진_{순번}_설명", 경로)) or ""
+            if ref or 설명:
+                yield {"구분": "작업조건", "회사명": 경로.회사명, "소속": 경로.소속, "대상": 경로.반,
+                       "순번": 순번, "파일": ref, "설명": 설명}
+    for 조사명 in state.get("정밀조사_목록", []) or []:
+        for 순번, ref in enumerate(state.get(f"정밀_사진_목록_{조사명}", []) or [], start=1):
+            yield {"구분": "정밀조사", "회사명": "", "소속": "", "대상": str(조사명), "순번": 순번, "파일": ref, "설명": ""}
+
+def build_photo_table(state):
+    return pd.DataFrame(list(iter_photo_records(state)), columns=PHOTO_TABLE_COLUMNS)
+
+# 저장 버전 확인 함수 (낙관적 동시성 제어)
+def check_session_version(session_id, stored_version, overwrite=False):
+    """저장소의 버전이 이 브라우저 세션이 기준으로 삼은 버전보다 새로우면 SessionConflictError"""
+    base_version = st.session_state.get("session_version", 0)
+    if stored_version > base_version and not overwrite:
+        st.session_state["save_conflict"] = stored_version
+        raise SessionConflictError(
+            f"다른 사용자가 이 세션을 먼저 저장했습니다 (저장소 버전 {stored_version}, 현재 화면 버전 {base_version}). "
+            "세션을 다시 불러오거나 덮어쓰기 저장을 선택해주세요."
+        )
+
+# 저장 완료 후 버전 기록
+def record_session_version(version):
+    st.session_state["session_version"] = version
+    st.session_state["save_conflict"] = None
+
+# Excel 세션 파일 버전 읽기
+def read_excel_session_version(filename):
+    """카탈로그 항목이 파일과 일치하면 카탈로그의 버전, 아니면 메타데이터 시트의 버전 (없으면 0)"""
+    if not os.path.exists(filename):
+        return 0
+    stat = os.stat(filename)
+    entry = load_session_catalog().get(os.path.basename(filename))
+    if entry and entry.get("mtime") == stat.st_mtime and entry.get("size") == stat.st_size and "version" in entry:
+        return entry["version"]
+    metadata_df = pd.read_excel(filename, sheet_name='메타데이터')
+    if metadata_df.empty:
+        return 0
+    return parse_value(metadata_df.iloc[0].get("version", 0), int)
+
+# 안전한 데이터 저장 함수
+def safe_save_to_excel(session_id, workplace=None, force=False, overwrite=False):
+    """데이터를 안전하게 Excel 파일로 저장 (백업 포함)
+    
+    마지막 저장 이후 변경된 시트만 기존 파일에 다시 쓰고,
+    변경 사항이 없으면 저장을 생략한다. force=True면 전체를 다시 쓴다.
+    세션별 잠금 안에서 저장하며, 불러온 뒤 다른 사용자가 먼저 저장했으면
+    overwrite=True가 아닌 한 저장하지 않는다.
+    """
+    # 임시 파일명 (같은 세션을 동시에 저장하는 다른 브라우저 세션과 겹치지 않는 이름)
+    temp_filename = make_temp_path(os.path.join(SAVE_DIR, session_id), ".tmp.xlsx")
+    final_filename = os.path.join(SAVE_DIR, f"{session_id}.xlsx")
+    
+    try:
+        with session_lock(session_id):
+            # 메타데이터 (saved_at, version은 지문에서 제외)
+            metadata = build_session_metadata(session_id, workplace)
+            sheets = build_session_sheets()
+            fingerprints = {name: fingerprint_sheet(parts) for name, parts in sheets.items()}
+            fingerprints['메타데이터'] = fingerprint_sheet([(0, pd.DataFrame([metadata]))])
             
-            metadata_df = pd.DataFrame([metadata])
-            metadata_df.to_excel(writer, sheet_name='메타데이터', index=False)
+            # 마지막 저장 기록이 현재 파일과 일치하는지 확인
+            previous = st.session_state.get("last_saved_fingerprints")
+            incremental = (
+                not force
+                and previous is not None
+                and previous.get("filename") == final_filename
+                and os.path.exists(final_filename)
+                and os.path.getmtime(final_filename) == previous.get("mtime")
+            )
             
-            # 체크리스트 저장
-            if "checklist_df" in st.session_state and validate_dataframe(st.session_state.get("checklist_df")):
-                if not st.session_state["checklist_df"].empty:
-                    st.session_state["checklist_df"].to_excel(writer, sheet_name='체크리스트', index=False)
+            if incremental:
+                dirty = [name for name, fp in fingerprints.items() if previous["sheets"].get(name) != fp]
+                removed = [name for name in previous["sheets"] if name not in fingerprints]
+                if not dirty and not removed:
+                    # 변경 사항 없음 - 저장 생략
+                    return True, final_filename
             
-            # 반 목록 가져오기
-            반_목록 = []
-            if "checklist_df" in st.session_state and validate_dataframe(st.session_state.get("checklist_df")):
-                if not st.session_state["checklist_df"].empty:
-                    반_목록 = st.session_state["checklist_df"]["반"].dropna().unique().tolist()
+            # 다른 사용자가 먼저 저장했는지 확인
+            stored_version = read_excel_session_version(final_filename)
+            check_session_version(session_id, stored_version, overwrite)
             
-            # 각 반별 데이터 저장
-            for 반 in 반_목록:
-                safe_반 = str(반).replace('/', '_').replace('\\', '_')[:31]
-                
-                # 유해요인조사표 데이터
-                조사표_data = {
-                    "조사일시": st.session_state.get(f"조사일시_{반}", ""),
-                    "부서명": st.session_state.get(f"부서명_{반}", ""),
-                    "조사자": st.session_state.get(f"조사자_{반}", ""),
-                    "작업공정명": st.session_state.get(f"작업공정명_{반}", ""),
-                    "작업명": st.session_state.get(f"작업명_{반}", "")
-                }
-                
-                # 작업장 상황조사
-                for 항목 in ["작업설비", "작업량", "작업속도", "업무변화"]:
-                    조사표_data[f"{항목}_상태"] = st.session_state.get(f"{항목}_상태_{반}", "")
-                    조사표_data[f"{항목}_세부사항"] = st.session_state.get(f"{항목}_감소_시작_{반}", "") or \
-                                                     st.session_state.get(f"{항목}_증가_시작_{반}", "") or \
-                                                     st.session_state.get(f"{항목}_기타_내용_{반}", "")
-                
-                조사표_df = pd.DataFrame([조사표_data])
-                sheet_name = f'조사표_{safe_반}'
-                조사표_df.to_excel(writer, sheet_name=sheet_name, index=False)
-                
-                # 작업조건조사 데이터
-                작업조건_key = f"작업조건_data_{반}"
-                if 작업조건_key in st.session_state and validate_dataframe(st.session_state.get(작업조건_key)):
-                    sheet_name = f'작업조건_{safe_반}'
-                    st.session_state[작업조건_key].to_excel(writer, sheet_name=sheet_name, index=False)
-                
-                # 원인분석 데이터
-                원인분석_key = f"원인분석_항목_{반}"
-                if 원인분석_key in st.session_state and st.session_state[원인분석_key]:
-                    원인분석_df = pd.DataFrame(st.session_state[원인분석_key])
-                    sheet_name = f'원인분석_{safe_반}'
-                    원인분석_df.to_excel(writer, sheet_name=sheet_name, index=False)
+            metadata["saved_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            metadata["version"] = stored_version + 1
+            metadata_df = pd.DataFrame([metadata])
             
-            # 정밀조사 데이터
-            if "정밀조사_목록" in st.session_state:
-                for 조사명 in st.session_state["정밀조사_목록"]:
-                    safe_조사명 = str(조사명).replace('/', '_').replace('\\', '_')[:31]
-                    정밀_data = {
-                        "작업공정명": st.session_state.get(f"정밀_작업공정명_{조사명}", ""),
-                        "작업명": st.session_state.get(f"정밀_작업명_{조사명}", "")
-                    }
-                    
-                    원인분석_key = f"정밀_원인분석_data_{조사명}"
-                    if 원인분석_key in st.session_state and validate_dataframe(st.session_state.get(원인분석_key)):
-                        sheet_name = f'정밀_{safe_조사명}'
-                        정밀_df = pd.DataFrame([정밀_data])
-                        정밀_df.to_excel(writer, sheet_name=sheet_name, index=False)
-                        
-                        st.session_state[원인분석_key].to_excel(
-                            writer, 
-                            sheet_name=sheet_name, 
-                            startrow=3, 
-                            index=False
-                        )
+            # 기존 파일이 있으면 백업
+            if os.path.exists(final_filename):
+                try:
+                    with open(final_filename, 'rb') as f:
+                        create_backup(session_id, f.read())
+                except:
+                    pass
             
-            # 증상조사 분석 데이터
-            증상조사_시트 = {
-                "기초현황": "기초현황_data_저장",
-                "작업기간": "작업기간_data_저장",
-                "육체적부담": "육체적부담_data_저장",
-                "통증호소자": "통증호소자_data_저장"
-            }
+            if incremental:
+                # 기존 파일을 복사한 뒤 변경된 시트만 교체
+                shutil.copy2(final_filename, temp_filename)
+                with pd.ExcelWriter(temp_filename, engine='openpyxl', mode='a', if_sheet_exists='overlay') as writer:
+                    for name in set(dirty + removed) | {'메타데이터'}:
+                        if name in writer.book.sheetnames:
+                            del writer.book[name]
+                    
+                    metadata_df.to_excel(writer, sheet_name='메타데이터', index=False)
+                    for name in dirty:
+                        if name in sheets:
+                            write_sheet(writer, name, sheets[name])
+            else:
+                # 임시 파일에 전체 저장
+                write_session_workbook(temp_filename, metadata, sheets)
             
-            for 시트명, 키 in 증상조사_시트.items():
-                if 키 in st.session_state and validate_dataframe(st.session_state.get(키)):
-                    if not st.session_state[키].empty:
-                        st.session_state[키].to_excel(writer, sheet_name=f'증상_{시트명}', index=False)
+            # 임시 파일을 최종 파일로 원자적으로 교체
+            os.replace(temp_filename, final_filename)
+            update_session_catalog(final_filename, metadata)
             
-            # 작업환경개선계획서
-            if "개선계획_data_저장" in st.session_state and validate_dataframe(st.session_state.get("개선계획_data_저장")):
-                if not st.session_state["개선계획_data_저장"].empty:
-                    st.session_state["개선계획_data_저장"].to_excel(writer, sheet_name='개선계획서', index=False)
-        
-        # 임시 파일을 최종 파일로 이동
-        if os.path.exists(temp_filename):
-            if os.path.exists(final_filename):
-                os.remove(final_filename)
-            os.rename(temp_filename, final_filename)
+            st.session_state["last_saved_fingerprints"] = {
+                "filename": final_filename,
+                "mtime": os.path.getmtime(final_filename),
+                "sheets": fingerprints
+            }
+            record_session_version(metadata["version"])
             
         return True, final_filename
-        
+    
+    except (SessionConflictError, TimeoutError) as e:
+        return False, str(e)
     except Exception as e:
-        # 에러 발생 시 임시 파일 정리
+        return False, f"저장 중 오류 발생: {str(e)}\n{traceback.format_exc()}"
+    finally:
+        # 실패 시 남은 임시 파일 정리
         if os.path.exists(temp_filename):
             try:
                 os.remove(temp_filename)
-            except:
+            except OSError:
                 pass
-        return False, f"저장 중 오류 발생: {str(e)}\n{traceback.format_exc()}"
+
+# 복원할 세션 상태 구성 함수
+def build_restored_state(metadata, sheets, merge_정밀조사=True):
+    """build_session_sheets 형식의 시트들로부터 복원할 세션 상태 딕셔너리 구성
+    
+    세션 상태는 변경하지 않으며, 시트 해석 중 오류가 나면 예외를 그대로 올린다.
+    merge_정밀조사=False면 현재 세션의 정밀조사 목록과 합치지 않는다 (작업현장 전환).
+    """
+    restored = {}
+    
+    # 메타데이터 복원
+    if metadata:
+        for key in ["session_id", "workplace", "사업장명", "소재지", "업종", "예비조사", "본조사", "수행기관", "성명"]:
+            if key in metadata:
+                value = metadata[key]
+                if pd.notna(value):
+                    restored[key] = str(value) if value else ""
+        # 이후 저장 시 충돌 확인의 기준이 되는 버전 (버전 정보가 없던 파일은 0)
+        restored["session_version"] = parse_value(metadata.get("version", 0), int)
+        restored["save_conflict"] = None
+    
+    # 체크리스트 복원
+    checklist_df = None
+    if '체크리스트' in sheets:
+        checklist_df = sheets['체크리스트'][0][1]
+        if validate_dataframe(checklist_df):
+            checklist_df = restored["checklist_df"] = normalize_checklist(checklist_df)
+    
+    정밀조사_목록 = list(st.session_state.get("정밀조사_목록", [])) if merge_정밀조사 else []
+    
+    # 반별 데이터는 새 저장소로 모아 한 번에 교체 (시트명 접미사 → 경로)
+    반_시트 = resolve_반_시트(sheets, checklist_df)
+    저장소 = {}
+    
+    def 반기록_목록(시트):
+        return [저장소.setdefault(경로, 반기록(None, None, {})) for 경로 in 반_시트.get(시트, [])]
+    
+    # 각 시트별로 데이터 복원
+    for sheet_name, parts in sheets.items():
+        try:
+            df = parts[0][1]
+            if sheet_name.startswith('조사표_'):
+                if not df.empty:
+                    values = df.iloc[0].to_dict()
+                    for 경로 in 반_시트.get(sheet_name[len('조사표_'):], []):
+                        restored.update(반_입력값_to_state(경로, values))
+            
+            elif sheet_name.startswith('작업조건_'):
+                if validate_dataframe(df):
+                    for 기록 in 반기록_목록(sheet_name[len('작업조건_'):]):
+                        기록.작업조건 = df
+            
+            elif sheet_name.startswith('원인분석_'):
+                if validate_dataframe(df):
+                    for 기록 in 반기록_목록(sheet_name[len('원인분석_'):]):
+                        기록.원인분석 = df.fillna("").to_dict('records')
+            
+            elif sheet_name.startswith('정밀_'):
+                조사명 = sheet_name.replace('정밀_', '')
+                if 조사명 not in 정밀조사_목록:
+                    정밀조사_목록.append(조사명)
+                
+                if not df.empty:
+                    data = df.iloc[0].to_dict()
+                    for key, value in data.items():
+                        if pd.notna(value):
+                            restored[f"정밀_{key}_{조사명}"] = str(value) if value else ""
+                
+                # 원인분석 데이터
+                if len(parts) > 1 and validate_dataframe(parts[1][1]):
+                    restored[f"정밀_원인분석_data_{조사명}"] = parts[1][1]
+            
+            elif sheet_name.startswith('증상_'):
+                증상_키 = sheet_name.replace('증상_', '') + "_data_저장"
+                if validate_dataframe(df):
+                    restored[증상_키] = df
+            
+            elif sheet_name == '개선계획서':
+                if validate_dataframe(df):
+                    restored["개선계획_data_저장"] = df
+            
+            elif sheet_name == '사진':
+                # 회사명/소속 컬럼이 없던 이전 파일은 이름이 같은 반 모두에 연결
+                반_이름별 = {}
+                for 경로 in checklist_반경로_목록(checklist_df):
+                    반_이름별.setdefault(경로.반, []).append(경로)
+                for 구분, 회사명, 소속, 대상, 순번, ref, 설명 in df.reindex(columns=PHOTO_TABLE_COLUMNS).itertuples(index=False, name=None):
+                    ref = "" if pd.isna(ref) else str(ref)
+                    if 구분 == "작업조건":
+                        경로_목록 = [make_반경로(회사명, 소속, 대상)] if pd.notna(회사명) else 반_이름별.get(str(대상), [])
+                        for 경로 in 경로_목록:
+                            if ref:
+                                저장소.setdefault(경로, 반기록(None, None, {})).사진[int(순번)] = ref
+                            restored[반_키(f"사진_{int(순번)}_설명", 경로)] = "" if pd.isna(설명) else str(설명)
+                    elif 구분 == "정밀조사" and ref:
+                        restored.setdefault(f"정밀_사진_목록_{대상}", []).append(ref)
+                    
+        except Exception as e:
+            raise ValueError(f"시트 '{sheet_name}' 복원 오류: {str(e)}") from e
+    
+    restored["반_기록"] = 저장소
+    if 정밀조사_목록:
+        restored["정밀조사_목록"] = 정밀조사_목록
+    return restored
+
+# 세션 상태 복원 함수
+def restore_session_state(metadata, sheets):
+    """시트들을 모두 해석한 뒤 한 번에 세션 상태에 반영 (실패 시 세션 상태 변경 없음)"""
+    restored = build_restored_state(metadata, sheets)
+    st.session_state.update(restored)
+
+# 통합문서 행 읽기 함수
+def read_workbook_rows(filename):
+    """모든 시트를 한 번에 읽어 {시트명: 행 목록} 반환 (calamine이 있으면 사용)"""
+    if CALAMINE_AVAILABLE:
+        workbook = CalamineWorkbook.from_path(filename)
+        return {name: workbook.get_sheet_by_name(name).to_python() for name in workbook.sheet_names}
+    
+    workbook = load_workbook(filename, read_only=True, data_only=True)
+    try:
+        return {worksheet.title: list(worksheet.iter_rows(values_only=True)) for worksheet in workbook.worksheets}
+    finally:
+        workbook.close()
+
+# 행 목록을 DataFrame으로 변환하는 함수
+def rows_to_dataframe(rows):
+    """첫 행을 헤더로 하는 DataFrame 생성 (pd.read_excel과 같은 값/빈칸 처리)"""
+    data = []
+    last_row_with_data = -1
+    for row_number, row in enumerate(rows):
+        converted_row = []
+        for value in row:
+            if value is None:
+                value = ""
+            elif isinstance(value, float) and value.is_integer():
+                value = int(value)
+            converted_row.append(value)
+        while converted_row and converted_row[-1] == "":
+            converted_row.pop()
+        if converted_row:
+            last_row_with_data = row_number
+        data.append(converted_row)
+    data = data[:last_row_with_data + 1]
+    
+    if not data:
+        return pd.DataFrame()
+    max_width = max(len(row) for row in data)
+    data = [row + [""] * (max_width - len(row)) for row in data]
+    return TextParser(data, header=0).read()
+
+# Excel 세션 파일 읽기 함수
+def read_excel_session(filename):
+    """Excel 세션 파일의 모든 시트를 한 번에 읽어 (메타데이터, 시트) 반환"""
+    # 전체 시트 읽기
+    workbook_rows = read_workbook_rows(filename)
+    
+    # 메타데이터 읽기
+    metadata = {}
+    if '메타데이터' in workbook_rows:
+        metadata_df = rows_to_dataframe(workbook_rows['메타데이터'])
+        if not metadata_df.empty:
+            metadata = metadata_df.iloc[0].to_dict()
+    
+    # 각 시트별로 데이터 구성
+    sheets = {}
+    for sheet_name, rows in workbook_rows.items():
+        if sheet_name == '메타데이터':
+            continue
+        try:
+            if sheet_name.startswith('정밀_'):
+                # 개요 1행 + 4행부터 원인분석 표
+                sheets[sheet_name] = [(0, rows_to_dataframe(rows[:2])), (3, rows_to_dataframe(rows[3:]))]
+            else:
+                sheets[sheet_name] = [(0, rows_to_dataframe(rows))]
+        except Exception as e:
+            raise ValueError(f"시트 '{sheet_name}' 읽기 오류: {str(e)}") from e
+    return metadata, sheets
 
 # 안전한 데이터 불러오기 함수
 def safe_load_from_excel(filename):
-    """Excel 파일에서 데이터를 안전하게 불러오기"""
+    """Excel 파일에서 데이터를 안전하게 불러오기
+    
+    모든 시트를 한 번에 읽고 해석한 뒤 세션 상태에 반영하므로,
+    중간에 실패하면 세션 상태는 그대로 유지된다.
+    """
     try:
         # 파일 존재 여부 확인
         if not os.path.exists(filename):
             return False, "파일이 존재하지 않습니다."
         
-        # 전체 시트 읽기
-        excel_file = pd.ExcelFile(filename)
+        metadata, sheets = read_excel_session(filename)
+        restore_session_state(metadata, sheets)
         
-        # 메타데이터 읽기
-        if '메타데이터' in excel_file.sheet_names:
-            try:
-                metadata_df = pd.read_excel(excel_file, sheet_name='메타데이터')
-                if not metadata_df.empty:
-                    metadata = metadata_df.iloc[0].to_dict()
-                    
-                    # 세션 상태에 메타데이터 복원
-                    for key in ["session_id", "workplace", "사업장명", "소재지", "업종", "예비조사", "본조사", "수행기관", "성명"]:
-                        if key in metadata:
-                            value = metadata[key]
-                            if pd.notna(value):
-                                st.session_state[key] = str(value) if value else ""
-            except Exception as e:
-                st.warning(f"메타데이터 읽기 오류: {str(e)}")
+        return True, "데이터를 성공적으로 불러왔습니다."
         
-        # 체크리스트 읽기
-        if '체크리스트' in excel_file.sheet_names:
-            try:
-                checklist_df = pd.read_excel(excel_file, sheet_name='체크리스트')
-                if validate_dataframe(checklist_df):
-                    st.session_state["checklist_df"] = checklist_df
-            except Exception as e:
-                st.warning(f"체크리스트 읽기 오류: {str(e)}")
+    except ValueError as e:
+        return False, str(e)
+    except Exception as e:
+        return False, f"파일 불러오기 중 오류 발생: {str(e)}\n{traceback.format_exc()}"
+
+# SQLite 세션 저장소 테이블 정의 (시트 접두사, 파트 번호) → (테이블명, [(컬럼명, 타입), ...])
+# 숫자 컬럼은 INTEGER/NUMERIC으로 선언해 Excel 저장소와 같은 자료형으로 복원
+# (정수로 나타낼 수 있는 실수는 정수, 나머지 실수는 실수, 숫자가 아닌 입력은 문자열로 유지)
+def sqlite_columns(text_columns, typed_columns=()):
+    return [(c, "TEXT") for c in text_columns] + list(typed_columns)
+
+SQLITE_TABLES = {
+    ("체크리스트", 0): ("checklist", [(c, "TEXT") for c in ["회사명", "소속", "반", "단위작업명"] + [f"{i}호" for i in range(1, 12)]]),
+    ("조사표_", 0): ("survey", [(c, "TEXT") for c in ["조사일시", "부서명", "조사자", "작업공정명", "작업명"] + [
+        f"{항목}_{구분}" for 항목 in ["작업설비", "작업량", "작업속도", "업무변화"] for 구분 in ["상태", "세부사항"]
+    ]]),
+    ("작업조건_", 0): ("work_condition", [("단위작업명", "TEXT"), ("부담작업(호)", "TEXT"), ("작업부하(A)", "TEXT"), ("작업빈도(B)", "TEXT"), ("총점", "INTEGER")]),
+    ("원인분석_", 0): ("cause_analysis", [(c, "TEXT") for c in ["단위작업명", "부담작업호", "유형", "부담작업", "비고"]]),
+    ("반목록", 0): ("ban_paths", [(c, "TEXT") for c in ["시트", "회사명", "소속", "반"]]),
+    ("정밀_", 0): ("detail_survey", [(c, "TEXT") for c in ["작업공정명", "작업명"]]),
+    ("정밀_", 1): ("detail_analysis", sqlite_columns(["작업분석 및 평가도구"], [("분석결과", "NUMERIC"), ("만점", "NUMERIC")])),
+    ("증상_기초현황", 0): ("symptom_basic", sqlite_columns(["반"], [
+        ("응답자(명)", "INTEGER"), ("나이", "INTEGER"), ("근속년수", "INTEGER"), ("남자(명)", "INTEGER"), ("여자(명)", "INTEGER"), ("합계", "INTEGER")
+    ])),
+    ("증상_작업기간", 0): ("symptom_period", sqlite_columns(["반"], [(c, "INTEGER") for c in ["<1년", "<3년", "<5년", "≥5년", "무응답", "합계", "이전<1년", "이전<3년", "이전<5년", "이전≥5년", "이전무응답", "이전합계"]])),
+    ("증상_육체적부담", 0): ("symptom_burden", sqlite_columns(["반"], [(c, "INTEGER") for c in ["전혀 힘들지 않음", "견딜만 함", "약간 힘듦", "힘듦", "매우 힘듦", "합계"]])),
+    ("증상_통증호소자", 0): ("symptom_pain", sqlite_columns(["반", "구분"], [(c, "INTEGER") for c in ["목", "어깨", "팔/팔꿈치", "손/손목/손가락", "허리", "다리/발", "전체"]])),
+    ("사진", 0): ("photos", [("구분", "TEXT"), ("대상", "TEXT"), ("순번", "INTEGER"), ("파일", "TEXT"), ("설명", "TEXT")]),
+    ("개선계획서", 0): ("improvement_plan", sqlite_columns(
+        ["회사명", "소속", "반", "단위작업명", "문제점(유해요인의 원인)", "근로자의견", "개선방안", "추진일정"],
+        [("개선비용", "NUMERIC")]
+    ) + [("개선우선순위", "TEXT")]),
+}
+
+def get_sqlite_table(sheet_name, part):
+    """시트명과 파트 번호에 해당하는 테이블 정의 반환"""
+    for (prefix, table_part), table in SQLITE_TABLES.items():
+        if table_part == part and (sheet_name == prefix or (prefix.endswith('_') and sheet_name.startswith(prefix))):
+            return table
+    return None
+
+# SQLite 저장소 초기화 (프로세스당 한 번)
+@st.cache_resource
+def init_sqlite_storage():
+    """WAL 모드 설정과 테이블 생성 (WAL 모드는 DB 파일에 기록되므로 이후 연결에는 다시 설정하지 않음)"""
+    os.makedirs(SAVE_DIR, exist_ok=True)
+    conn = sqlite3.connect(SQLITE_PATH, timeout=30)
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        create_sqlite_schema(conn)
+        conn.commit()
+    finally:
+        conn.close()
+    return True
+
+def create_sqlite_schema(conn):
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS sessions ("
+        "session_id TEXT PRIMARY KEY, workplace TEXT, saved_at TEXT, metadata TEXT, version INTEGER NOT NULL DEFAULT 0)"
+    )
+    # 버전 컬럼이 없던 기존 DB 갱신
+    if "version" not in {row[1] for row in conn.execute("PRAGMA table_info(sessions)")}:
+        conn.execute("ALTER TABLE sessions ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS sheets ("
+        "session_id TEXT, sheet_name TEXT, part INTEGER, startrow INTEGER, "
+        "columns TEXT, fingerprint TEXT, PRIMARY KEY (session_id, sheet_name, part))"
+    )
+    for table_name, table_columns in SQLITE_TABLES.values():
+        column_sql = ", ".join(f'"{name}" {sql_type}' for name, sql_type in table_columns)
+        conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table_name} ("
+            f"session_id TEXT, sheet_name TEXT, row_idx INTEGER, row_hash TEXT, {column_sql}, extra TEXT, "
+            f"PRIMARY KEY (session_id, sheet_name, row_idx))"
+        )
+
+# SQLite 연결 함수
+def get_sqlite_connection():
+    """세션 저장소 DB 연결 (synchronous는 연결마다 적용되는 설정)"""
+    init_sqlite_storage()
+    conn = sqlite3.connect(SQLITE_PATH, timeout=30)
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+# SQLite 저장용 값 변환 함수
+def to_sql_value(value):
+    if value is None:
+        return None
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, ensure_ascii=False)
+    if pd.isna(value):
+        return None
+    if hasattr(value, "item"):
+        value = value.item()
+    if isinstance(value, (str, int, float)):
+        return value
+    return str(value)
+
+# SQLite 읽기 값 변환 함수 (컬럼 타입을 지정하기 전에 만든 DB는 숫자가 문자열로 저장되어 있음)
+def from_sql_value(value, sql_type):
+    if sql_type == "TEXT" or not isinstance(value, str):
+        return value
+    try:
+        number = float(value)
+    except ValueError:
+        return value
+    if not np.isfinite(number):
+        return value
+    # SQLite INTEGER/NUMERIC 컬럼과 같이 정수로 나타낼 수 있으면 정수
+    return int(number) if number.is_integer() else number
+
+# 행 단위 해시 계산 함수
+def hash_rows(df):
+    """행별 내용 해시 목록 반환 (컬럼 구성이 바뀌면 모든 행이 변경된 것으로 처리)"""
+    columns_hash = hashlib.sha1(repr(list(df.columns)).encode("utf-8")).hexdigest()[:8]
+    try:
+        return [f"{columns_hash}:{h:x}" for h in pd.util.hash_pandas_object(df, index=False).tolist()]
+    except TypeError:
+        return [
+            columns_hash + ":" + hashlib.sha1(json.dumps(row, ensure_ascii=False, default=str).encode("utf-8")).hexdigest()
+            for row in df.astype(object).values.tolist()
+        ]
+
+# SQLite 세션 저장 함수
+def sqlite_save_session(session_id, metadata, sheets, force=False, overwrite=False, saved_at=None, record_version=True):
+    """변경된 시트의 변경된 행만 SQLite에 upsert (변경 없으면 생략)
+    
+    불러온 뒤 다른 사용자가 먼저 저장했으면 overwrite=True가 아닌 한 SessionConflictError.
+    saved_at을 주면 저장 시각 대신 사용하고, record_version=False면 현재 화면의 세션 버전을 바꾸지 않는다 (Excel 세션 가져오기).
+    """
+    fingerprints = {name: fingerprint_sheet(parts) for name, parts in sheets.items()}
+    fingerprints['메타데이터'] = fingerprint_sheet([(0, pd.DataFrame([metadata]))])
+    
+    conn = get_sqlite_connection()
+    try:
+        previous = {}
+        for sheet_name, fingerprint in conn.execute(
+            "SELECT sheet_name, fingerprint FROM sheets WHERE session_id = ? AND part = 0", (session_id,)
+        ):
+            previous[sheet_name] = fingerprint
         
-        # 각 시트별로 데이터 읽기
-        for sheet_name in excel_file.sheet_names:
-            try:
-                if sheet_name.startswith('조사표_'):
-                    반 = sheet_name.replace('조사표_', '')
-                    조사표_df = pd.read_excel(excel_file, sheet_name=sheet_name)
-                    if not 조사표_df.empty:
-                        data = 조사표_df.iloc[0].to_dict()
-                        for key, value in data.items():
-                            if pd.notna(value):
-                                st.session_state[f"{key}_{반}"] = str(value) if value else ""
-                
-                elif sheet_name.startswith('작업조건_'):
-                    반 = sheet_name.replace('작업조건_', '')
-                    작업조건_df = pd.read_excel(excel_file, sheet_name=sheet_name)
-                    if validate_dataframe(작업조건_df):
-                        st.session_state[f"작업조건_data_{반}"] = 작업조건_df
-                
-                elif sheet_name.startswith('원인분석_'):
-                    반 = sheet_name.replace('원인분석_', '')
-                    원인분석_df = pd.read_excel(excel_file, sheet_name=sheet_name)
-                    if validate_dataframe(원인분석_df):
-                        st.session_state[f"원인분석_항목_{반}"] = 원인분석_df.to_dict('records')
-                
-                elif sheet_name.startswith('정밀_'):
-                    조사명 = sheet_name.replace('정밀_', '')
-                    if "정밀조사_목록" not in st.session_state:
-                        st.session_state["정밀조사_목록"] = []
-                    if 조사명 not in st.session_state["정밀조사_목록"]:
-                        st.session_state["정밀조사_목록"].append(조사명)
+        dirty = [name for name, fp in fingerprints.items() if force or previous.get(name) != fp]
+        removed = [name for name in previous if name not in fingerprints]
+        if not dirty and not removed:
+            return False
+        
+        row = conn.execute("SELECT version FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        stored_version = row[0] if row else 0
+        check_session_version(session_id, stored_version, overwrite)
+        
+        with conn:
+            saved_metadata = dict(
+                metadata, saved_at=saved_at or datetime.now().strftime("%Y-%m-%d %H:%M:%S"), version=stored_version + 1
+            )
+            # 읽은 버전이 그대로일 때만 갱신 (다른 프로세스가 그 사이에 저장했으면 충돌)
+            cursor = conn.execute(
+                "INSERT INTO sessions (session_id, workplace, saved_at, metadata, version) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(session_id) DO UPDATE SET workplace = excluded.workplace, "
+                "saved_at = excluded.saved_at, metadata = excluded.metadata, version = excluded.version "
+                "WHERE sessions.version = ?",
+                (session_id, saved_metadata["workplace"], saved_metadata["saved_at"],
+                 json.dumps(saved_metadata, ensure_ascii=False, default=str), saved_metadata["version"], stored_version)
+            )
+            if cursor.rowcount == 0:
+                raise SessionConflictError("다른 사용자가 이 세션을 동시에 저장했습니다. 다시 시도해주세요.")
+            conn.execute(
+                "INSERT OR REPLACE INTO sheets (session_id, sheet_name, part, startrow, columns, fingerprint) "
+                "VALUES (?, '메타데이터', 0, 0, '[]', ?)",
+                (session_id, fingerprints['메타데이터'])
+            )
+            
+            # 삭제된 시트 정리
+            for sheet_name in removed:
+                for table_name, _ in SQLITE_TABLES.values():
+                    conn.execute(f"DELETE FROM {table_name} WHERE session_id = ? AND sheet_name = ?", (session_id, sheet_name))
+                conn.execute("DELETE FROM sheets WHERE session_id = ? AND sheet_name = ?", (session_id, sheet_name))
+            
+            for sheet_name in dirty:
+                if sheet_name not in sheets:
+                    continue
+                parts = sheets[sheet_name]
+                conn.execute("DELETE FROM sheets WHERE session_id = ? AND sheet_name = ?", (session_id, sheet_name))
+                for part, (startrow, df) in enumerate(parts):
+                    table = get_sqlite_table(sheet_name, part)
+                    if table is None:
+                        continue
+                    table_name, table_columns = table
+                    schema_names = [name for name, _ in table_columns]
+                    extra_names = [c for c in df.columns if c not in schema_names]
                     
-                    정밀_df = pd.read_excel(excel_file, sheet_name=sheet_name, nrows=1)
-                    if not 정밀_df.empty:
-                        data = 정밀_df.iloc[0].to_dict()
-                        for key, value in data.items():
-                            if pd.notna(value):
-                                st.session_state[f"정밀_{key}_{조사명}"] = str(value) if value else ""
+                    # 기존 행 해시와 비교하여 변경된 행만 upsert
+                    stored = dict(conn.execute(
+                        f"SELECT row_idx, row_hash FROM {table_name} WHERE session_id = ? AND sheet_name = ?",
+                        (session_id, sheet_name)
+                    ).fetchall())
+                    row_hashes = hash_rows(df)
+                    records = df.to_dict('records')
                     
-                    # 원인분석 데이터 읽기
-                    try:
-                        원인분석_df = pd.read_excel(excel_file, sheet_name=sheet_name, skiprows=3)
-                        if validate_dataframe(원인분석_df):
-                            st.session_state[f"정밀_원인분석_data_{조사명}"] = 원인분석_df
-                    except:
-                        pass
-                
-                elif sheet_name.startswith('증상_'):
-                    증상_키 = sheet_name.replace('증상_', '') + "_data_저장"
-                    증상_df = pd.read_excel(excel_file, sheet_name=sheet_name)
-                    if validate_dataframe(증상_df):
-                        st.session_state[증상_키] = 증상_df
-                
-                elif sheet_name == '개선계획서':
-                    개선계획_df = pd.read_excel(excel_file, sheet_name=sheet_name)
-                    if validate_dataframe(개선계획_df):
-                        st.session_state["개선계획_data_저장"] = 개선계획_df
-                        
-            except Exception as e:
-                st.warning(f"시트 '{sheet_name}' 읽기 오류: {str(e)}")
-                continue
+                    rows = []
+                    for row_idx, (row_hash, record) in enumerate(zip(row_hashes, records)):
+                        if stored.get(row_idx) == row_hash:
+                            continue
+                        extra = {c: to_sql_value(record[c]) for c in extra_names}
+                        rows.append(
+                            [session_id, sheet_name, row_idx, row_hash]
+                            + [to_sql_value(record.get(name)) for name in schema_names]
+                            + [json.dumps(extra, ensure_ascii=False) if extra else None]
+                        )
+                    
+                    if rows:
+                        column_sql = ", ".join(f'"{name}"' for name in schema_names)
+                        placeholders = ", ".join(["?"] * (len(schema_names) + 5))
+                        conn.executemany(
+                            f"INSERT OR REPLACE INTO {table_name} "
+                            f"(session_id, sheet_name, row_idx, row_hash, {column_sql}, extra) VALUES ({placeholders})",
+                            rows
+                        )
+                    conn.execute(
+                        f"DELETE FROM {table_name} WHERE session_id = ? AND sheet_name = ? AND row_idx >= ?",
+                        (session_id, sheet_name, len(df))
+                    )
+                    conn.execute(
+                        "INSERT OR REPLACE INTO sheets (session_id, sheet_name, part, startrow, columns, fingerprint) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        (session_id, sheet_name, part, startrow,
+                         json.dumps([str(c) for c in df.columns], ensure_ascii=False), fingerprints[sheet_name])
+                    )
+        if record_version:
+            record_session_version(saved_metadata["version"])
+        return True
+    finally:
+        conn.close()
+
+# SQLite 세션 불러오기 함수
+def sqlite_load_session(session_id):
+    """SQLite에서 (메타데이터, 시트) 읽기"""
+    conn = get_sqlite_connection()
+    try:
+        row = conn.execute("SELECT metadata, version FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        if row is None:
+            return None, {}
+        metadata = dict(json.loads(row[0]), version=row[1])
         
-        return True, "데이터를 성공적으로 불러왔습니다."
+        sheets = {}
+        sheet_rows = conn.execute(
+            "SELECT sheet_name, part, startrow, columns FROM sheets "
+            "WHERE session_id = ? AND sheet_name != '메타데이터' ORDER BY rowid",
+            (session_id,)
+        ).fetchall()
+        for sheet_name, part, startrow, columns_json in sorted(sheet_rows, key=lambda r: r[1]):
+            table = get_sqlite_table(sheet_name, part)
+            if table is None:
+                continue
+            table_name, table_columns = table
+            schema_names = [name for name, _ in table_columns]
+            schema_types = [sql_type for _, sql_type in table_columns]
+            columns = json.loads(columns_json)
+            
+            column_sql = ", ".join(f'"{name}"' for name in schema_names)
+            records = []
+            for values in conn.execute(
+                f"SELECT {column_sql}, extra FROM {table_name} "
+                f"WHERE session_id = ? AND sheet_name = ? ORDER BY row_idx",
+                (session_id, sheet_name)
+            ):
+                record = {name: from_sql_value(value, sql_type) for name, sql_type, value in zip(schema_names, schema_types, values[:-1])}
+                if values[-1]:
+                    record.update(json.loads(values[-1]))
+                records.append(record)
+            
+            df = pd.DataFrame(records, columns=columns)
+            sheets.setdefault(sheet_name, []).append((startrow, df))
+        return metadata, sheets
+    finally:
+        conn.close()
+
+# 기존 Excel 세션 가져오기 (SQLite 저장소로 바꾸기 전에 저장한 세션, 프로세스당 한 번)
+@st.cache_resource
+def import_excel_sessions():
+    """SQLite에 없는 Excel 세션 파일을 저장 시각을 유지해 SQLite로 옮기기 (원본 파일은 그대로 둠)
+    
+    가져온 세션 수 반환. 읽을 수 없는 파일은 건너뛰며 Excel 세션 목록에 그대로 남는다.
+    """
+    if not os.path.exists(SAVE_DIR):
+        return 0
+    conn = get_sqlite_connection()
+    try:
+        existing = {row[0] for row in conn.execute("SELECT session_id FROM sessions")}
+    finally:
+        conn.close()
+    imported = 0
+    for entry in os.scandir(SAVE_DIR):
+        if not entry.is_file() or not entry.name.endswith('.xlsx') or entry.name.endswith(('_temp.xlsx', '.tmp.xlsx')):
+            continue
+        try:
+            metadata, sheets = read_excel_session(entry.path)
+            session_id = str(metadata.get("session_id") or os.path.splitext(entry.name)[0])
+            if session_id in existing or not metadata:
+                continue
+            metadata = {key: ("" if pd.isna(value) else value) for key, value in metadata.items()}
+            metadata["session_id"] = session_id
+            with session_lock(session_id):
+                sqlite_save_session(session_id, metadata, sheets, force=True, overwrite=True,
+                                    saved_at=str(metadata.get("saved_at") or "") or None, record_version=False)
+            existing.add(session_id)
+            imported += 1
+        except Exception:
+            continue
+    return imported
+
+# SQLite 세션 목록 함수
+def sqlite_list_sessions():
+    conn = get_sqlite_connection()
+    try:
+        return [
+            {"backend": "sqlite", "filename": "", "session_id": session_id, "workplace": workplace, "saved_at": saved_at,
+             "version": version}
+            for session_id, workplace, saved_at, version in conn.execute(
+                "SELECT session_id, workplace, saved_at, version FROM sessions"
+            )
+        ]
+    finally:
+        conn.close()
+
+# 세션 저장 함수 (저장소 백엔드 선택)
+def save_session(session_id, workplace=None, force=False, overwrite=False):
+    """설정된 저장소(STORAGE_BACKEND)에 세션 저장 (overwrite=True면 버전 충돌을 무시하고 덮어쓰기)"""
+    if STORAGE_BACKEND == "excel":
+        return safe_save_to_excel(session_id, workplace, force=force, overwrite=overwrite)
+    try:
+        with session_lock(session_id):
+            changed = sqlite_save_session(
+                session_id, build_session_metadata(session_id, workplace), build_session_sheets(),
+                force=force, overwrite=overwrite
+            )
         
+        # 변경된 경우 일정 간격으로 Excel 스냅샷 백업
+        if changed:
+            backups = list_backups(session_id)
+            last_backup = datetime.strptime(backups[0]["created_at"], "%Y-%m-%d %H:%M:%S") if backups else None
+            if last_backup is None or (datetime.now() - last_backup).total_seconds() >= BACKUP_MIN_INTERVAL:
+                try:
+                    create_backup(session_id, export_session_excel(session_id, workplace).getvalue())
+                except Exception:
+                    pass
+        return True, SQLITE_PATH
+    except (SessionConflictError, TimeoutError) as e:
+        return False, str(e)
     except Exception as e:
-        return False, f"파일 불러오기 중 오류 발생: {str(e)}\n{traceback.format_exc()}"
+        return False, f"저장 중 오류 발생: {str(e)}\n{traceback.format_exc()}"
+
+# 저장된 세션 읽기 함수 (세션 상태는 변경하지 않음)
+def read_saved_session(session_info):
+    """get_saved_sessions 항목의 (메타데이터, 시트) 읽기"""
+    if session_info.get("backend") == "sqlite":
+        metadata, sheets = sqlite_load_session(session_info["session_id"])
+        if metadata is None:
+            raise ValueError("세션이 존재하지 않습니다.")
+        return metadata, sheets
+    return read_excel_session(os.path.join(SAVE_DIR, session_info["filename"]))
+
+# 세션 불러오기 함수 (저장소 백엔드 선택)
+def load_session(session_info):
+    """get_saved_sessions 항목에 해당하는 세션 불러오기"""
+    if session_info.get("backend") == "sqlite":
+        try:
+            metadata, sheets = sqlite_load_session(session_info["session_id"])
+            if metadata is None:
+                return False, "세션이 존재하지 않습니다."
+            restore_session_state(metadata, sheets)
+            return True, "데이터를 성공적으로 불러왔습니다."
+        except Exception as e:
+            return False, f"세션 불러오기 중 오류 발생: {str(e)}\n{traceback.format_exc()}"
+    return safe_load_from_excel(os.path.join(SAVE_DIR, session_info["filename"]))
+
+# 저장소에 기록된 세션 버전 조회
+def get_stored_session_version(session_id):
+    """현재 저장소(STORAGE_BACKEND)에 저장된 세션의 버전 (없으면 0)"""
+    if STORAGE_BACKEND == "excel":
+        return read_excel_session_version(os.path.join(SAVE_DIR, f"{session_id}.xlsx"))
+    conn = get_sqlite_connection()
+    try:
+        row = conn.execute("SELECT version FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        return row[0] if row else 0
+    finally:
+        conn.close()
+
+# 세션 Excel 내보내기 함수
+def export_session_excel(session_id, workplace=None):
+    """현재 세션을 Excel 파일(BytesIO)로 내보내기"""
+    metadata = build_session_metadata(session_id, workplace)
+    metadata["saved_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    output = BytesIO()
+    write_session_workbook(output, metadata, build_session_sheets())
+    output.seek(0)
+    return output
+
+# 부담작업 분류 (1호~11호를 X=1, △=2, O=3 정수 행렬로 처리)
+HO_COLUMNS = [f"{i}호" for i in range(1, 12)]
+HO_LEVELS = {"X(미해당)": 1, "△(잠재위험)": 2, "O(해당)": 3}
+HO_LABELS = {level: label for label, level in HO_LEVELS.items()}
+
+# checklist_df 내부 표현: 1호~11호는 범주형(int8 코드)으로 보관하고
+# data_editor 표시와 Excel 내보내기 시에만 문자열 라벨로 변환
+HO_DTYPE = pd.CategoricalDtype([HO_LABELS[1], HO_LABELS[2], HO_LABELS[3]], ordered=True)
+
+def normalize_checklist(df):
+    """1호~11호 컬럼을 범주형으로 변환 (허용되지 않는 값은 빈 값)"""
+    if not validate_dataframe(df) or df.empty:
+        return df
+    columns = [col for col in HO_COLUMNS if col in df.columns and df[col].dtype != HO_DTYPE]
+    if not columns:
+        return df
+    df = df.copy()
+    for col in columns:
+        df[col] = df[col].astype(HO_DTYPE)
+    return df
+
+def checklist_to_labels(df):
+    """범주형 1호~11호 컬럼을 문자열 라벨 컬럼으로 변환"""
+    columns = [col for col in HO_COLUMNS if col in df.columns and df[col].dtype == HO_DTYPE]
+    if not columns:
+        return df
+    df = df.copy()
+    for col in columns:
+        df[col] = df[col].astype(object)
+    return df
+
+def encode_ho_matrix(df):
+    """1호~11호 컬럼을 (행 수 x 11) int8 행렬로 변환 (알 수 없는 값과 빈 값은 X=1)"""
+    matrix = np.ones((len(df), len(HO_COLUMNS)), dtype=np.int8)
+    for j, col in enumerate(HO_COLUMNS):
+        if col not in df.columns:
+            continue
+        if df[col].dtype == HO_DTYPE:
+            # 범주 코드(-1=빈 값, 0=X, 1=△, 2=O)를 그대로 사용
+            matrix[:, j] = np.maximum(df[col].cat.codes.to_numpy() + 1, 1)
+        else:
+            matrix[:, j] = df[col].map(HO_LEVELS).fillna(1).to_numpy(dtype=np.int8)
+    return matrix
+
+def classify_부담작업(matrix):
+    """행별 부담작업 문자열 ("1호, 3호(잠재)" / "미해당") 배열 반환"""
+    result = np.full(len(matrix), "", dtype=object)
+    for j, col in enumerate(HO_COLUMNS):
+        label = np.where(matrix[:, j] == 3, col, np.where(matrix[:, j] == 2, f"{col}(잠재)", ""))
+        has_label = label != ""
+        result = np.where(has_label & (result != ""), result + ", " + label, np.where(has_label, label, result))
+    return np.where(result == "", "미해당", result)
+
+def has_부담작업(matrix):
+    """O 또는 △가 하나라도 있는 행 여부"""
+    return (matrix >= 2).any(axis=1)
+
+# 체크리스트 엑셀 가져오기 (회사명, 소속, 반, 단위작업명, 1호~11호 순서의 15개 열)
+CHECKLIST_IMPORT_CHUNK_ROWS = 20000  # 한 번에 검증할 행 수 (읽기 전용 모드로 행 단위 스트리밍)
+CHECKLIST_REPORT_MAX_ROWS = 1000     # 검증 보고서에 표시할 보정 셀 최대 개수
+CHECKLIST_IMPORT_WORKERS = max(1, min(4, os.cpu_count() or 1))  # 여러 파일 일괄 가져오기 스레드 수
+CHECKLIST_IMPORT_EXTENSIONS = (".xlsx", ".xls")
+CHECKLIST_COLUMN_ERROR = "엑셀 파일의 컬럼이 15개 이상이어야 합니다. (회사명, 소속, 반, 단위작업명, 1호~11호)"
+
+def iter_checklist_rows(data, filename):
+    """업로드 파일의 첫 시트를 (엑셀 행 번호, 15개 값 튜플)로 생성 (머리글 행과 빈 행 제외)"""
+    width = len(HIERARCHY_COLUMNS) + len(HO_COLUMNS)
+    workbook = None
+    if filename.lower().endswith(".xls"):
+        # 구형 .xls는 openpyxl로 읽을 수 없으므로 pandas로 한 번에 읽기
+        df = pd.read_excel(BytesIO(data), header=None, dtype=object)
+        rows = df.astype(object).where(df.notna(), None).itertuples(index=False, name=None)
+    elif CALAMINE_AVAILABLE:
+        sheet = CalamineWorkbook.from_filelike(BytesIO(data)).get_sheet_by_index(0)
+        rows = sheet.iter_rows() if hasattr(sheet, "iter_rows") else sheet.to_python()
+    else:
+        workbook = load_workbook(BytesIO(data), read_only=True, data_only=True)
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+    
+    try:
+        rows = enumerate(rows, start=1)
+        header = next(rows, None)
+        if header is None or len(header[1]) < width:
+            raise ValueError(CHECKLIST_COLUMN_ERROR)
+        for row_number, values in rows:
+            values = tuple(values[:width])
+            if any(value is not None and value != "" for value in values):
+                yield row_number, values + (None,) * (width - len(values))
+    finally:
+        if workbook is not None:
+            workbook.close()
+
+def validate_checklist_chunk(row_numbers, values):
+    """행 묶음을 체크리스트 DataFrame으로 변환하고 허용되지 않는 호별 값을 X(미해당)으로 보정
+    
+    (DataFrame, 호별 보정 건수, 보정 셀 목록 DataFrame) 반환
+    """
+    chunk = pd.DataFrame(values, columns=HIERARCHY_COLUMNS + HO_COLUMNS, dtype=object)
+    
+    # 계층 컬럼은 문자열 (빈 칸은 "", 정수로 저장된 숫자는 "1.0"이 아닌 "1")
+    for col in HIERARCHY_COLUMNS:
+        chunk[col] = (
+            chunk[col].where(chunk[col].notna(), "").astype(str).str.strip()
+            .str.replace(r"^(-?\d+)\.0$", r"\1", regex=True)
+        )
+    
+    # 호별 값 검증: 허용 라벨이 아닌 셀을 한 번에 찾아 X(미해당)으로 보정
+    ho_values = chunk[HO_COLUMNS].apply(lambda col: col.where(col.notna(), "").astype(str).str.strip())
+    invalid = ~ho_values.isin(HO_DTYPE.categories)
+    rows, cols = np.nonzero(invalid.to_numpy())
+    coerced = pd.DataFrame({
+        "행": np.asarray(row_numbers)[rows],
+        "컬럼": np.asarray(HO_COLUMNS)[cols],
+        "원래값": np.where(ho_values.to_numpy()[rows, cols] == "", "(빈 값)", ho_values.to_numpy()[rows, cols]),
+    })
+    for col in HO_COLUMNS:
+        chunk[col] = pd.Categorical(ho_values[col].mask(invalid[col], HO_LABELS[1]), dtype=HO_DTYPE)
+    return chunk, invalid.sum(), coerced
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def import_checklist_excel(digest, filename, _data):
+    """업로드한 체크리스트 엑셀을 묶음 단위로 읽어 검증 (업로드 내용 해시 digest로 캐시)
+    
+    (체크리스트 DataFrame, 검증 보고서 딕셔너리) 반환
+    """
+    chunks, counts, coerced_cells = [], [], []
+    coerced_total = 0
+    rows = iter_checklist_rows(_data, filename)
+    while True:
+        batch = list(itertools.islice(rows, CHECKLIST_IMPORT_CHUNK_ROWS))
+        if not batch and chunks:
+            break
+        row_numbers = [row_number for row_number, _ in batch]
+        chunk, chunk_counts, chunk_coerced = validate_checklist_chunk(row_numbers, [values for _, values in batch])
+        chunks.append(chunk)
+        counts.append(chunk_counts)
+        coerced_total += len(chunk_coerced)
+        
+        # 보정 내역은 앞에서부터 최대 개수까지만 보관
+        shown = sum(len(cells) for cells in coerced_cells)
+        coerced_cells.append(chunk_coerced.head(max(CHECKLIST_REPORT_MAX_ROWS - shown, 0)))
+        if len(batch) < CHECKLIST_IMPORT_CHUNK_ROWS:
+            break
+    
+    counts = pd.concat(counts, axis=1).sum(axis=1).astype(int)
+    report = {
+        "행수": sum(len(chunk) for chunk in chunks),
+        "보정_셀수": coerced_total,
+        "호별_보정": counts[counts > 0].to_dict(),
+        "보정_내역": pd.concat(coerced_cells, ignore_index=True),
+    }
+    return pd.concat(chunks, ignore_index=True), report
+
+# 여러 파일 일괄 가져오기
+@st.cache_resource
+def get_import_executor():
+    """엑셀 파싱용 스레드 풀 (의도적으로 스레드 사용)
+    
+    fork는 Tornado/스크립트 실행/보고서 스레드의 잠긴 락을 물려받아 멈출 수 있고,
+    spawn은 Streamlit이 app.py를 __main__으로 등록해 두어 작업 프로세스마다 앱 전체를 다시 실행한다.
+    스레드는 zip 압축 해제 등 GIL을 놓는 구간만 겹치고 openpyxl 파싱 자체는 사실상 순차로 돈다.
+    """
+    return ThreadPoolExecutor(max_workers=CHECKLIST_IMPORT_WORKERS, thread_name_prefix="checklist-import")
+
+def iter_checklist_uploads(uploaded_files):
+    """업로드한 엑셀/zip 파일들을 (파일명, bytes)로 펼치기 (zip 안의 엑셀 파일 포함)"""
+    for uploaded_file in uploaded_files:
+        data = uploaded_file.getvalue()
+        if not uploaded_file.name.lower().endswith(".zip"):
+            yield uploaded_file.name, data
+            continue
+        with zipfile.ZipFile(BytesIO(data)) as archive:
+            for info in archive.infolist():
+                # UTF-8 표시가 없는 이름은 Windows 한글(cp949)로 해석
+                name = info.filename if info.flag_bits & 0x800 else info.filename.encode("cp437").decode("cp949", errors="replace")
+                basename = os.path.basename(name)
+                if (info.is_dir() or "__MACOSX" in name or basename.startswith((".", "~$"))
+                        or not basename.lower().endswith(CHECKLIST_IMPORT_EXTENSIONS)):
+                    continue
+                yield f"{uploaded_file.name}/{name}", archive.read(info)
+
+def checklist_from_frame(frame):
+    """pd.read_excel(header=None)로 읽은 첫 시트를 validate_checklist_chunk 규칙으로 검증"""
+    width = len(HIERARCHY_COLUMNS) + len(HO_COLUMNS)
+    if frame.shape[1] < width:
+        raise ValueError(CHECKLIST_COLUMN_ERROR)
+    data = frame.iloc[1:, :width]
+    data = data[(data.notna() & (data != "")).any(axis=1)]
+    return validate_checklist_chunk((data.index + 1).tolist(), data.to_numpy(dtype=object))
+
+def dedupe_checklist(df):
+    """(회사명, 소속, 반, 단위작업명)이 같은 행을 하나로 합치기 (merge_unit_works와 같이 호별 가장 높은 수준 선택)
+    
+    (체크리스트, 합쳐진 행 수, 호별 값이 서로 달랐던 단위작업 수) 반환
+    """
+    if df.empty:
+        return df, 0, 0
+    levels = pd.DataFrame(encode_ho_matrix(df), columns=HO_COLUMNS)
+    # 빈 계층 값(None/NaN)도 ""로 묶어 그룹에서 빠지지 않게 함
+    keys = df[HIERARCHY_COLUMNS].astype(object).reset_index(drop=True)
+    keys = keys.where(keys.notna(), "")
+    grouped = pd.concat([keys, levels], axis=1).groupby(HIERARCHY_COLUMNS, sort=False)
+    maxima = grouped.max()
+    conflicts = int((maxima != grouped.min()).any(axis=1).sum())
+    merged = maxima.reset_index()
+    for col in HO_COLUMNS:
+        merged[col] = pd.Categorical.from_codes(merged[col].to_numpy() - 1, dtype=HO_DTYPE)
+    return merged, len(df) - len(merged), conflicts
+
+@st.cache_data(max_entries=2, show_spinner=False)
+def import_checklist_files(digests, names, _datas):
+    """여러 엑셀 파일을 스레드 풀에서 동시에 읽고 검증한 뒤 하나로 합치기 (파일 내용 해시 digests로 캐시)
+    
+    (중복을 합친 체크리스트, 파일별 결과 DataFrame) 반환
+    """
+    executor = get_import_executor()
+    engine = "calamine" if CALAMINE_AVAILABLE else None
+    futures = [executor.submit(pd.read_excel, BytesIO(data), header=None, dtype=object, engine=engine) for data in _datas]
+    
+    chunks, files = [], []
+    for name, future in zip(names, futures):
+        try:
+            chunk, _, coerced = checklist_from_frame(future.result())
+            chunks.append(chunk)
+            files.append({"파일": name, "행수": len(chunk), "보정_셀수": len(coerced), "오류": ""})
+        except Exception as e:
+            files.append({"파일": name, "행수": 0, "보정_셀수": 0, "오류": str(e) or type(e).__name__})
+    
+    combined = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame(columns=HIERARCHY_COLUMNS + HO_COLUMNS)
+    merged, _, _ = dedupe_checklist(combined)
+    return merged, pd.DataFrame(files, columns=["파일", "행수", "보정_셀수", "오류"])
+
+# 작업조건조사 총점 계산 (총점 = 작업부하(A) x 작업빈도(B))
+부하옵션 = [
+    "",
+    "매우쉬움(1)", 
+    "쉬움(2)", 
+    "약간 힘듦(3)", 
+    "힘듦(4)", 
+    "매우 힘듦(5)"
+]
+빈도옵션 = [
+    "",
+    "3개월마다(1)", 
+    "가끔(2)", 
+    "자주(3)", 
+    "계속(4)", 
+    "초과근무(5)"
+]
+부하점수 = {label: i for i, label in enumerate(부하옵션)}
+빈도점수 = {label: i for i, label in enumerate(빈도옵션)}
+
+# 위험도 구간 (총점 상한, 라벨)
+RISK_BANDS = [(0, "미평가"), (4, "낮음"), (9, "보통"), (15, "높음"), (25, "매우높음")]
+
+def score_column(values, lookup):
+    """옵션 라벨을 점수로 변환 (목록에 없는 값은 괄호 안 숫자, 빈 값은 0)"""
+    values = pd.Series(values)
+    scores = values.map(lookup)
+    unmapped = scores.isna() & values.notna()
+    if unmapped.any():
+        extracted = values[unmapped].astype(str).str.extract(r"\((\d+)\)", expand=False)
+        scores[unmapped] = pd.to_numeric(extracted, errors="coerce")
+    return scores.fillna(0).astype(int)
+
+def calculate_total_scores(df):
+    """작업조건 표 전체의 총점을 한 번에 계산"""
+    if df.empty or "작업부하(A)" not in df.columns or "작업빈도(B)" not in df.columns:
+        return pd.Series(0, index=df.index, dtype=int)
+    부하 = score_column(df["작업부하(A)"].to_numpy(), 부하점수)
+    빈도 = score_column(df["작업빈도(B)"].to_numpy(), 빈도점수)
+    return pd.Series((부하 * 빈도).to_numpy(), index=df.index)
+
+def classify_risk_band(scores):
+    """총점을 위험도 구간 라벨로 변환"""
+    bins = [-1] + [upper for upper, _ in RISK_BANDS]
+    labels = [label for _, label in RISK_BANDS]
+    return pd.cut(pd.Series(scores), bins=bins, labels=labels).astype(object).fillna(labels[-1]).to_numpy()
+
+def summarize_scores(df, group_columns):
+    """그룹(반 등)별 총점 요약 (단위작업 수, 평균/최대/합계, 위험도 구간별 개수)"""
+    labels = [label for _, label in RISK_BANDS]
+    scored = df[group_columns].copy()
+    scored["총점"] = calculate_total_scores(df).to_numpy()
+    bands = pd.get_dummies(pd.Categorical(classify_risk_band(scored["총점"]), categories=labels)).astype(int)
+    bands.index = scored.index
+    scored = pd.concat([scored, bands], axis=1)
+    
+    aggregations = {
+        "단위작업수": ("총점", "size"),
+        "평균총점": ("총점", "mean"),
+        "최대총점": ("총점", "max"),
+        "총점합계": ("총점", "sum"),
+    }
+    aggregations.update({label: (label, "sum") for label in labels})
+    return scored.groupby(group_columns, sort=False).agg(**aggregations).reset_index()
+
+# 사업장 전체 위험도 일괄 평가
+def collect_작업조건_tables(state):
+    """반 저장소에서 체크리스트에 있는 반의 작업조건 표 수집 {반경로: DataFrame}"""
+    tables = {}
+    for 경로 in get_반경로_목록(state):
+        기록 = find_반기록(state, 경로)
+        if 기록 is not None and validate_dataframe(기록.작업조건):
+            tables[경로] = 기록.작업조건
+    return tables
+
+def build_risk_ranking(작업조건_tables, checklist_df):
+    """모든 반의 작업조건을 한 번에 평가하여 총점/부담작업 수 기준 순위표 생성"""
+    ranking_columns = ["순위", "회사명", "소속", "반", "단위작업명", "작업부하(A)", "작업빈도(B)",
+                       "총점", "위험도", "부담작업수", "잠재위험수", "부담작업(호)"]
+    frames = [
+        df[[col for col in ["단위작업명", "작업부하(A)", "작업빈도(B)"] if col in df.columns]].assign(
+            회사명=경로.회사명, 소속=경로.소속, 반=경로.반
+        )
+        for 경로, df in 작업조건_tables.items() if not df.empty and "단위작업명" in df.columns
+    ]
+    if not frames:
+        return pd.DataFrame(columns=ranking_columns)
+    
+    tasks = pd.concat(frames, ignore_index=True)
+    tasks = tasks[tasks["단위작업명"].notna() & (tasks["단위작업명"].astype(str) != "")]
+    for col in ["작업부하(A)", "작업빈도(B)"]:
+        if col not in tasks.columns:
+            tasks[col] = ""
+    
+    # 체크리스트와 (회사명, 소속, 반, 단위작업명)으로 연결하여 부담작업 정보 추가
+    if validate_dataframe(checklist_df) and not checklist_df.empty:
+        keys = ["회사명", "소속", "반", "단위작업명"]
+        checklist = checklist_df.drop_duplicates(subset=keys)
+        matrix = encode_ho_matrix(checklist)
+        hazards = pd.DataFrame({
+            col: ["" if pd.isna(v) else str(v) for v in checklist[col]] for col in keys
+        }).assign(
+            부담작업수=(matrix == 3).sum(axis=1),
+            잠재위험수=(matrix == 2).sum(axis=1),
+            **{"부담작업(호)": classify_부담작업(matrix)}
+        )
+        tasks = tasks.merge(hazards, on=keys, how="left")
+    
+    for col, default in [("부담작업수", 0), ("잠재위험수", 0), ("부담작업(호)", "")]:
+        if col not in tasks.columns:
+            tasks[col] = default
+    tasks["부담작업(호)"] = tasks["부담작업(호)"].fillna("")
+    tasks[["부담작업수", "잠재위험수"]] = tasks[["부담작업수", "잠재위험수"]].fillna(0).astype(int)
+    
+    tasks["총점"] = calculate_total_scores(tasks).to_numpy()
+    tasks["위험도"] = classify_risk_band(tasks["총점"])
+    tasks = tasks.sort_values(["총점", "부담작업수", "잠재위험수"], ascending=False, kind="mergesort").reset_index(drop=True)
+    
+    # 동점(총점/부담작업수/잠재위험수가 모두 같은 경우)은 같은 순위
+    keys = tasks[["총점", "부담작업수", "잠재위험수"]].to_numpy()
+    new_rank = np.ones(len(keys), dtype=bool)
+    new_rank[1:] = (keys[1:] != keys[:-1]).any(axis=1)
+    tasks["순위"] = np.maximum.accumulate(np.where(new_rank, np.arange(1, len(keys) + 1), 0)) if len(keys) else []
+    return tasks[ranking_columns]
+
+def summarize_risk_ranking(ranking, group_columns):
+    """순위표를 회사/소속/반 단위로 요약"""
+    if ranking.empty:
+        return pd.DataFrame(columns=group_columns)
+    summary = summarize_scores(ranking, group_columns)
+    counts = ranking.groupby(group_columns, sort=False)[["부담작업수", "잠재위험수"]].sum().reset_index()
+    return summary.merge(counts, on=group_columns).sort_values(["최대총점", "총점합계"], ascending=False).reset_index(drop=True)
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def load_saved_risk_inputs(backend, session_id, filename, saved_at):
+    """저장된 세션에서 위험도 평가용 작업조건 표와 체크리스트 읽기 (saved_at이 바뀌면 다시 읽음)"""
+    _, sheets = read_saved_session({"backend": backend, "session_id": session_id, "filename": filename})
+    checklist_df = normalize_checklist(sheets["체크리스트"][0][1]) if "체크리스트" in sheets else pd.DataFrame()
+    반_시트 = resolve_반_시트(sheets, checklist_df)
+    작업조건_tables = {
+        경로: parts[0][1]
+        for sheet_name, parts in sheets.items() if sheet_name.startswith("작업조건_")
+        for 경로 in 반_시트.get(sheet_name[len("작업조건_"):], [])
+    }
+    return 작업조건_tables, checklist_df
+
+# 단위작업명 병합 함수
+def merge_unit_works(selected_indices, checklist_df, merge_name):
+    """선택된 단위작업들을 하나로 병합"""
+    if not selected_indices or not merge_name:
+        return checklist_df
+    return merge_unit_work_groups(checklist_df, [(selected_indices, merge_name)])
+
+def merge_unit_work_groups(checklist_df, groups):
+    """여러 병합 그룹 [(행 위치 목록, 병합 후 단위작업명), ...]을 한 번에 적용
+    
+    그룹마다 첫 번째 행 위치에 병합된 행을 두고, 부담작업 정보는 호별로 가장 높은 수준을 선택한다.
+    """
+    n = len(checklist_df)
+    group_ids = np.arange(n)
+    names = checklist_df["단위작업명"].to_numpy(dtype=object).copy()
+    for number, (positions, merge_name) in enumerate(groups):
+        positions = [pos for pos in positions if 0 <= pos < n]
+        if not positions or not merge_name:
+            continue
+        group_ids[positions] = n + number
+        names[positions] = merge_name
+    if (group_ids < n).all():
+        return checklist_df
+    
+    df = checklist_df.reset_index(drop=True).assign(단위작업명=names)
+    levels = pd.DataFrame(encode_ho_matrix(df), columns=HO_COLUMNS)
+    grouped = pd.concat([df.drop(columns=HO_COLUMNS, errors="ignore"), levels], axis=1).groupby(group_ids, sort=False)
+    merged = pd.concat([grouped[[c for c in df.columns if c not in HO_COLUMNS]].first(), grouped[HO_COLUMNS].max()], axis=1)
+    for col in HO_COLUMNS:
+        merged[col] = pd.Categorical.from_codes(merged[col].to_numpy() - 1, dtype=HO_DTYPE)
+    return merged[list(df.columns)].reset_index(drop=True)
+
+# 유사 단위작업 찾기 (반별로 나눈 뒤 문자 2-gram 색인으로 후보 쌍만 비교)
+UNIT_WORK_SIMILARITY = 0.8    # 기본 유사도 기준 (2-gram Dice 계수)
+UNIT_WORK_MAX_POSTINGS = 200  # 한 반에서 이보다 많은 단위작업에 나오는 2-gram은 후보 생성에 사용하지 않음
+
+def normalize_unit_work_names(names):
+    """비교용 단위작업명 (공백/기호 제거, 소문자)"""
+    return pd.Series(names, dtype=object).fillna("").astype(str).str.lower().str.replace(r"[\W_]+", "", regex=True)
+
+def name_bigrams(name):
+    return {name[i:i + 2] for i in range(len(name) - 1)} if len(name) > 1 else {name}
+
+def find_similar_unit_works(checklist_df, threshold=UNIT_WORK_SIMILARITY):
+    """같은 회사명/소속/반 안에서 이름이 같거나 비슷한 단위작업 그룹 제안
+    
+    [(행 위치 목록, 대표 단위작업명), ...] 반환 (대표 이름은 그룹에서 가장 많이 쓰인 원래 이름)
+    """
+    if checklist_df.empty:
+        return []
+    df = checklist_df.reset_index(drop=True)
+    normalized = normalize_unit_work_names(df["단위작업명"])
+    rows = df.loc[normalized != ""]
+    
+    # 반 단위 블록 + 정규화 이름별 번호 (같은 블록의 같은 정규화 이름은 처음부터 한 그룹)
+    keys = pd.DataFrame({
+        "블록": rows.groupby(["회사명", "소속", "반"], sort=False, dropna=False).ngroup().to_numpy(),
+        "이름": normalized[rows.index].to_numpy(),
+    })
+    name_ids = keys.groupby(["블록", "이름"], sort=False).ngroup().to_numpy()
+    uniques = keys.drop_duplicates().reset_index(drop=True)
+    parent = list(range(len(uniques)))
+    
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+    
+    for _, block in uniques.groupby("블록", sort=False):
+        if len(block) < 2:
+            continue
+        ids = block.index.to_numpy()
+        grams = [name_bigrams(name) for name in block["이름"]]
+        
+        # 2-gram 역색인으로 후보 쌍만 구성 (너무 흔한 2-gram은 제외)
+        postings = {}
+        for local, gram_set in enumerate(grams):
+            for gram in gram_set:
+                postings.setdefault(gram, []).append(local)
+        candidates = set()
+        for members in postings.values():
+            if 1 < len(members) <= UNIT_WORK_MAX_POSTINGS:
+                candidates.update(itertools.combinations(members, 2))
+        
+        for a, b in candidates:
+            shared = len(grams[a] & grams[b])
+            if 2 * shared >= threshold * (len(grams[a]) + len(grams[b])):
+                parent[find(ids[a])] = find(ids[b])
+    
+    # 행별 그룹 번호 → 2행 이상인 그룹만 제안
+    roots = np.array([find(i) for i in range(len(uniques))], dtype=np.int64)
+    members = pd.DataFrame({
+        "그룹": roots[name_ids],
+        "위치": rows.index.to_numpy(),
+        "이름": rows["단위작업명"].astype(str).str.strip().to_numpy(),
+    })
+    members = members[members.groupby("그룹")["위치"].transform("size") >= 2]
+    if members.empty:
+        return []
+    name_counts = members.groupby(["그룹", "이름"], sort=False).size().sort_values(ascending=False, kind="stable")
+    representatives = name_counts.reset_index().drop_duplicates("그룹").set_index("그룹")["이름"]
+    positions = members.groupby("그룹", sort=False)["위치"].agg(list)
+    return [(rows_in_group, representatives[group]) for group, rows_in_group in positions.items()]
+
+# 증상조사 설문 원자료 (응답자 1명당 1행) 집계
+증상_부위 = ["목", "어깨", "팔/팔꿈치", "손/손목/손가락", "허리", "다리/발"]
+증상_척도 = {
+    "기간": ["1일 미만", "1일~1주일 미만", "1주일~1달 미만", "1달~6개월 미만", "6개월 이상"],
+    "강도": ["약한 통증", "중간 통증", "심한 통증", "매우 심한 통증"],
+    "빈도": ["6개월에 1번", "2~3달에 1번", "1달에 1번", "1주일에 1번", "매일"],
+}
+육체적부담_척도 = ["전혀 힘들지 않음", "견딜만 함", "약간 힘듦", "힘듦", "매우 힘듦"]
+증상_판정 = ["정상", "관리대상자", "통증호소자"]
+증상조사_원자료_컬럼 = ["반", "나이", "성별", "근속년수", "현재작업기간", "이전작업기간", "육체적부담"] + [
+    f"{부위}_{항목}" for 부위 in 증상_부위 for 항목 in 증상_척도
+]
+
+def normalize_survey_label(value):
+    return "".join(ch for ch in str(value) if not ch.isspace() and ch not in "~-_.")
+
+def encode_survey_scale(series, labels):
+    """응답값(보기 문구 또는 1부터 시작하는 번호)을 척도 번호로 변환 (응답 없음/인식 불가는 0)"""
+    codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    lookup = {normalize_survey_label(label): idx + 1 for idx, label in enumerate(labels)}
+    mapped = np.zeros(len(uniques) + 1, dtype=np.int8)
+    for idx, value in enumerate(uniques):
+        text = normalize_survey_label(value)
+        number = pd.to_numeric(text, errors="coerce")
+        if text in lookup:
+            mapped[idx] = lookup[text]
+        elif pd.notna(number) and 1 <= number <= len(labels) and float(number).is_integer():
+            mapped[idx] = int(number)
+        elif text[:1].isdigit() and text[1:] and text[1:] in lookup:
+            mapped[idx] = lookup[text[1:]]
+    return mapped[codes]  # 결측치(-1)는 마지막 칸(0)을 참조
+
+def classify_symptoms(survey):
+    """부위별 증상 판정 (0: 정상, 1: 관리대상자, 2: 통증호소자, 상호배타)
+    
+    관리대상자: 통증 기간 1주일 이상 또는 빈도 1달에 1번 이상이면서 강도가 중간 통증 이상
+    통증호소자: 관리대상자 중 강도가 심한 통증 이상
+    """
+    result = {}
+    for 부위 in 증상_부위:
+        scale = {
+            항목: encode_survey_scale(survey[f"{부위}_{항목}"], labels) if f"{부위}_{항목}" in survey.columns
+            else np.zeros(len(survey), dtype=np.int8)
+            for 항목, labels in 증상_척도.items()
+        }
+        관리대상 = ((scale["기간"] >= 3) | (scale["빈도"] >= 3)) & (scale["강도"] >= 2)
+        result[부위] = 관리대상.astype(np.int8) + (관리대상 & (scale["강도"] >= 3)).astype(np.int8)
+    판정 = pd.DataFrame(result, index=survey.index)
+    판정["전체"] = 판정.max(axis=1) if len(판정) else pd.Series(dtype=np.int8)
+    return 판정
+
+def read_symptom_survey(uploaded_file):
+    """CSV/xlsx 설문 원자료 읽기 (컬럼명 앞뒤 공백 제거)"""
+    name = getattr(uploaded_file, "name", str(uploaded_file)).lower()
+    if name.endswith(".csv"):
+        data = uploaded_file.getvalue() if hasattr(uploaded_file, "getvalue") else open(uploaded_file, "rb").read()
+        try:
+            survey = pd.read_csv(BytesIO(data), encoding="utf-8-sig", dtype={"반": str})
+        except UnicodeDecodeError:
+            survey = pd.read_csv(BytesIO(data), encoding="cp949", dtype={"반": str})
+    else:
+        survey = pd.read_excel(uploaded_file, dtype={"반": str})
+    survey.columns = [str(col).strip() for col in survey.columns]
+    if "반" not in survey.columns:
+        raise ValueError("'반' 컬럼이 없습니다.")
+    return survey
+
+def format_count_table(df):
+    """집계표를 data_editor 입력 형식(문자열)으로 변환"""
+    return df.apply(lambda col: col.map(lambda v: "" if pd.isna(v) else (f"{v:.1f}" if isinstance(v, float) else str(v))))
+
+def aggregate_symptom_survey(survey, 반_목록=None):
+    """응답자 단위 설문을 반별 기초현황/작업기간/육체적부담/통증호소자 표로 집계"""
+    survey = survey.reset_index(drop=True)
+    반 = survey["반"].astype(str).str.strip()
+    반_순서 = [str(b) for b in (반_목록 or [])]
+    반_순서 += [b for b in pd.unique(반) if b not in set(반_순서)]
+    
+    # 기초현황
+    성별 = survey["성별"].astype(str).str.strip().str[:1] if "성별" in survey.columns else pd.Series("", index=survey.index)
+    기초 = pd.DataFrame({
+        "반": 반,
+        "나이": pd.to_numeric(survey.get("나이"), errors="coerce") if "나이" in survey.columns else np.nan,
+        "근속년수": pd.to_numeric(survey.get("근속년수"), errors="coerce") if "근속년수" in survey.columns else np.nan,
+        "남자(명)": 성별.isin(["남", "M", "m", "1"]).astype(int),
+        "여자(명)": 성별.isin(["여", "F", "f", "2"]).astype(int),
+    })
+    기초현황 = 기초.groupby("반", sort=False).agg(**{
+        "응답자(명)": ("반", "size"), "나이": ("나이", "mean"), "근속년수": ("근속년수", "mean"),
+        "남자(명)": ("남자(명)", "sum"), "여자(명)": ("여자(명)", "sum"),
+    }).reindex(반_순서)
+    기초현황[["응답자(명)", "남자(명)", "여자(명)"]] = 기초현황[["응답자(명)", "남자(명)", "여자(명)"]].fillna(0).astype(int)
+    # 성별 무응답/미인식 응답자도 합계에 포함
+    기초현황["합계"] = 기초현황["응답자(명)"]
+    기초현황 = 기초현황.rename_axis("반").reset_index()
+    
+    # 작업기간 (년 단위 숫자를 구간으로 집계)
+    def 기간_분포(column, prefix):
+        labels = [f"{prefix}<1년", f"{prefix}<3년", f"{prefix}<5년", f"{prefix}≥5년"]
+        years = pd.to_numeric(survey[column], errors="coerce") if column in survey.columns else pd.Series(np.nan, index=survey.index)
+        bins = pd.cut(years, [-np.inf, 1, 3, 5, np.inf], right=False, labels=labels)
+        counts = pd.crosstab(반, bins, dropna=False).reindex(index=반_순서, columns=labels, fill_value=0)
+        counts[f"{prefix}무응답"] = years.isna().groupby(반).sum().reindex(반_순서, fill_value=0)
+        counts[f"{prefix}합계"] = counts.sum(axis=1)
+        return counts.astype(int)
+    작업기간 = pd.concat([기간_분포("현재작업기간", ""), 기간_분포("이전작업기간", "이전")], axis=1)
+    작업기간 = 작업기간.rename_axis("반").reset_index()
+    
+    # 육체적 부담정도
+    부담 = encode_survey_scale(survey["육체적부담"], 육체적부담_척도) if "육체적부담" in survey.columns else np.zeros(len(survey), dtype=np.int8)
+    육체적부담 = pd.crosstab(반, 부담).reindex(index=반_순서, columns=range(1, 6), fill_value=0)
+    육체적부담.columns = 육체적부담_척도
+    육체적부담["합계"] = 육체적부담.sum(axis=1)
+    육체적부담 = 육체적부담.astype(int).rename_axis("반").reset_index()
+    
+    # 통증호소자 분포 (반별 정상/관리대상자/통증호소자 3행)
+    판정 = classify_symptoms(survey)
+    부위_컬럼 = 증상_부위 + ["전체"]
+    분포 = pd.concat(
+        {부위: pd.crosstab(반, 판정[부위]).reindex(index=반_순서, columns=range(3), fill_value=0).stack() for 부위 in 부위_컬럼},
+        axis=1
+    ).astype(int)
+    분포.index = 분포.index.set_names(["반", "판정"])
+    통증호소자 = 분포.reset_index()
+    통증호소자["구분"] = 통증호소자["판정"].map(dict(enumerate(증상_판정)))
+    통증호소자["반"] = 통증호소자["반"].where(통증호소자["판정"] == 0, "")
+    통증호소자 = 통증호소자[["반", "구분"] + 부위_컬럼]
+    
+    return {
+        "기초현황": format_count_table(기초현황),
+        "작업기간": format_count_table(작업기간),
+        "육체적부담": format_count_table(육체적부담),
+        "통증호소자": format_count_table(통증호소자),
+    }
+
+# 증상조사 입력 표 (반 목록 기준으로 필요한 행만 추가/삭제)
+증상조사_표_컬럼 = {
+    "기초현황": ["반", "응답자(명)", "나이", "근속년수", "남자(명)", "여자(명)", "합계"],
+    "작업기간": ["반", "<1년", "<3년", "<5년", "≥5년", "무응답", "합계", "이전<1년", "이전<3년", "이전<5년", "이전≥5년", "이전무응답", "이전합계"],
+    "육체적부담": ["반"] + 육체적부담_척도 + ["합계"],
+    "통증호소자": ["반", "구분"] + 증상_부위 + ["전체"],
+}
+
+def build_symptom_rows(name, 반_목록):
+    """반 목록에 대한 빈 입력 행 생성 (통증호소자 표는 반마다 정상/관리대상자/통증호소자 3행)"""
+    columns = 증상조사_표_컬럼[name]
+    if name == "통증호소자":
+        df = pd.DataFrame("", index=range(len(반_목록) * 3), columns=columns)
+        df["반"] = [반 if i == 0 else "" for 반 in 반_목록 for i in range(3)]
+        df["구분"] = 증상_판정 * len(반_목록)
+        return df
+    df = pd.DataFrame("", index=range(len(반_목록)), columns=columns)
+    df["반"] = list(반_목록)
+    if name == "기초현황":
+        df["나이"] = "평균(세)"
+        df["근속년수"] = "평균(년)"
+    return df
+
+def sync_symptom_table(name, df, 반_목록, 이전_반_목록):
+    """저장된 표에서 없어진 반의 행은 빼고 새 반의 행만 추가 (입력된 값과 직접 추가한 행은 유지)"""
+    if not validate_dataframe(df) or df.empty:
+        return build_symptom_rows(name, 반_목록 or ([] if name == "통증호소자" else ["", "", ""]))
+    df = df.reindex(columns=증상조사_표_컬럼[name])
+    반 = df["반"].where(df["반"].notna() & (df["반"].astype(str) != ""))
+    if name == "통증호소자":
+        반 = 반.ffill()  # 반 이름은 각 반의 첫 행에만 있음
+    반 = 반.fillna("").astype(str)
+    removed = {str(b) for b in 이전_반_목록} - {str(b) for b in 반_목록}
+    value_columns = [col for col in df.columns if col not in ("반", "구분")]
+    untouched = df[value_columns].fillna("").astype(str).isin(["", "평균(세)", "평균(년)"]).all(axis=1)
+    # 반 목록이 생기면 반 없이 만들어 둔 빈 입력 행은 제거
+    kept = df[~(반.isin(removed) | ((반 == "") & untouched & bool(반_목록)))]
+    existing = set(반)
+    added = [b for b in 반_목록 if str(b) not in existing]
+    if added:
+        kept = pd.concat([kept, build_symptom_rows(name, added)], ignore_index=True)
+    return kept.reset_index(drop=True)
+
+# 전체 Excel 보고서 (write-only 모드로 행 단위 스트리밍)
+SHEET_NAME_INVALID_CHARS = str.maketrans({c: "_" for c in '[]:*?/\\'})
+
+def make_sheet_name(name, used, max_length=31):
+    """Excel 시트명 규칙(31자, 특수문자 제외)에 맞추고 중복 시 번호 부여 (접두사를 붙일 경우 max_length로 여유 확보)"""
+    base = str(name).translate(SHEET_NAME_INVALID_CHARS)[:max_length] or "Sheet"
+    sheet_name, n = base, 2
+    while sheet_name.lower() in used:
+        suffix = f"~{n}"
+        sheet_name, n = base[:max_length - len(suffix)] + suffix, n + 1
+    used.add(sheet_name.lower())
+    return sheet_name
+
+def report_value(value):
+    """Excel 셀에 쓸 수 있는 값으로 변환"""
+    if value is None:
+        return None
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, ensure_ascii=False)
+    if hasattr(value, "item"):
+        value = value.item()
+    if isinstance(value, float) and np.isnan(value):
+        return None
+    if isinstance(value, (str, int, float, bool, datetime)):
+        return value
+    return str(value)
+
+def dataframe_rows(df, prefix=None):
+    """DataFrame을 헤더 + 행 단위로 생성 (prefix는 각 행 앞에 붙일 값 {컬럼명: 값})"""
+    prefix = prefix or {}
+    yield list(prefix) + [str(col) for col in df.columns]
+    prefix_values = [report_value(v) for v in prefix.values()]
+    for row in df.itertuples(index=False, name=None):
+        yield prefix_values + [report_value(v) for v in row]
+
+def iter_report_sheets(state):
+    """보고서 시트를 (시트명, 행 생성기, 헤더 여부) 순서로 생성 (state는 세션 상태 또는 그 사본)"""
+    경로_목록 = get_반경로_목록(state)
+    
+    # 사업장 개요
+    yield "사업장개요", iter([["항목", "내용"]] + [
+        [label, str(state.get(key, "") or "")]
+        for label, key in [("사업장명", "사업장명"), ("소재지", "소재지"), ("업종", "업종"), ("예비조사일", "예비조사"),
+                           ("본조사일", "본조사"), ("수행기관", "수행기관"), ("성명", "성명")]
+    ]), True
+    
+    # 체크리스트
+    checklist_df = state.get("checklist_df")
+    if validate_dataframe(checklist_df) and not checklist_df.empty:
+        yield "체크리스트", dataframe_rows(checklist_to_labels(checklist_df)), True
+    
+    # 유해요인조사표 (반별)
+    for 경로 in 경로_목록:
+        values = read_반_입력값(state, 경로)
+        rows = [
+            ["조사개요"],
+            ["회사명", 경로.회사명],
+            ["소속", 경로.소속],
+            ["조사일시", values["조사일시"]],
+            ["부서명", values["부서명"]],
+            ["조사자", values["조사자"]],
+            ["작업공정명", values["작업공정명"]],
+            ["작업명(반)", values["작업명"]],
+            [],
+            ["작업장 상황조사"],
+            ["항목", "상태", "세부사항"],
+        ]
+        rows += [[항목, values[f"{항목}_상태"], values[f"{항목}_세부사항"]] for 항목 in 상황조사_항목]
+        yield f"유해요인_{경로.반}", iter(rows), False
+    
+    # 작업조건조사 (1단계/3단계 개요)
+    def 작업조건_개요_rows():
+        yield ["회사명", "소속", "반", "작업공정", "작업내용", "작업명(반)", "근로자수", "사진 설명"]
+        for 경로 in 경로_목록:
+            사진_설명 = [
+                str(state.get(반_키(f"사진_{i}_설명", 경로), "") or "")
+                for i in range(1, int(state.get(반_키("사진개수", 경로), 0) or 0) + 1)
+            ]
+            yield [
+                경로.회사명,
+                경로.소속,
+                경로.반,
+                *(state.get(반_키(필드, 경로), "") for 필드 in 평가_필드),
+                " / ".join(설명 for 설명 in 사진_설명 if 설명),
+            ]
+    yield "작업조건_개요", 작업조건_개요_rows(), True
+    
+    # 작업조건조사 (2단계 작업부하/작업빈도, 총점 계산)
+    작업조건_tables = collect_작업조건_tables(state)
+    def 작업조건_rows():
+        yield ["회사명", "소속", "반", "단위작업명", "부담작업(호)", "작업부하(A)", "작업빈도(B)", "총점", "위험도"]
+        columns = ["단위작업명", "부담작업(호)", "작업부하(A)", "작업빈도(B)"]
+        frames = [
+            df.reindex(columns=columns).assign(회사명=경로.회사명, 소속=경로.소속, 반=경로.반)
+            for 경로, df in 작업조건_tables.items() if not df.empty
+        ]
+        if not frames:
+            return
+        scored = pd.concat(frames, ignore_index=True)[["회사명", "소속", "반"] + columns].fillna("")
+        scored["총점"] = calculate_total_scores(scored).to_numpy()
+        scored["위험도"] = classify_risk_band(scored["총점"])
+        rows = dataframe_rows(scored)
+        next(rows)
+        yield from rows
+    yield "작업조건조사", 작업조건_rows(), True
+    
+    # 위험도 순위
+    위험도_순위 = build_risk_ranking(작업조건_tables, checklist_df)
+    if not 위험도_순위.empty:
+        yield "위험도순위", dataframe_rows(위험도_순위), True
+    
+    # 원인분석 (반별 항목)
+    def 원인분석_rows():
+        columns = ["단위작업명", "부담작업호", "유형", "부담작업", "비고"]
+        yield ["회사명", "소속", "반"] + columns
+        for 경로 in 경로_목록:
+            기록 = find_반기록(state, 경로)
+            for entry in (기록.원인분석 if 기록 is not None else None) or []:
+                yield list(경로) + [report_value(entry.get(col, "")) for col in columns]
+    yield "원인분석", 원인분석_rows(), True
+    
+    # 정밀조사
+    def 정밀조사_rows():
+        yield ["조사명", "작업공정명", "작업명", "작업분석 및 평가도구", "분석결과", "만점"]
+        for 조사명 in state.get("정밀조사_목록", []) or []:
+            개요 = [조사명, state.get(f"정밀_작업공정명_{조사명}", ""), state.get(f"정밀_작업명_{조사명}", "")]
+            원인분석_df = state.get(f"정밀_원인분석_data_{조사명}")
+            if not validate_dataframe(원인분석_df) or 원인분석_df.empty:
+                yield 개요 + ["", "", ""]
+                continue
+            for row in 원인분석_df.reindex(columns=["작업분석 및 평가도구", "분석결과", "만점"]).itertuples(index=False, name=None):
+                yield 개요 + [report_value(v) for v in row]
+    if state.get("정밀조사_목록"):
+        yield "정밀조사", 정밀조사_rows(), True
+    
+    # 증상조사 분석
+    for 시트명, 키 in [("기초현황", "기초현황_data_저장"), ("작업기간", "작업기간_data_저장"),
+                     ("육체적부담", "육체적부담_data_저장"), ("통증호소자", "통증호소자_data_저장")]:
+        df = state.get(키)
+        if validate_dataframe(df) and not df.empty:
+            yield f"증상_{시트명}", dataframe_rows(df), True
+    
+    # 작업환경개선계획서
+    df = state.get("개선계획_data_저장")
+    if validate_dataframe(df) and not df.empty:
+        yield "개선계획서", dataframe_rows(df), True
+    
+    # 사진 목록
+    사진_df = build_photo_table(state)
+    if not 사진_df.empty:
+        yield "사진", dataframe_rows(사진_df), True
+
+def write_report_workbook(target, state, progress=None):
+    """전체 보고서를 write-only 통합문서로 스트리밍 기록 (시트별 행을 메모리에 모으지 않음)"""
+    workbook = Workbook(write_only=True)
+    header_font = Font(bold=True)
+    used = set()
+    for name, rows, has_header in iter_report_sheets(state):
+        if progress is not None:
+            progress(name)
+        worksheet = workbook.create_sheet(make_sheet_name(name, used))
+        for row_idx, row in enumerate(rows):
+            if row_idx == 0 and has_header:
+                cells = []
+                for value in row:
+                    cell = WriteOnlyCell(worksheet, value=value)
+                    cell.font = header_font
+                    cells.append(cell)
+                worksheet.append(cells)
+            else:
+                worksheet.append(row)
+    workbook.save(target)
 
-# 단위작업명 병합 함수
-def merge_unit_works(selected_indices, checklist_df, merge_name):
-    """선택된 단위작업들을 하나로 병합"""
-    if not selected_indices or not merge_name:
-        return checklist_df
+# PDF 보고서
+def register_pdf_font():
+    """한글 글꼴을 프로세스당 한 번만 등록하고 글꼴 이름 반환 (reportlab 글꼴 등록부는 프로세스 전역)"""
+    registered = pdfmetrics.getRegisteredFontNames()
+    if "WMSD-Korean" in registered:
+        return "WMSD-Korean"
+    if PDF_FALLBACK_FONT in registered:
+        return PDF_FALLBACK_FONT
+    for path in PDF_FONT_CANDIDATES:
+        if path and os.path.exists(path):
+            try:
+                pdfmetrics.registerFont(TTFont("WMSD-Korean", path))
+                return "WMSD-Korean"
+            except Exception:
+                continue
+    pdfmetrics.registerFont(UnicodeCIDFont(PDF_FALLBACK_FONT))
+    return PDF_FALLBACK_FONT
+
+@st.cache_resource
+def get_pdf_templates():
+    """섹션별 문단/표 스타일을 한 번만 구성해 재사용"""
+    font_name = register_pdf_font()
+    base = getSampleStyleSheet()
+    paragraph = {
+        "title": ParagraphStyle("WMSDTitle", parent=base["Title"], fontName=font_name, fontSize=20, leading=26, alignment=TA_CENTER),
+        "subtitle": ParagraphStyle("WMSDSubtitle", parent=base["Normal"], fontName=font_name, fontSize=12, leading=18, alignment=TA_CENTER),
+        "heading": ParagraphStyle("WMSDHeading", parent=base["Heading2"], fontName=font_name, fontSize=13, leading=18, spaceBefore=6, spaceAfter=6),
+        "cell": ParagraphStyle("WMSDCell", parent=base["Normal"], fontName=font_name, fontSize=7.5, leading=9.5),
+    }
+    grid = [
+        ("FONTNAME", (0, 0), (-1, -1), font_name),
+        ("FONTSIZE", (0, 0), (-1, -1), 7.5),
+        ("VALIGN", (0, 0), (-1, -1), "TOP"),
+        ("GRID", (0, 0), (-1, -1), 0.25, colors.grey),
+        ("LEFTPADDING", (0, 0), (-1, -1), 3),
+        ("RIGHTPADDING", (0, 0), (-1, -1), 3),
+    ]
+    table = {
+        "header": TableStyle(grid + [
+            ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#DDE4EE")),
+            ("ALIGN", (0, 0), (-1, 0), "CENTER"),
+        ]),
+        "form": TableStyle(grid + [
+            ("BACKGROUND", (0, 0), (0, -1), colors.HexColor("#F0F0F0")),
+        ]),
+    }
+    return {"font": font_name, "paragraph": paragraph, "table": table}
+
+def pdf_escape(value):
+    """문단(Paragraph) 마크업으로 해석되지 않도록 &, <, > 이스케이프"""
+    text = "" if value is None else str(value)
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+def pdf_cell(value, cell_style, wrap_length=24):
+    """짧은 값은 문자열 그대로, 긴 값만 줄바꿈 문단으로 변환 (문단 생성 비용 최소화)"""
+    text = "" if value is None else str(value)
+    if len(text) <= wrap_length:
+        return text
+    return Paragraph(pdf_escape(text), cell_style)
+
+def pdf_column_widths(rows, available_width, sample_size=200):
+    """앞부분 행의 글자 수 비율로 열 너비 배분"""
+    sample = rows[:sample_size]
+    column_count = max((len(row) for row in sample), default=1)
+    lengths = [4] * column_count
+    for row in sample:
+        for i, value in enumerate(row):
+            lengths[i] = max(lengths[i], min(len("" if value is None else str(value)), 40))
+    total = float(sum(lengths))
+    return [available_width * length / total for length in lengths]
+
+def iter_pdf_tables(rows, has_header, templates, available_width):
+    """시트 행을 최대 PDF_TABLE_CHUNK_ROWS 행씩 LongTable로 분할 (헤더는 페이지마다 반복)"""
+    rows = iter(rows)
+    header = next(rows, None) if has_header else None
+    cell_style = templates["paragraph"]["cell"]
+    style = templates["table"]["header" if has_header else "form"]
+    chunk = []
     
-    # 선택된 행들의 데이터 가져오기
-    selected_rows = checklist_df.iloc[selected_indices]
+    def make_table(chunk_rows):
+        data = ([header] if header is not None else []) + chunk_rows
+        column_count = max(len(row) for row in data)
+        data = [list(row) + [""] * (column_count - len(row)) for row in data]
+        widths = pdf_column_widths(data, available_width)
+        data = [[pdf_cell(value, cell_style) for value in row] for row in data]
+        return LongTable(data, colWidths=widths, repeatRows=1 if header is not None else 0, style=style)
     
-    # 첫 번째 행을 기준으로 병합
-    merged_row = selected_rows.iloc[0].copy()
-    merged_row["단위작업명"] = merge_name
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= PDF_TABLE_CHUNK_ROWS:
+            yield make_table(chunk)
+            chunk = []
+    if chunk or header is not None:
+        yield make_table(chunk)
+
+def iter_pdf_photos(state, templates, available_width):
+    """연결된 사진을 보고서용 축소본으로 배치"""
+    paragraph = templates["paragraph"]
+    max_width, max_height = available_width / 2, 3.2 * inch
+    for record in iter_photo_records(state):
+        if not record["파일"] or not os.path.exists(get_photo_path(record["파일"])):
+            continue
+        photo_path = ensure_photo_rendition(record["파일"], "report")
+        with Image.open(photo_path) as image:
+            width, height = image.size
+        scale = min(max_width / width, max_height / height)
+        대상 = " > ".join(str(v) for v in (record["회사명"], record["소속"], record["대상"]) if v)
+        caption = f"{record['구분']} - {대상} 사진 {record['순번']}"
+        flowables = [Paragraph(pdf_escape(caption), paragraph["cell"]), PDFImage(photo_path, width * scale, height * scale)]
+        if record["설명"]:
+            flowables.append(pdf_cell(record["설명"], paragraph["cell"], wrap_length=0))
+        flowables.append(Spacer(1, 0.15 * inch))
+        yield KeepTogether(flowables)
+
+def write_report_pdf(target, state, progress=None):
+    """전체 유해요인조사 보고서를 PDF로 생성 (보고서 시트 구성은 Excel 보고서와 동일)"""
+    templates = get_pdf_templates()
+    paragraph = templates["paragraph"]
+    pagesize = landscape(A4)
+    doc = SimpleDocTemplate(target, pagesize=pagesize, leftMargin=0.5 * inch, rightMargin=0.5 * inch,
+                            topMargin=0.5 * inch, bottomMargin=0.6 * inch,
+                            title="근골격계 유해요인조사 보고서")
+    
+    def draw_page_number(canvas, document):
+        canvas.saveState()
+        canvas.setFont(templates["font"], 8)
+        canvas.drawCentredString(pagesize[0] / 2, 0.35 * inch, f"- {document.page} -")
+        canvas.restoreState()
+    
+    def story():
+        yield Spacer(1, 2 * inch)
+        yield Paragraph("근골격계 유해요인조사 보고서", paragraph["title"])
+        yield Spacer(1, 0.3 * inch)
+        yield Paragraph(pdf_escape(state.get("사업장명") or state.get("workplace") or ""), paragraph["subtitle"])
+        yield Paragraph(datetime.now().strftime("%Y-%m-%d"), paragraph["subtitle"])
+        for name, rows, has_header in iter_report_sheets(state):
+            if progress is not None:
+                progress(name)
+            yield PageBreak()
+            yield Paragraph(pdf_escape(name), paragraph["heading"])
+            yield from iter_pdf_tables(rows, has_header, templates, doc.width)
+        photos = list(iter_pdf_photos(state, templates, doc.width))
+        if photos:
+            yield PageBreak()
+            yield Paragraph("작업 사진", paragraph["heading"])
+            yield from photos
+    
+    doc.build(list(story()), onFirstPage=draw_page_number, onLaterPages=draw_page_number)
+
+# 보고서 백그라운드 생성 (형식 → (확장자, MIME, 생성 함수))
+REPORT_BUILDERS = {
+    "xlsx": ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", write_report_workbook),
+}
+if PDF_AVAILABLE:
+    REPORT_BUILDERS["pdf"] = ("pdf", "application/pdf", write_report_pdf)
+# 보고서 입력 세션 키 (화면 이동/선택 위젯 값이 지문에 섞이지 않도록 보고서가 읽는 키만 사본에 포함)
+REPORT_STATE_KEYS = [
+    "workplace", "사업장명", "소재지", "업종", "예비조사", "본조사", "수행기관", "성명", "checklist_df", "정밀조사_목록",
+    "기초현황_data_저장", "작업기간_data_저장", "육체적부담_data_저장", "통증호소자_data_저장", "개선계획_data_저장",
+]
+REPORT_정밀_FIELDS = ["정밀_작업공정명_", "정밀_작업명_", "정밀_원인분석_data_", "정밀_사진_목록_"]
+
+def iter_report_state_keys(state):
+    """보고서 생성에 쓰이는 세션 키 (사업장 정보와 표, 반별 입력란, 정밀조사별 입력)"""
+    yield from REPORT_STATE_KEYS
+    for 경로 in get_반경로_목록(state):
+        for 필드 in 반_입력_필드:
+            yield 반_키(필드, 경로)
+    for 조사명 in state.get("정밀조사_목록", []) or []:
+        for 접두사 in REPORT_정밀_FIELDS:
+            yield f"{접두사}{조사명}"
+
+@st.cache_resource
+def get_report_executor():
+    return ThreadPoolExecutor(max_workers=REPORT_WORKERS, thread_name_prefix="report")
+
+@st.cache_resource
+def get_report_jobs():
+    """프로세스 전체에서 공유하는 보고서 작업 목록 (산출물 경로 → 작업 정보)"""
+    return {"lock": threading.Lock(), "jobs": {}}
+
+def snapshot_report_state(state):
+    """백그라운드 작업에 넘길 보고서 입력 사본 (iter_report_state_keys의 키와 체크리스트 반의 기록만 포함)"""
+    snapshot = {}
+    기록_목록 = {경로: find_반기록(state, 경로) for 경로 in get_반경로_목록(state)}
+    snapshot["반_기록"] = {경로: 기록.copy() for 경로, 기록 in 기록_목록.items() if 기록 is not None}
+    for key in iter_report_state_keys(state):
+        if key not in state:
+            continue
+        value = state[key]
+        if isinstance(value, pd.DataFrame):
+            snapshot[key] = value.copy()
+        elif value is None or isinstance(value, (str, int, float, bool, list, dict, datetime)):
+            snapshot[key] = value
+    return snapshot
+
+def fingerprint_report_state(snapshot):
+    """보고서 입력 데이터의 지문 계산"""
+    hasher = hashlib.sha1()
+    for key in sorted(snapshot, key=str):
+        value = snapshot[key]
+        hasher.update(str(key).encode("utf-8"))
+        if key == "반_기록":
+            for 경로 in sorted(value):
+                기록 = value[경로]
+                hasher.update(json.dumps([경로, 기록.원인분석, sorted(기록.사진.items())], ensure_ascii=False, default=str).encode("utf-8"))
+                if validate_dataframe(기록.작업조건):
+                    hasher.update(fingerprint_sheet([(0, 기록.작업조건)]).encode("utf-8"))
+        elif isinstance(value, pd.DataFrame):
+            hasher.update(fingerprint_sheet([(0, value)]).encode("utf-8"))
+        else:
+            try:
+                hasher.update(json.dumps(value, ensure_ascii=False, sort_keys=True, default=str).encode("utf-8"))
+            except TypeError:
+                hasher.update(repr(value).encode("utf-8"))
+    return hasher.hexdigest()
+
+def get_report_path(kind, session_id, fingerprint):
+    safe_id = "".join(c if c.isalnum() or c in "-_" else "_" for c in str(session_id or "unsaved"))
+    return os.path.join(REPORT_DIR, f"{safe_id}_{fingerprint[:16]}.{REPORT_BUILDERS[kind][0]}")
+
+def estimate_report_sheet_count(state):
+    return 12 + len(get_반경로_목록(state))
+
+def run_report_job(job, snapshot):
+    """보고서를 임시 파일에 생성한 뒤 캐시 경로로 교체하고 오래된 산출물 정리"""
+    builder = REPORT_BUILDERS[job["kind"]][2]
+    temp_path = f"{job['path']}.{uuid.uuid4().hex}.tmp"
     
-    # 부담작업 정보 병합 (각 호별로 가장 높은 수준 선택)
-    priority_map = {"O(해당)": 3, "△(잠재위험)": 2, "X(미해당)": 1}
-    reverse_map = {3: "O(해당)", 2: "△(잠재위험)", 1: "X(미해당)"}
+    def progress(name):
+        job["done"] += 1
+        job["stage"] = name
     
-    for i in range(1, 12):
-        col_name = f"{i}호"
-        values = selected_rows[col_name].tolist()
-        max_priority = max([priority_map.get(v, 1) for v in values])
-        merged_row[col_name] = reverse_map[max_priority]
+    try:
+        builder(temp_path, snapshot, progress=progress)
+        os.replace(temp_path, job["path"])
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
     
-    # 새 DataFrame 생성
-    new_df = checklist_df.drop(selected_indices).reset_index(drop=True)
-    new_df = pd.concat([new_df, pd.DataFrame([merged_row])], ignore_index=True)
+    prune_report_artifacts()
+    return job["path"]
+
+def is_report_job_running(job):
+    return job["future"] is not None and not job["future"].done()
+
+def prune_report_artifacts():
+    """작업이 참조하지 않는 오래된 산출물 삭제 (최근 사용 순으로 REPORT_CACHE_MAX_FILES개 유지)
     
-    return new_df
+    같은 세션을 연 다른 탭이나 session_id가 없는 다른 세션이 보고 있는 산출물은 최근 조회한 작업이 참조하므로 지우지 않는다.
+    생성 중이 아니고 REPORT_JOB_TTL 동안 조회되지 않은 작업은 목록에서 제거한다 (산출물이 남아 있으면 get_report_job이 다시 등록).
+    """
+    registry = get_report_jobs()
+    now = time.time()
+    with registry["lock"]:
+        jobs = registry["jobs"]
+        live = {path for path, job in jobs.items() if is_report_job_running(job) or now - job["last_used"] < REPORT_JOB_TTL}
+        artifacts = sorted(
+            ((max(entry.stat().st_mtime, jobs[entry.path]["last_used"] if entry.path in jobs else 0), entry.path)
+             for entry in os.scandir(REPORT_DIR) if entry.is_file() and not entry.name.endswith(".tmp")),
+            reverse=True
+        )
+        for rank, (_, path) in enumerate(artifacts):
+            if rank >= REPORT_CACHE_MAX_FILES and path not in live:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+        for path in [path for path in jobs if path not in live]:
+            del jobs[path]
+
+def submit_report_job(kind, session_id, state):
+    """session_id와 데이터 지문으로 보고서 작업을 찾거나 새로 시작 (캐시 파일이 있으면 즉시 완료)"""
+    snapshot = snapshot_report_state(state)
+    path = get_report_path(kind, session_id, fingerprint_report_state(snapshot))
+    registry = get_report_jobs()
+    with registry["lock"]:
+        job = registry["jobs"].get(path)
+        if job is not None and not (job["future"] is not None and job["future"].done() and job["future"].exception()):
+            job["last_used"] = time.time()
+            return job
+        job = {"kind": kind, "path": path, "future": None, "done": 0,
+               "total": estimate_report_sheet_count(snapshot), "stage": "", "last_used": time.time()}
+        if not os.path.exists(path):
+            job["future"] = get_report_executor().submit(run_report_job, job, snapshot)
+        registry["jobs"][path] = job
+    return job
+
+def get_report_job(path):
+    """저장된 작업 키(산출물 경로)로 작업 정보 조회 (목록에서 제거되었거나 프로세스 재시작 후에는 캐시 파일로 다시 등록)"""
+    if not path:
+        return None
+    registry = get_report_jobs()
+    with registry["lock"]:
+        job = registry["jobs"].get(path)
+        if job is None and os.path.exists(path):
+            job = registry["jobs"][path] = {
+                "kind": os.path.splitext(path)[1][1:], "path": path, "future": None, "done": 0, "total": 0, "stage": ""
+            }
+        if job is not None:
+            job["last_used"] = time.time()
+    return job
+
+def get_report_job_status(job):
+    """작업 상태를 (상태, 진행률, 오류 메시지)로 반환"""
+    future = job["future"]
+    if future is None or (future.done() and future.exception() is None):
+        return ("done", 1.0, "") if os.path.exists(job["path"]) else ("error", 0.0, "보고서 파일을 찾을 수 없습니다.")
+    if future.done():
+        return "error", 0.0, str(future.exception())
+    return "running", min(job["done"] / max(job["total"], 1), 0.99), ""
+
+@polling_fragment(REPORT_POLL_INTERVAL)
+def report_progress_fragment(report_kind):
+    """생성 중인 보고서 진행률 (이 영역만 주기적으로 다시 실행, 끝나면 전체 다시 실행해 다운로드 버튼 표시)"""
+    job = get_report_job(st.session_state.get("report_jobs", {}).get(report_kind))
+    if job is None:
+        return
+    status, fraction, _ = get_report_job_status(job)
+    if status != "running":
+        st.rerun()
+    st.progress(fraction, text=f"보고서 생성 중... {job['stage']}")
+
+def show_report_job(report_kind):
+    """보고서 작업 상태 표시 (생성 중이면 진행률, 끝나면 다운로드 버튼, 위젯 조작으로 재실행되어도 작업은 유지)"""
+    job = get_report_job(st.session_state.get("report_jobs", {}).get(report_kind))
+    if job is None:
+        return
+    status, _, message = get_report_job_status(job)
+    if status == "running":
+        report_progress_fragment(report_kind)
+        return
+    if status == "error":
+        st.error(f"보고서 생성 중 오류가 발생했습니다: {message}")
+        return
+    extension, mime, _ = REPORT_BUILDERS[report_kind]
+    with open(job["path"], "rb") as f:
+        st.download_button(
+            label=f"[{'Excel' if report_kind == 'xlsx' else report_kind.upper()} 다운로드]",
+            data=f.read(),
+            file_name=f"근골격계_유해요인조사_{st.session_state.get('workplace', '')}_{datetime.now().strftime('%Y%m%d')}.{extension}",
+            mime=mime,
+            key=f"report_download_{report_kind}"
+        )
+    st.success("[다운로드 준비 완료] 보고서가 생성되었습니다!")
 
-# 자동 저장 기능 (Excel 버전)
+# 자동 저장 기능
 def auto_save():
     if "last_save_time" not in st.session_state:
         st.session_state["last_save_time"] = time.time()
     
     current_time = time.time()
     if current_time - st.session_state["last_save_time"] > 30:  # 30초마다 자동 저장
-        if st.session_state.get("session_id") and st.session_state.get("workplace"):
-            success, _ = safe_save_to_excel(st.session_state["session_id"], st.session_state.get("workplace"))
+        # 저장 충돌 중에는 사용자가 다시 불러오기/덮어쓰기를 선택할 때까지 자동 저장 중지
+        if st.session_state.get("session_id") and st.session_state.get("workplace") and not st.session_state.get("save_conflict"):
+            success, _ = save_session(st.session_state["session_id"], st.session_state.get("workplace"))
             if success:
                 st.session_state["last_save_time"] = current_time
                 st.session_state["last_successful_save"] = datetime.now()
 
+# 세션 카탈로그 읽기
+def load_session_catalog():
+    """Excel 세션 파일 카탈로그 {파일명: 항목} 읽기"""
+    return read_json_file(CATALOG_PATH)
+
+# 세션 카탈로그 쓰기
+def save_session_catalog(catalog):
+    write_json_file(CATALOG_PATH, catalog)
+
+# 카탈로그 항목 생성
+def make_catalog_entry(filepath, metadata):
+    stat = os.stat(filepath)
+    return {
+        "session_id": str(metadata.get("session_id", "") or ""),
+        "workplace": str(metadata.get("workplace", "") or ""),
+        "saved_at": str(metadata.get("saved_at", "") or ""),
+        "version": parse_value(metadata.get("version", 0), int),
+        "size": stat.st_size,
+        "mtime": stat.st_mtime,
+        "valid": True
+    }
+
+# 저장 직후 카탈로그 갱신 (카탈로그는 모든 세션이 공유하므로 잠금 안에서 갱신)
+def update_session_catalog(filepath, metadata):
+    with session_lock(CATALOG_PATH):
+        catalog = load_session_catalog()
+        catalog[os.path.basename(filepath)] = make_catalog_entry(filepath, metadata)
+        save_session_catalog(catalog)
+
 # 저장된 세션 목록 가져오기
 def get_saved_sessions():
-    """저장된 Excel 세션 파일 목록 반환"""
+    """저장된 세션 목록 반환 (SQLite 저장소 + Excel 세션 파일)
+    
+    Excel 파일은 카탈로그에 기록된 크기/수정시각이 다른 경우에만 메타데이터를 다시 읽는다.
+    """
     sessions = []
+    if STORAGE_BACKEND == "sqlite":
+        try:
+            import_excel_sessions()
+            sessions.extend(sqlite_list_sessions())
+        except Exception:
+            pass
+    # SQLite로 가져온 Excel 세션은 SQLite 항목만 표시
+    sqlite_session_ids = {session["session_id"] for session in sessions}
     if os.path.exists(SAVE_DIR):
-        for filename in os.listdir(SAVE_DIR):
-            if filename.endswith('.xlsx') and not filename.endswith('_temp.xlsx'):
-                filepath = os.path.join(SAVE_DIR, filename)
-                try:
-                    # 메타데이터 읽기
-                    metadata_df = pd.read_excel(filepath, sheet_name='메타데이터')
-                    if not metadata_df.empty:
-                        metadata = metadata_df.iloc[0].to_dict()
-                        sessions.append({
-                            "filename": filename,
-                            "session_id": metadata.get("session_id", ""),
-                            "workplace": metadata.get("workplace", ""),
-                            "saved_at": metadata.get("saved_at", "")
-                        })
-                except:
-                    continue
+        catalog = load_session_catalog()
+        current = {}
+        changed = False
+        for dir_entry in os.scandir(SAVE_DIR):
+            filename = dir_entry.name
+            if not dir_entry.is_file() or not filename.endswith('.xlsx') or filename.endswith(('_temp.xlsx', '.tmp.xlsx')):
+                continue
+            stat = dir_entry.stat()
+            cached = catalog.get(filename)
+            if cached and cached.get("mtime") == stat.st_mtime and cached.get("size") == stat.st_size:
+                current[filename] = cached
+                continue
+            
+            # 새 파일이거나 변경된 파일만 메타데이터 읽기
+            changed = True
+            try:
+                metadata_df = pd.read_excel(dir_entry.path, sheet_name='메타데이터')
+                if metadata_df.empty:
+                    raise ValueError("메타데이터 없음")
+                current[filename] = make_catalog_entry(dir_entry.path, metadata_df.iloc[0].fillna("").to_dict())
+            except Exception:
+                # 세션 파일이 아닌 경우에도 기록해 두어 다시 읽지 않음
+                current[filename] = {"size": stat.st_size, "mtime": stat.st_mtime, "valid": False}
+        
+        if changed or len(current) != len(catalog):
+            try:
+                with session_lock(CATALOG_PATH, timeout=1):
+                    save_session_catalog(current)
+            except TimeoutError:
+                # 다른 세션이 갱신 중이면 다음 조회 때 다시 기록
+                pass
+        
+        for filename, entry in current.items():
+            if entry.get("valid") and entry.get("session_id", "") not in sqlite_session_ids:
+                sessions.append({
+                    "backend": "excel",
+                    "filename": filename,
+                    "session_id": entry.get("session_id", ""),
+                    "workplace": entry.get("workplace", ""),
+                    "saved_at": entry.get("saved_at", ""),
+                    "version": entry.get("version", 0)
+                })
     return sorted(sessions, key=lambda x: x.get("saved_at", ""), reverse=True)
 
+# 작업현장 목록 (저장된 세션에서 작업현장별 최신 세션)
+def list_workplaces(saved_sessions):
+    """{작업현장: 최신 세션 항목} (get_saved_sessions 순서대로 최근 저장한 작업현장부터)"""
+    workplaces = {}
+    for session_info in saved_sessions:
+        if session_info.get("workplace"):
+            workplaces.setdefault(session_info["workplace"], session_info)
+    return workplaces
+
+# 작업현장 캐시
+@st.cache_resource
+def get_workspace_cache():
+    """프로세스 전체에서 공유하는 작업현장 LRU 캐시 (작업현장 → 저장 버전과 파싱된 메타데이터/시트)"""
+    return {"lock": threading.Lock(), "entries": OrderedDict()}
+
+def copy_session_sheets(sheets):
+    """시트 DataFrame 사본 (캐시 항목을 여러 브라우저 세션이 나눠 쓰므로 넣고 꺼낼 때마다 복사)"""
+    return {name: [(startrow, df.copy()) for startrow, df in parts] for name, parts in sheets.items()}
+
+def workspace_cache_key(session_info):
+    return (session_info.get("backend"), session_info.get("session_id"), session_info.get("version"), session_info.get("saved_at"))
+
+def cache_workspace(session_info, metadata, sheets):
+    cache = get_workspace_cache()
+    entry = {"key": workspace_cache_key(session_info), "metadata": dict(metadata), "sheets": copy_session_sheets(sheets)}
+    with cache["lock"]:
+        cache["entries"][session_info["workplace"]] = entry
+        cache["entries"].move_to_end(session_info["workplace"])
+        while len(cache["entries"]) > WORKSPACE_CACHE_SIZE:
+            cache["entries"].popitem(last=False)
+
+def read_workspace(session_info):
+    """작업현장의 최신 세션 (메타데이터, 시트, 캐시 사용 여부) 읽기 (저장 버전이 같으면 저장소를 다시 읽지 않음)"""
+    cache = get_workspace_cache()
+    with cache["lock"]:
+        entry = cache["entries"].get(session_info["workplace"])
+        if entry is not None and entry["key"] == workspace_cache_key(session_info):
+            cache["entries"].move_to_end(session_info["workplace"])
+            return dict(entry["metadata"]), copy_session_sheets(entry["sheets"]), True
+    metadata, sheets = read_saved_session(session_info)
+    cache_workspace(session_info, metadata, sheets)
+    return metadata, sheets, False
+
+# 작업현장 전환 시 비우는 세션 키 (작업현장별 데이터와 그 편집 상태, 반별 입력란은 is_반_키로 판별)
+WORKSPACE_STATE_KEYS = [
+    "session_id", "사업장명", "소재지", "업종", "예비조사", "본조사", "수행기관", "성명", "session_version", "save_conflict",
+    "checklist_df", "반_기록", "정밀조사_목록", "기초현황_data_저장", "작업기간_data_저장", "육체적부담_data_저장",
+    "통증호소자_data_저장", "개선계획_data_저장", "editor_sources", "last_saved_fingerprints", "last_successful_save",
+    "hierarchy_index", "병합_제안",
+]
+
+def reset_workspace_state():
+    for key in list(st.session_state.keys()):
+        if key in WORKSPACE_STATE_KEYS or is_반_키(key) or (isinstance(key, str) and key.startswith("정밀_")):
+            del st.session_state[key]
+
+# 작업현장 전환 함수
+def switch_workplace(workplace):
+    """현재 작업현장을 저장한 뒤 다른 작업현장의 최신 세션으로 전환
+    
+    작업현장을 고르기 전에 입력한 데이터가 있으면 (이전 동작과 같이) 그 데이터를 새 세션으로 가져간다.
+    전환 전 저장이나 대상 세션 읽기에 실패하면 세션 상태를 바꾸지 않는다.
+    """
+    current = st.session_state.get("workplace")
+    if workplace == current:
+        return True, ""
+    session_id = st.session_state.get("session_id")
+    
+    # 현재 작업현장 저장 후 저장된 내용을 캐시에 넣어 두어 다시 돌아올 때 바로 복원
+    # (Excel 파일은 빈 문자열을 빈 셀로 저장해 읽은 결과가 달라지므로 다음에 읽을 때 캐시)
+    sheets = build_session_sheets()
+    if current and session_id and sheets:
+        success, result = save_session(session_id, current)
+        if not success:
+            return False, f"현재 작업현장 저장 중 오류 발생:\n{result}"
+        saved_info = next((s for s in get_saved_sessions() if s["session_id"] == session_id and s["backend"] == STORAGE_BACKEND), None)
+        if saved_info is not None and STORAGE_BACKEND == "sqlite":
+            metadata = dict(build_session_metadata(session_id, current), saved_at=saved_info["saved_at"], version=saved_info["version"])
+            cache_workspace(saved_info, metadata, sheets)
+    
+    new_session_id = f"{workplace}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    if not current and sheets:
+        st.session_state["workplace"] = workplace
+        st.session_state["session_id"] = new_session_id
+        return True, f"입력한 데이터를 '{workplace}' 작업현장의 새 세션으로 저장합니다."
+    
+    session_info = list_workplaces(get_saved_sessions()).get(workplace)
+    restored, cached = {}, False
+    if session_info is not None:
+        try:
+            metadata, target_sheets, cached = read_workspace(session_info)
+            restored = build_restored_state(metadata, target_sheets, merge_정밀조사=False)
+        except Exception as e:
+            return False, f"작업현장 불러오기 중 오류 발생: {str(e)}"
+    
+    reset_workspace_state()
+    st.session_state.update(restored)
+    st.session_state["workplace"] = workplace
+    if session_info is None:
+        st.session_state["session_id"] = new_session_id
+        return True, f"새 작업현장 '{workplace}'을(를) 시작합니다."
+    return True, f"'{workplace}' 작업현장으로 전환했습니다." + (" (캐시)" if cached else "")
+
 # 값 파싱 함수
 def parse_value(value, val_type=float):
     """문자열 값을 숫자로 변환"""
@@ -373,45 +2814,207 @@ if "workplace" not in st.session_state:
 if "session_id" not in st.session_state:
     st.session_state["session_id"] = None
 
+# 반별 데이터 저장소 (반경로 → 반기록)
+if "반_기록" not in st.session_state:
+    st.session_state["반_기록"] = {}
+
+# 계층 구조 인덱스 (회사명 → 소속 → 반 → 단위작업명)
+HIERARCHY_COLUMNS = ["회사명", "소속", "반", "단위작업명"]
+
+def build_hierarchy_index(df):
+    """체크리스트의 계층 트리와 전체 목록을 한 번에 구성 (등장 순서 유지)"""
+    tree = {}
+    flat = {col: [] for col in HIERARCHY_COLUMNS}
+    if df.empty or not all(col in df.columns for col in HIERARCHY_COLUMNS):
+        return {"tree": tree, "flat": flat}
+    
+    keys = df[HIERARCHY_COLUMNS].drop_duplicates()
+    for col in HIERARCHY_COLUMNS:
+        flat[col] = keys[col].dropna().unique().tolist()
+    
+    for 회사, 소속, 반, 단위작업 in keys.itertuples(index=False, name=None):
+        if pd.isna(회사):
+            continue
+        소속_트리 = tree.setdefault(회사, {})
+        if pd.isna(소속):
+            continue
+        반_트리 = 소속_트리.setdefault(소속, {})
+        if pd.isna(반):
+            continue
+        단위작업_목록 = 반_트리.setdefault(반, [])
+        if not pd.isna(단위작업):
+            단위작업_목록.append(단위작업)
+    return {"tree": tree, "flat": flat}
+
+def get_hierarchy_index():
+    """checklist_df가 바뀐 경우에만 계층 인덱스를 다시 구성"""
+    if "checklist_df" not in st.session_state or not validate_dataframe(st.session_state.get("checklist_df")):
+        return None
+    df = st.session_state["checklist_df"]
+    if df.empty:
+        return None
+    
+    cached = st.session_state.get("hierarchy_index")
+    if cached is not None and cached["df"] is df:
+        return cached
+    
+    key_columns = [col for col in HIERARCHY_COLUMNS if col in df.columns]
+    fingerprint = fingerprint_sheet([(0, df[key_columns])])
+    if cached is None or cached["fingerprint"] != fingerprint:
+        cached = dict(build_hierarchy_index(df), fingerprint=fingerprint, memo={})
+    cached["df"] = df
+    st.session_state["hierarchy_index"] = cached
+    return cached
+
+def lookup_hierarchy(level, 회사명=None, 소속=None, 반=None):
+    """계층 인덱스에서 목록 조회 (트리로 답할 수 없는 조합은 한 번 계산 후 저장)"""
+    index = get_hierarchy_index()
+    if index is None:
+        return []
+    
+    filters = [회사명, 소속, 반][:HIERARCHY_COLUMNS.index(level)]
+    if not any(filters):
+        return list(index["flat"][level])
+    
+    # 상위 단계가 모두 지정된 경우 트리에서 바로 조회
+    if all(filters):
+        node = index["tree"]
+        for key in filters:
+            node = node.get(key)
+            if node is None:
+                return []
+        return list(node)
+    
+    memo_key = (level, 회사명, 소속, 반)
+    if memo_key not in index["memo"]:
+        df = st.session_state["checklist_df"]
+        for col, value in zip(HIERARCHY_COLUMNS, filters):
+            if value:
+                df = df[df[col] == value]
+        index["memo"][memo_key] = df[level].dropna().unique().tolist()
+    return list(index["memo"][memo_key])
+
 # 계층 구조 데이터 가져오는 함수들
 def get_회사명_목록():
-    if "checklist_df" in st.session_state and validate_dataframe(st.session_state.get("checklist_df")):
-        if not st.session_state["checklist_df"].empty:
-            return st.session_state["checklist_df"]["회사명"].dropna().unique().tolist()
-    return []
+    return lookup_hierarchy("회사명")
 
 def get_소속_목록(회사명=None):
-    if "checklist_df" in st.session_state and validate_dataframe(st.session_state.get("checklist_df")):
-        if not st.session_state["checklist_df"].empty:
-            df = st.session_state["checklist_df"]
-            if 회사명:
-                df = df[df["회사명"] == 회사명]
-            return df["소속"].dropna().unique().tolist()
-    return []
+    return lookup_hierarchy("소속", 회사명)
 
 def get_반_목록(회사명=None, 소속=None):
-    if "checklist_df" in st.session_state and validate_dataframe(st.session_state.get("checklist_df")):
-        if not st.session_state["checklist_df"].empty:
-            df = st.session_state["checklist_df"]
-            if 회사명:
-                df = df[df["회사명"] == 회사명]
-            if 소속:
-                df = df[df["소속"] == 소속]
-            return df["반"].dropna().unique().tolist()
-    return []
+    return lookup_hierarchy("반", 회사명, 소속)
 
 def get_단위작업명_목록(회사명=None, 소속=None, 반=None):
-    if "checklist_df" in st.session_state and validate_dataframe(st.session_state.get("checklist_df")):
-        if not st.session_state["checklist_df"].empty:
-            df = st.session_state["checklist_df"]
-            if 회사명:
-                df = df[df["회사명"] == 회사명]
-            if 소속:
-                df = df[df["소속"] == 소속]
-            if 반:
-                df = df[df["반"] == 반]
-            return df["단위작업명"].dropna().unique().tolist()
-    return []
+    return lookup_hierarchy("단위작업명", 회사명, 소속, 반)
+
+# 업로드된 사진을 사진 저장소에 연결하는 함수
+def photo_upload_id(uploaded_file):
+    return f"{getattr(uploaded_file, 'file_id', None) or uploaded_file.name}:{uploaded_file.size}"
+
+def store_uploaded_photo(uploaded_file, target_key):
+    """업로드 파일을 한 번만 저장하고 참조 반환 (이미 처리한 업로드이거나 저장 실패 시 None)"""
+    seen = st.session_state.setdefault("photo_upload_refs", {})
+    upload_id = photo_upload_id(uploaded_file)
+    if upload_id in seen.get(target_key, {}):
+        return None
+    try:
+        ref = store_photo(uploaded_file.getvalue(), uploaded_file.name)
+    except Exception as e:
+        st.error(f"사진 저장 중 오류가 발생했습니다: {str(e)}")
+        return None
+    seen.setdefault(target_key, {})[upload_id] = ref
+    return ref
+
+def forget_photo_uploads(target_key, uploaded_files):
+    """대상 키의 처리 기록을 업로더에 현재 남아 있는 파일로 줄이기 (파일이 바뀌거나 빠지면 기록 삭제)"""
+    seen = st.session_state.get("photo_upload_refs", {})
+    current = {photo_upload_id(f) for f in uploaded_files if f}
+    entry = {upload_id: ref for upload_id, ref in seen.get(target_key, {}).items() if upload_id in current}
+    if entry:
+        seen[target_key] = entry
+    else:
+        seen.pop(target_key, None)
+
+def link_uploaded_photo(uploaded_file, target_key, multiple=False):
+    """업로드 파일을 한 번만 저장해 세션 키에 참조로 연결 (이미 처리한 업로드는 다시 읽지 않음)"""
+    ref = store_uploaded_photo(uploaded_file, target_key)
+    if ref is None:
+        return None
+    if multiple:
+        refs = list(st.session_state.get(target_key, []) or [])
+        if ref not in refs:
+            refs.append(ref)
+        st.session_state[target_key] = refs
+    else:
+        st.session_state[target_key] = ref
+    return ref
+
+# data_editor 입력 표 관리 (입력 표와 저장값을 분리해 편집 내역이 두 번 적용되지 않도록 함)
+def get_editor_source(state_key, editor_key, build_source, version=None, record=None):
+    """저장값을 data_editor 입력 표로 유지하고, 아래 경우에만 build_source(저장값, 이전 항목)로 다시 구성
+    
+    - 처음 표시하거나 입력 표 기준(반 목록 등)이 바뀐 경우
+    - 화면 전환으로 편집 위젯 상태가 사라진 경우
+    - 세션 불러오기 등으로 저장값이 편집기 밖에서 바뀐 경우
+    입력 표가 바뀌면 편집 내역(원본 기준 차이)도 비운다.
+    record를 주면 저장값은 세션 상태 대신 record의 state_key 속성에 둔다.
+    """
+    materialized = st.session_state.setdefault("editor_sources", {})
+    entry = materialized.get(editor_key)
+    saved = st.session_state.get(state_key) if record is None else getattr(record, state_key)
+    if (entry is not None and entry["version"] == version and editor_key in st.session_state
+            and (saved is None or saved is entry["output"])):
+        return entry["source"]
+    
+    source = build_source(saved if validate_dataframe(saved) else None, entry)
+    st.session_state.pop(editor_key, None)
+    materialized[editor_key] = {"version": version, "source": source, "output": None}
+    return source
+
+def store_editor_output(state_key, editor_key, edited, record=None):
+    if record is None:
+        st.session_state[state_key] = edited
+    else:
+        setattr(record, state_key, edited)
+    st.session_state["editor_sources"][editor_key]["output"] = edited
+
+# 증상조사 data_editor 입력 표 (반 목록이 바뀌면 해당 반의 행만 추가/삭제)
+def get_symptom_editor_source(name, editor_key, 반_목록):
+    return get_editor_source(
+        f"{name}_data_저장", editor_key,
+        lambda saved, entry: format_count_table(
+            sync_symptom_table(name, saved, list(반_목록), list(entry["version"]) if entry else [])
+        ),
+        version=tuple(반_목록)
+    )
+
+def store_symptom_editor_output(name, editor_key, edited):
+    store_editor_output(f"{name}_data_저장", editor_key, edited)
+
+# 화면 전환 시 위젯 값 유지 (화면 선택으로 표시되지 않은 위젯의 상태는 Streamlit이 지우므로 일반 세션 값으로 옮겨 둠)
+SCREEN_WIDGET_KEYS = {
+    "사업장명", "소재지", "업종", "예비조사", "본조사", "수행기관", "성명", "checklist_bulk_keep", "병합_유사도",
+    "통계_회사선택", "통계_소속선택", "유해_회사선택", "유해_소속선택", "유해_반선택", "작업_회사선택", "작업_소속선택",
+    "작업_반선택", "위험도_평가대상", "위험도_요약단위",
+}
+SCREEN_WIDGET_PREFIXES = ("정밀_작업공정명_", "정밀_작업명_")
+반_입력_접두사 = tuple(f"{필드}_" for 필드 in 반_입력_필드)
+
+def is_screen_widget_key(key):
+    """화면 안의 입력 위젯 키 (사이드바 위젯, 버튼, 데이터 편집기는 제외)"""
+    if not isinstance(key, str):
+        return False
+    if key in SCREEN_WIDGET_KEYS or key.startswith(SCREEN_WIDGET_PREFIXES):
+        return True
+    return key.startswith(반_입력_접두사) and is_반_키(key)
+
+def persist_widget_state():
+    for key in list(st.session_state.keys()):
+        if not is_screen_widget_key(key):
+            continue
+        value = st.session_state[key]
+        if isinstance(value, (str, int, float)):
+            st.session_state[key] = value
 
 # 부담작업 설명 매핑 (전역 변수)
 부담작업_설명 = {
@@ -429,24 +3032,57 @@ def get_단위작업명_목록(회사명=None, 소속=None, 반=None):
     "12호": "정적자세/진동/밀당기기"
 }
 
+# 편집 영역 fragment 간 무효화 (fragment 안의 편집이 영역 밖 화면 요소에 영향을 줄 때만 전체 다시 실행)
+def invalidate_app_on_change(name, token):
+    tokens = st.session_state.setdefault("fragment_tokens", {})
+    previous = tokens.get(name)
+    tokens[name] = token
+    if previous is not None and previous != token:
+        st.rerun()
+
+# 이전 화면에서 입력한 위젯 값 유지
+persist_widget_state()
+
 # 사이드바에 데이터 관리 기능
 with st.sidebar:
     st.title("[데이터 관리]")
     
     # 작업현장 선택/입력
     st.markdown("### [작업현장 선택]")
-    작업현장_옵션 = ["현장 선택...", "A사업장", "B사업장", "C사업장", "신규 현장 추가"]
-    선택된_현장 = st.selectbox("작업현장", 작업현장_옵션)
+    saved_sessions = get_saved_sessions()
+    작업현장_목록 = list(list_workplaces(saved_sessions))
+    현재_현장 = st.session_state.get("workplace")
+    if 현재_현장 and 현재_현장 not in 작업현장_목록:
+        작업현장_목록.insert(0, 현재_현장)
+    작업현장_옵션 = ["현장 선택..."] + 작업현장_목록 + ["신규 현장 추가"]
+    if 현재_현장 and st.session_state.get("작업현장_선택") != "신규 현장 추가":
+        st.session_state["작업현장_선택"] = 현재_현장
     
+    def on_workplace_selected():
+        선택된_현장 = st.session_state["작업현장_선택"]
+        if 선택된_현장 in ("현장 선택...", "신규 현장 추가"):
+            return
+        success, message = switch_workplace(선택된_현장)
+        st.session_state["작업현장_알림"] = ("success" if success else "error", message)
+    
+    def on_new_workplace_entered():
+        새현장명 = st.session_state["새현장명"].strip()
+        if not 새현장명:
+            return
+        success, message = switch_workplace(새현장명)
+        st.session_state["작업현장_알림"] = ("success" if success else "error", message)
+        if success:
+            st.session_state["작업현장_선택"] = 새현장명
+            st.session_state["새현장명"] = ""
+    
+    선택된_현장 = st.selectbox("작업현장", 작업현장_옵션, key="작업현장_선택", on_change=on_workplace_selected)
     if 선택된_현장 == "신규 현장 추가":
-        새현장명 = st.text_input("새 현장명 입력")
-        if 새현장명:
-            st.session_state["workplace"] = 새현장명
-            st.session_state["session_id"] = f"{새현장명}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-    elif 선택된_현장 != "현장 선택...":
-        st.session_state["workplace"] = 선택된_현장
-        if not st.session_state.get("session_id") or 선택된_현장 not in st.session_state.get("session_id", ""):
-            st.session_state["session_id"] = f"{선택된_현장}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        st.text_input("새 현장명 입력", key="새현장명", on_change=on_new_workplace_entered)
+    
+    if "작업현장_알림" in st.session_state:
+        kind, message = st.session_state.pop("작업현장_알림")
+        if message:
+            (st.success if kind == "success" else st.error)(message)
     
     # 세션 정보 표시
     if st.session_state.get("session_id"):
@@ -458,22 +3094,58 @@ with st.sidebar:
         st.success(f"[저장 완료] 마지막 자동저장: {last_save.strftime('%H:%M:%S')}")
     
     # 수동 저장 버튼
-    if st.button("[Excel로 저장]", use_container_width=True):
+    if st.button("[저장]", use_container_width=True):
         if st.session_state.get("session_id") and st.session_state.get("workplace"):
-            success, result = safe_save_to_excel(st.session_state["session_id"], st.session_state.get("workplace"))
+            success, result = save_session(st.session_state["session_id"], st.session_state.get("workplace"))
             if success:
-                st.success(f"[저장 완료] Excel 파일로 저장되었습니다!\n[파일 위치] {result}")
+                st.success(f"[저장 완료] 저장되었습니다!\n[파일 위치] {result}")
                 st.session_state["last_successful_save"] = datetime.now()
             else:
                 st.error(f"저장 중 오류 발생:\n{result}")
         else:
             st.warning("먼저 작업현장을 선택해주세요!")
     
+    # 저장 충돌 (다른 사용자가 같은 세션을 먼저 저장한 경우)
+    if st.session_state.get("save_conflict") and st.session_state.get("session_id"):
+        st.warning(f"[저장 충돌] 다른 사용자가 이 세션을 먼저 저장했습니다 (저장소 버전 {st.session_state['save_conflict']}).")
+        충돌_col1, 충돌_col2 = st.columns(2)
+        with 충돌_col1:
+            if st.button("[다시 불러오기]", use_container_width=True):
+                session_id = st.session_state["session_id"]
+                success, message = load_session({"backend": STORAGE_BACKEND, "session_id": session_id, "filename": f"{session_id}.xlsx"})
+                if success:
+                    st.rerun()
+                else:
+                    st.error(message)
+        with 충돌_col2:
+            if st.button("[덮어쓰기 저장]", use_container_width=True):
+                success, result = save_session(st.session_state["session_id"], st.session_state.get("workplace"), overwrite=True)
+                if success:
+                    st.session_state["last_successful_save"] = datetime.now()
+                    st.rerun()
+                else:
+                    st.error(f"저장 중 오류 발생:\n{result}")
+    
+    # Excel 내보내기
+    if st.button("[Excel로 내보내기]", use_container_width=True):
+        if st.session_state.get("session_id") and st.session_state.get("workplace"):
+            try:
+                st.download_button(
+                    label="[Excel 다운로드]",
+                    data=export_session_excel(st.session_state["session_id"], st.session_state.get("workplace")),
+                    file_name=f"{st.session_state['session_id']}.xlsx",
+                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                    use_container_width=True
+                )
+            except Exception as e:
+                st.error(f"Excel 내보내기 중 오류 발생: {str(e)}")
+        else:
+            st.warning("먼저 작업현장을 선택해주세요!")
+    
     # 저장된 세션 목록
     st.markdown("---")
     st.markdown("### [저장된 세션]")
     
-    saved_sessions = get_saved_sessions()
     if saved_sessions:
         selected_session = st.selectbox(
             "불러올 세션 선택",
@@ -484,9 +3156,8 @@ with st.sidebar:
         if selected_session != "선택..." and st.button("[세션 불러오기]", use_container_width=True):
             session_idx = [f"{s['workplace']} - {s['saved_at']}" for s in saved_sessions].index(selected_session)
             session_info = saved_sessions[session_idx]
-            filepath = os.path.join(SAVE_DIR, session_info["filename"])
             
-            success, message = safe_load_from_excel(filepath)
+            success, message = load_session(session_info)
             if success:
                 st.success(f"[불러오기 완료] {message}")
                 st.rerun()
@@ -495,69 +3166,313 @@ with st.sidebar:
     else:
         st.info("저장된 세션이 없습니다.")
     
+    # 백업 복원
+    if st.session_state.get("session_id"):
+        백업_목록 = list_backups(st.session_state["session_id"])
+        if 백업_목록:
+            with st.expander("[백업 복원]"):
+                백업_라벨 = [f"{b['created_at']} ({b['size'] // 1024:,}KB)" for b in 백업_목록]
+                selected_backup = st.selectbox("복원할 백업 선택", 백업_라벨, key="backup_selector")
+                if st.button("[백업 복원하기]", use_container_width=True):
+                    backup_info = 백업_목록[백업_라벨.index(selected_backup)]
+                    success, message = restore_backup(st.session_state["session_id"], backup_info["hash"])
+                    if success:
+                        # 복원한 내용은 현재 저장된 버전 위에 덮어쓰는 것으로 처리
+                        st.session_state["session_version"] = get_stored_session_version(st.session_state["session_id"])
+                        st.success(f"[복원 완료] {message}")
+                        st.rerun()
+                    else:
+                        st.error(message)
+    
     # Excel 파일 직접 업로드
     st.markdown("---")
     st.markdown("### [Excel 파일 업로드]")
     uploaded_file = st.file_uploader("Excel 파일 선택", type=['xlsx'])
     if uploaded_file is not None:
         if st.button("[데이터 가져오기]", use_container_width=True):
-            # 임시 파일로 저장
-            temp_path = os.path.join(SAVE_DIR, f"temp_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx")
+            # 임시 파일로 저장 (동시에 업로드하는 다른 사용자와 겹치지 않는 이름)
+            temp_path = make_temp_path(os.path.join(SAVE_DIR, "upload"), ".tmp.xlsx")
+            success = False
             try:
                 with open(temp_path, 'wb') as f:
                     f.write(uploaded_file.getbuffer())
                 
                 success, message = safe_load_from_excel(temp_path)
                 if success:
+                    # 가져온 내용은 현재 저장된 버전 위에 덮어쓰는 것으로 처리
+                    if st.session_state.get("session_id"):
+                        st.session_state["session_version"] = get_stored_session_version(st.session_state["session_id"])
                     st.success(f"[가져오기 완료] {message}")
-                    os.remove(temp_path)  # 임시 파일 삭제
-                    st.rerun()
                 else:
                     st.error(message)
-                    os.remove(temp_path)  # 임시 파일 삭제
             except Exception as e:
                 st.error(f"파일 처리 중 오류: {str(e)}")
+            finally:
                 if os.path.exists(temp_path):
-                    os.remove(temp_path)
+                    os.remove(temp_path)  # 임시 파일 삭제
+            if success:
+                st.rerun()
+    
+    # 부담작업 참고 정보
+    with st.expander("[부담작업 빠른 참조]"):
+        st.markdown("""
+        **반복동작 관련**
+        - 1호: 키보드/마우스 4시간↑
+        - 2호: 같은동작 2시간↑ 반복
+        - 6호: 손가락집기 2시간↑
+        - 7호: 한손 4.5kg 2시간↑
+        - 10호: 4.5kg 분당2회↑
+        
+        **부자연스러운 자세**
+        - 3호: 팔 위/옆 2시간↑
+        - 4호: 목/허리굽힘 2시간↑
+        - 5호: 쪼그림/무릎 2시간↑
+        
+        **과도한 힘**
+        - 8호: 25kg 10회/일↑
+        - 9호: 10kg 25회/일↑
+        
+        **기타**
+        - 11호: 손/무릎충격 시간당10회↑
+        - 12호: 정적자세/진동/밀당기기
+        """)
+
+# 자동 저장 실행
+if st.session_state.get("session_id") and st.session_state.get("workplace"):
+    auto_save()
+
+# 작업현장 선택 확인
+if not st.session_state.get("workplace"):
+    st.warning("먼저 사이드바에서 작업현장을 선택하거나 입력해주세요!")
+    st.stop()
+
+# 메인 화면 시작
+st.title(f"근골격계 유해요인조사 - {st.session_state.get('workplace', '')}")
+
+# 화면별 편집 영역 (st.fragment로 감싸 셀 편집 시 해당 영역만 다시 실행)
+@fragment
+def checklist_editor_fragment():
+    """체크리스트 편집 영역 (편집 시 이 영역만 다시 실행)"""
+    # 기존 데이터 편집기
+    columns = [
+        "회사명", "소속", "반", "단위작업명"
+    ] + [f"{i}호" for i in range(1, 12)]
+    
+    # 세션 상태에 저장된 데이터가 있으면 사용, 없으면 빈 데이터
+    if "checklist_df" in st.session_state and validate_dataframe(st.session_state.get("checklist_df")):
+        if not st.session_state["checklist_df"].empty:
+            data = checklist_to_labels(st.session_state["checklist_df"])
+        else:
+            data = pd.DataFrame(
+                columns=columns,
+                data=[["", "", "", ""] + ["X(미해당)"]*11 for _ in range(5)]
+            )
+    else:
+        data = pd.DataFrame(
+            columns=columns,
+            data=[["", "", "", ""] + ["X(미해당)"]*11 for _ in range(5)]
+        )
+
+    ho_options = [
+        "O(해당)",
+        "△(잠재위험)",
+        "X(미해당)"
+    ]
+    column_config = {
+        f"{i}호": st.column_config.SelectboxColumn(
+            f"{i}호", options=ho_options, required=True
+        ) for i in range(1, 12)
+    }
+    column_config["회사명"] = st.column_config.TextColumn("회사명")
+    column_config["소속"] = st.column_config.TextColumn("소속")
+    column_config["반"] = st.column_config.TextColumn("반")
+    column_config["단위작업명"] = st.column_config.TextColumn("단위작업명")
+
+    edited_df = st.data_editor(
+        data,
+        num_rows="dynamic",
+        use_container_width=True,
+        hide_index=True,
+        column_config=column_config
+    )
+    st.session_state["checklist_df"] = normalize_checklist(edited_df)
+    
+    # 회사/소속/반/단위작업 구성이 바뀌면 계층 목록, 병합 기능 등이 갱신되도록 전체 다시 실행
+    checklist_df = st.session_state["checklist_df"]
+    invalidate_app_on_change(
+        "체크리스트",
+        fingerprint_sheet([(0, checklist_df[[col for col in HIERARCHY_COLUMNS if col in checklist_df.columns]])])
+    )
+
+@fragment
+def 작업조건_editor_fragment(경로):
+    """작업조건조사 2단계 편집 영역 (편집 시 이 영역만 다시 실행)"""
+    기록 = get_반기록(st.session_state, 경로)
+    # 선택된 반에 해당하는 체크리스트 데이터 가져오기
+    checklist_data = None
+    if "checklist_df" in st.session_state and validate_dataframe(st.session_state.get("checklist_df")):
+        if not st.session_state["checklist_df"].empty:
+            반_체크리스트 = st.session_state["checklist_df"][
+                (st.session_state["checklist_df"]["회사명"] == 경로.회사명) &
+                (st.session_state["checklist_df"]["소속"] == 경로.소속) &
+                (st.session_state["checklist_df"]["반"] == 경로.반)
+            ]
+
+            반_체크리스트 = 반_체크리스트[반_체크리스트["단위작업명"].astype(bool)]
+            if not 반_체크리스트.empty:
+                checklist_data = pd.DataFrame({
+                    "단위작업명": 반_체크리스트["단위작업명"].to_numpy(),
+                    "부담작업(호)": classify_부담작업(encode_ho_matrix(반_체크리스트)),
+                    "작업부하(A)": "",
+                    "작업빈도(B)": "",
+                    "총점": 0
+                })
+
+    # 데이터프레임 생성 (체크리스트가 바뀌면 단위작업 행을 다시 구성하고 입력된 A/B 값은 유지)
+    def build_작업조건_source(saved, entry):
+        if checklist_data is None:
+            if saved is not None and not saved.empty:
+                return saved
+            return pd.DataFrame({
+                "단위작업명": ["" for _ in range(3)],
+                "부담작업(호)": ["" for _ in range(3)],
+                "작업부하(A)": ["" for _ in range(3)],
+                "작업빈도(B)": ["" for _ in range(3)],
+                "총점": [0 for _ in range(3)],
+            })
+        if saved is None or "단위작업명" not in saved.columns:
+            return checklist_data
+        if entry is not None and entry["version"] == 작업조건_version:
+            return saved
+        data = checklist_data.copy()
+        입력값 = saved.drop_duplicates(subset=["단위작업명"]).set_index("단위작업명")
+        for col in ["작업부하(A)", "작업빈도(B)"]:
+            if col in 입력값.columns:
+                data[col] = data["단위작업명"].map(입력값[col]).fillna("")
+        return data
+
+    작업조건_version = None if checklist_data is None else tuple(
+        checklist_data[["단위작업명", "부담작업(호)"]].itertuples(index=False, name=None)
+    )
+    editor_key = 반_키("작업조건_data_editor", 경로)
+    data = get_editor_source("작업조건", editor_key, build_작업조건_source, version=작업조건_version, record=기록)
+
+    column_config = {
+        "작업부하(A)": st.column_config.SelectboxColumn("작업부하(A)", options=부하옵션, required=False),
+        "작업빈도(B)": st.column_config.SelectboxColumn("작업빈도(B)", options=빈도옵션, required=False),
+        "단위작업명": st.column_config.TextColumn("단위작업명"),
+        "부담작업(호)": st.column_config.TextColumn("부담작업(호)"),
+        "총점": st.column_config.TextColumn("총점(자동계산)", disabled=True),
+    }
+
+    # 데이터 편집
+    edited_df = st.data_editor(
+        data,
+        num_rows="dynamic",
+        use_container_width=True,
+        hide_index=True,
+        column_config=column_config,
+        key=editor_key
+    )
+
+    # 편집된 데이터를 세션 상태에 저장
+    store_editor_output("작업조건", editor_key, edited_df, record=기록)
+
+    # 총점 자동 계산 후 다시 표시
+    if not edited_df.empty:
+        display_df = edited_df.copy()
+        display_df["총점"] = calculate_total_scores(display_df)
+        display_df["위험도"] = classify_risk_band(display_df["총점"])
+
+        st.markdown("##### 계산 결과")
+        st.dataframe(
+            display_df,
+            use_container_width=True,
+            hide_index=True,
+            column_config={
+                "단위작업명": st.column_config.TextColumn("단위작업명"),
+                "부담작업(호)": st.column_config.TextColumn("부담작업(호)"),
+                "작업부하(A)": st.column_config.TextColumn("작업부하(A)"),
+                "작업빈도(B)": st.column_config.TextColumn("작업빈도(B)"),
+                "총점": st.column_config.NumberColumn("총점(자동계산)", format="%d"),
+                "위험도": st.column_config.TextColumn("위험도"),
+            }
+        )
+
+        st.info("[도움말] 총점은 작업부하(A) × 작업빈도(B)로 자동 계산됩니다.")
     
-    # 부담작업 참고 정보
-    with st.expander("[부담작업 빠른 참조]"):
-        st.markdown("""
-        **반복동작 관련**
-        - 1호: 키보드/마우스 4시간↑
-        - 2호: 같은동작 2시간↑ 반복
-        - 6호: 손가락집기 2시간↑
-        - 7호: 한손 4.5kg 2시간↑
-        - 10호: 4.5kg 분당2회↑
-        
-        **부자연스러운 자세**
-        - 3호: 팔 위/옆 2시간↑
-        - 4호: 목/허리굽힘 2시간↑
-        - 5호: 쪼그림/무릎 2시간↑
-        
-        **과도한 힘**
-        - 8호: 25kg 10회/일↑
-        - 9호: 10kg 25회/일↑
-        
-        **기타**
-        - 11호: 손/무릎충격 시간당10회↑
-        - 12호: 정적자세/진동/밀당기기
-        """)
+    # 단위작업/부담작업 구성이 바뀌면 아래 원인분석 영역도 갱신되도록 전체 다시 실행
+    invalidate_app_on_change(
+        반_키("작업조건", 경로),
+        fingerprint_sheet([(0, edited_df.reindex(columns=["단위작업명", "부담작업(호)"]))])
+    )
 
-# 자동 저장 실행
-if st.session_state.get("session_id") and st.session_state.get("workplace"):
-    auto_save()
+@fragment
+def 정밀_원인분석_fragment(조사명):
+    """정밀조사 원인분석 표 편집 영역"""
+    def build_정밀_원인분석_source(saved, entry):
+        if saved is not None:
+            return saved
+        정밀_원인분석_data = []
+        for i in range(7):
+            정밀_원인분석_data.append({
+                "작업분석 및 평가도구": "",
+                "분석결과": "",
+                "만점": ""
+            })
+        return pd.DataFrame(정밀_원인분석_data)
 
-# 작업현장 선택 확인
-if not st.session_state.get("workplace"):
-    st.warning("먼저 사이드바에서 작업현장을 선택하거나 입력해주세요!")
-    st.stop()
+    정밀_원인분석_df = get_editor_source(
+        f"정밀_원인분석_data_{조사명}", f"정밀_원인분석_{조사명}", build_정밀_원인분석_source
+    )
 
-# 메인 화면 시작
-st.title(f"근골격계 유해요인조사 - {st.session_state.get('workplace', '')}")
+    정밀_원인분석_config = {
+        "작업분석 및 평가도구": st.column_config.TextColumn("작업분석 및 평가도구", width=350),
+        "분석결과": st.column_config.TextColumn("분석결과", width=250),
+        "만점": st.column_config.TextColumn("만점", width=150)
+    }
+
+    정밀_원인분석_edited = st.data_editor(
+        정밀_원인분석_df,
+        use_container_width=True,
+        hide_index=True,
+        column_config=정밀_원인분석_config,
+        num_rows="dynamic",
+        key=f"정밀_원인분석_{조사명}"
+    )
 
-# 탭 정의
-tabs = st.tabs([
+    # 데이터 세션 상태에 저장
+    store_editor_output(f"정밀_원인분석_data_{조사명}", f"정밀_원인분석_{조사명}", 정밀_원인분석_edited)
+
+@fragment
+def symptom_editor_fragment(name, editor_key, 반_목록, **editor_options):
+    """증상조사 표 편집 영역 (표마다 따로 다시 실행)"""
+    edited = st.data_editor(
+        get_symptom_editor_source(name, editor_key, 반_목록),
+        hide_index=True,
+        use_container_width=True,
+        key=editor_key,
+        **editor_options
+    )
+    store_symptom_editor_output(name, editor_key, edited)
+
+@fragment
+def 개선계획_editor_fragment(개선계획_config):
+    """작업환경개선계획서 편집 영역"""
+    개선계획_edited = st.data_editor(
+        get_editor_source("개선계획_data_저장", "개선계획_data", lambda saved, entry: saved),
+        hide_index=True,
+        use_container_width=True,
+        num_rows="dynamic",
+        column_config=개선계획_config,
+        key="개선계획_data"
+    )
+    
+    # 세션 상태에 저장
+    store_editor_output("개선계획_data_저장", "개선계획_data", 개선계획_edited)
+
+# 탭 정의 (선택된 화면의 내용만 실행)
+TAB_NAMES = [
     "사업장개요",
     "근골격계 부담작업 체크리스트",
     "유해요인조사표",
@@ -565,12 +3480,14 @@ tabs = st.tabs([
     "정밀조사",
     "증상조사 분석",
     "작업환경개선계획서"
-])
+]
+active_tab = st.radio("화면 선택", TAB_NAMES, horizontal=True, key="active_tab", label_visibility="collapsed")
 
 # 1. 사업장개요 탭
-with tabs[0]:
+if active_tab == TAB_NAMES[0]:
     st.title("사업장 개요")
-    사업장명 = st.text_input("사업장명", key="사업장명", value=st.session_state.get("workplace", ""))
+    st.session_state.setdefault("사업장명", st.session_state.get("workplace", ""))
+    사업장명 = st.text_input("사업장명", key="사업장명")
     소재지 = st.text_input("소재지", key="소재지")
     업종 = st.text_input("업종", key="업종")
     col1, col2 = st.columns(2)
@@ -582,7 +3499,7 @@ with tabs[0]:
         성명 = st.text_input("성명", key="성명")
 
 # 2. 근골격계 부담작업 체크리스트 탭
-with tabs[1]:
+if active_tab == TAB_NAMES[1]:
     st.subheader("근골격계 부담작업 체크리스트")
     
     # 엑셀 파일 업로드 기능 추가
@@ -600,51 +3517,102 @@ with tabs[1]:
         
         if uploaded_excel is not None:
             try:
-                # 엑셀 파일 읽기
-                df_excel = pd.read_excel(uploaded_excel)
+                # 엑셀 파일 읽기/검증 (같은 파일이면 다시 실행해도 캐시된 결과 사용)
+                upload_data = uploaded_excel.getvalue()
+                df_excel, 검증_보고서 = import_checklist_excel(
+                    hashlib.sha256(upload_data).hexdigest(), uploaded_excel.name, upload_data
+                )
                 
-                # 컬럼명 확인 및 조정
-                expected_columns = ["회사명", "소속", "반", "단위작업명"] + [f"{i}호" for i in range(1, 12)]
+                # 검증 보고서 (O(해당), △(잠재위험), X(미해당) 이외의 값은 X(미해당)으로 보정)
+                if 검증_보고서["보정_셀수"]:
+                    호별_보정 = ", ".join(f"{col} {count:,}건" for col, count in 검증_보고서["호별_보정"].items())
+                    st.warning(
+                        f"[값 보정] {검증_보고서['행수']:,}행 중 {검증_보고서['보정_셀수']:,}개 셀을 X(미해당)으로 변경했습니다. ({호별_보정})"
+                    )
+                    with st.expander(f"[보정 내역] (최대 {CHECKLIST_REPORT_MAX_ROWS:,}건 표시)"):
+                        st.dataframe(검증_보고서["보정_내역"], hide_index=True)
+                else:
+                    st.info(f"[검증 완료] {검증_보고서['행수']:,}행, 보정한 값이 없습니다.")
                 
-                # 컬럼 개수가 맞는지 확인
-                if len(df_excel.columns) >= 15:
-                    # 컬럼명 재설정
-                    df_excel.columns = expected_columns[:len(df_excel.columns)]
-                    
-                    # 값 검증 (O(해당), △(잠재위험), X(미해당)만 허용)
-                    valid_values = ["O(해당)", "△(잠재위험)", "X(미해당)"]
-                    
-                    # 5번째 열부터 15번째 열까지 검증
-                    for col in expected_columns[4:]:
-                        if col in df_excel.columns:
-                            # 유효하지 않은 값은 X(미해당)으로 변경
-                            df_excel[col] = df_excel[col].apply(
-                                lambda x: x if x in valid_values else "X(미해당)"
-                            )
+                if st.button("[데이터 적용하기]"):
+                    st.session_state["checklist_df"] = df_excel.copy()
                     
-                    if st.button("[데이터 적용하기]"):
-                        st.session_state["checklist_df"] = df_excel
-                        
-                        # 즉시 Excel 파일로 저장
-                        if st.session_state.get("session_id") and st.session_state.get("workplace"):
-                            success, _ = safe_save_to_excel(st.session_state["session_id"], st.session_state.get("workplace"))
-                            if success:
-                                st.session_state["last_save_time"] = time.time()
-                                st.session_state["last_successful_save"] = datetime.now()
-                        
-                        st.success("[적용 완료] 엑셀 데이터를 성공적으로 불러오고 저장했습니다!")
-                        st.rerun()
+                    # 즉시 Excel 파일로 저장
+                    if st.session_state.get("session_id") and st.session_state.get("workplace"):
+                        success, _ = save_session(st.session_state["session_id"], st.session_state.get("workplace"))
+                        if success:
+                            st.session_state["last_save_time"] = time.time()
+                            st.session_state["last_successful_save"] = datetime.now()
                     
-                    # 미리보기
-                    st.markdown("#### [데이터 미리보기]")
-                    st.dataframe(df_excel)
+                    st.success("[적용 완료] 엑셀 데이터를 성공적으로 불러오고 저장했습니다!")
+                    st.rerun()
+                
+                # 미리보기
+                st.markdown("#### [데이터 미리보기]")
+                if len(df_excel) > 1000:
+                    st.caption(f"전체 {len(df_excel):,}행 중 처음 1,000행")
+                st.dataframe(df_excel.head(1000))
                     
+            except ValueError as e:
+                st.error(f"[오류] {str(e)}")
+            except Exception as e:
+                st.error(f"[파일 읽기 오류] {str(e)}")
+
+    # 여러 회사/파일 일괄 가져오기
+    with st.expander("[여러 파일 일괄 가져오기]"):
+        st.info("여러 엑셀 파일(또는 엑셀 파일을 묶은 zip)을 한 번에 가져옵니다. 회사명/소속/반/단위작업명이 같은 행은 하나로 합치며, 부담작업 정보는 가장 높은 수준으로 통합됩니다.")
+
+        uploaded_bulk = st.file_uploader("엑셀/zip 파일 선택", type=['xlsx', 'xls', 'zip'], accept_multiple_files=True, key="checklist_bulk_upload")
+
+        if uploaded_bulk:
+            try:
+                일괄_파일 = list(iter_checklist_uploads(uploaded_bulk))
+                with st.spinner(f"{len(일괄_파일)}개 파일 읽는 중..."):
+                    일괄_df, 파일별_결과 = import_checklist_files(
+                        tuple(hashlib.sha256(data).hexdigest() for _, data in 일괄_파일),
+                        tuple(name for name, _ in 일괄_파일),
+                        [data for _, data in 일괄_파일]
+                    )
+
+                st.markdown("#### [파일별 결과]")
+                st.dataframe(파일별_결과, hide_index=True, use_container_width=True)
+
+                기존과_합치기 = st.checkbox("기존 체크리스트와 합치기", value=True, key="checklist_bulk_keep")
+                기존_df = st.session_state.get("checklist_df")
+                if 기존과_합치기 and validate_dataframe(기존_df) and not 기존_df.empty:
+                    합칠_df = pd.concat([normalize_checklist(기존_df)[HIERARCHY_COLUMNS + HO_COLUMNS], 일괄_df], ignore_index=True)
                 else:
-                    st.error("[오류] 엑셀 파일의 컬럼이 15개 이상이어야 합니다. (회사명, 소속, 반, 단위작업명, 1호~11호)")
-                    
+                    합칠_df = 일괄_df
+                통합_df, 중복_행수, 충돌_작업수 = dedupe_checklist(합칠_df)
+                st.info(
+                    f"[통합 결과] 단위작업 {len(통합_df):,}개 (중복 {중복_행수:,}행 통합, "
+                    f"부담작업 정보가 달라 가장 높은 수준으로 맞춘 단위작업 {충돌_작업수:,}개)"
+                )
+
+                if not 통합_df.empty and st.button("[일괄 데이터 적용하기]"):
+                    st.session_state["checklist_df"] = 통합_df
+
+                    # 즉시 저장
+                    if st.session_state.get("session_id") and st.session_state.get("workplace"):
+                        success, _ = save_session(st.session_state["session_id"], st.session_state.get("workplace"))
+                        if success:
+                            st.session_state["last_save_time"] = time.time()
+                            st.session_state["last_successful_save"] = datetime.now()
+
+                    st.success("[적용 완료] 여러 파일의 체크리스트를 통합하여 저장했습니다!")
+                    st.rerun()
+
+                # 미리보기
+                st.markdown("#### [통합 데이터 미리보기]")
+                if len(통합_df) > 1000:
+                    st.caption(f"전체 {len(통합_df):,}행 중 처음 1,000행")
+                st.dataframe(통합_df.head(1000))
+
+            except zipfile.BadZipFile as e:
+                st.error(f"[zip 파일 오류] {str(e)}")
             except Exception as e:
                 st.error(f"[파일 읽기 오류] {str(e)}")
-    
+
     # 샘플 엑셀 파일 다운로드
     with st.expander("[샘플 엑셀 파일 다운로드]"):
         # 샘플 데이터 생성
@@ -689,8 +3657,77 @@ with tabs[1]:
         
         if "checklist_df" in st.session_state and validate_dataframe(st.session_state.get("checklist_df")):
             if not st.session_state["checklist_df"].empty:
+                # 유사 단위작업 자동 찾기 (같은 반 안에서 이름이 같거나 비슷한 단위작업을 그룹으로 제안)
+                st.markdown("##### [유사 단위작업 자동 찾기]")
+                유사도_기준 = st.slider("이름 유사도 기준", 0.5, 1.0, UNIT_WORK_SIMILARITY, 0.05, key="병합_유사도")
+                checklist_지문 = fingerprint_sheet([(0, st.session_state["checklist_df"])])
+                if st.button("[유사 항목 찾기]"):
+                    st.session_state["병합_제안"] = {
+                        "fingerprint": checklist_지문,
+                        "groups": find_similar_unit_works(st.session_state["checklist_df"], 유사도_기준),
+                    }
+                    st.session_state.pop("병합_제안_df", None)
+
+                # 체크리스트가 바뀐 뒤의 제안은 사용하지 않음
+                병합_제안 = st.session_state.get("병합_제안")
+                if 병합_제안 and 병합_제안["fingerprint"] == checklist_지문:
+                    제안_그룹 = 병합_제안["groups"]
+                    if 제안_그룹:
+                        checklist = st.session_state["checklist_df"].reset_index(drop=True)
+                        그룹_행 = pd.DataFrame({
+                            "그룹": np.repeat(np.arange(len(제안_그룹)), [len(rows) for rows, _ in 제안_그룹]),
+                            "위치": np.concatenate([rows for rows, _ in 제안_그룹]),
+                        })
+                        그룹_행["단위작업명"] = checklist["단위작업명"].astype(str).to_numpy()[그룹_행["위치"].to_numpy()]
+                        첫_행 = checklist.iloc[[rows[0] for rows, _ in 제안_그룹]]
+                        제안_df = pd.DataFrame({
+                            "적용": True,
+                            "회사명": 첫_행["회사명"].to_numpy(),
+                            "소속": 첫_행["소속"].to_numpy(),
+                            "반": 첫_행["반"].to_numpy(),
+                            "병합 후 단위작업명": [name for _, name in 제안_그룹],
+                            "대상 단위작업": 그룹_행.groupby("그룹", sort=True)["단위작업명"].agg(lambda names: ", ".join(dict.fromkeys(names))).to_numpy(),
+                            "행 수": [len(rows) for rows, _ in 제안_그룹],
+                        })
+                        st.caption(f"병합 제안 {len(제안_그룹):,}개 그룹 (단위작업 {len(그룹_행):,}행)")
+                        제안_edited = st.data_editor(
+                            제안_df,
+                            hide_index=True,
+                            use_container_width=True,
+                            disabled=["회사명", "소속", "반", "대상 단위작업", "행 수"],
+                            column_config={"적용": st.column_config.CheckboxColumn("적용", width=50)},
+                            key="병합_제안_df"
+                        )
+
+                        if st.button("[선택한 제안 일괄 병합]", type="primary"):
+                            적용_그룹 = [
+                                (rows, str(name).strip())
+                                for (rows, _), apply, name in zip(제안_그룹, 제안_edited["적용"], 제안_edited["병합 후 단위작업명"])
+                                if apply and str(name).strip()
+                            ]
+                            if 적용_그룹:
+                                st.session_state["checklist_df"] = normalize_checklist(
+                                    merge_unit_work_groups(st.session_state["checklist_df"], 적용_그룹)
+                                )
+                                for key in ["병합_제안", "병합_제안_df", "병합_선택_df"]:
+                                    st.session_state.pop(key, None)
+
+                                # 즉시 저장
+                                if st.session_state.get("session_id") and st.session_state.get("workplace"):
+                                    success, _ = save_session(st.session_state["session_id"], st.session_state.get("workplace"))
+                                    if success:
+                                        st.session_state["last_save_time"] = time.time()
+                                        st.session_state["last_successful_save"] = datetime.now()
+                                st.success(f"[병합 완료] {len(적용_그룹):,}개 그룹을 병합했습니다!")
+                                st.rerun()
+                            else:
+                                st.warning("적용할 제안을 선택해주세요.")
+                    else:
+                        st.info("비슷한 이름의 단위작업이 없습니다.")
+
+                st.markdown("##### [직접 선택하여 병합]")
                 # 선택 체크박스를 포함한 데이터프레임 표시
-                df_with_select = st.session_state["checklist_df"].copy()
+                df_with_select = checklist_to_labels(st.session_state["checklist_df"]).copy()
                 df_with_select.insert(0, "선택", False)
                 
                 # 선택 가능한 데이터 편집기
@@ -717,11 +3754,11 @@ with tabs[1]:
                         if 병합_이름:
                             # 병합 수행
                             merged_df = merge_unit_works(selected_indices, st.session_state["checklist_df"], 병합_이름)
-                            st.session_state["checklist_df"] = merged_df
+                            st.session_state["checklist_df"] = normalize_checklist(merged_df)
                             
                             # 즉시 저장
                             if st.session_state.get("session_id") and st.session_state.get("workplace"):
-                                success, _ = safe_save_to_excel(st.session_state["session_id"], st.session_state.get("workplace"))
+                                success, _ = save_session(st.session_state["session_id"], st.session_state.get("workplace"))
                                 if success:
                                     st.success("[병합 완료] 단위작업이 성공적으로 병합되고 저장되었습니다!")
                                     st.rerun()
@@ -732,49 +3769,7 @@ with tabs[1]:
     
     st.markdown("---")
     
-    # 기존 데이터 편집기
-    columns = [
-        "회사명", "소속", "반", "단위작업명"
-    ] + [f"{i}호" for i in range(1, 12)]
-    
-    # 세션 상태에 저장된 데이터가 있으면 사용, 없으면 빈 데이터
-    if "checklist_df" in st.session_state and validate_dataframe(st.session_state.get("checklist_df")):
-        if not st.session_state["checklist_df"].empty:
-            data = st.session_state["checklist_df"]
-        else:
-            data = pd.DataFrame(
-                columns=columns,
-                data=[["", "", "", ""] + ["X(미해당)"]*11 for _ in range(5)]
-            )
-    else:
-        data = pd.DataFrame(
-            columns=columns,
-            data=[["", "", "", ""] + ["X(미해당)"]*11 for _ in range(5)]
-        )
-
-    ho_options = [
-        "O(해당)",
-        "△(잠재위험)",
-        "X(미해당)"
-    ]
-    column_config = {
-        f"{i}호": st.column_config.SelectboxColumn(
-            f"{i}호", options=ho_options, required=True
-        ) for i in range(1, 12)
-    }
-    column_config["회사명"] = st.column_config.TextColumn("회사명")
-    column_config["소속"] = st.column_config.TextColumn("소속")
-    column_config["반"] = st.column_config.TextColumn("반")
-    column_config["단위작업명"] = st.column_config.TextColumn("단위작업명")
-
-    edited_df = st.data_editor(
-        data,
-        num_rows="dynamic",
-        use_container_width=True,
-        hide_index=True,
-        column_config=column_config
-    )
-    st.session_state["checklist_df"] = edited_df
+    checklist_editor_fragment()
     
     # 현재 등록된 계층 구조 표시
     col1, col2, col3 = st.columns(3)
@@ -804,7 +3799,7 @@ with tabs[1]:
                     st.write(f"- {반}")
 
 # 3. 유해요인조사표 탭
-with tabs[2]:
+if active_tab == TAB_NAMES[2]:
     st.title("유해요인조사표")
     
     # 계층적 선택
@@ -846,17 +3841,21 @@ with tabs[2]:
         
         # 해당 반의 단위작업명 가져오기
         단위작업명_목록 = get_단위작업명_목록(selected_회사_유해, selected_소속_유해, selected_반_유해)
+        경로_유해 = make_반경로(selected_회사_유해, selected_소속_유해, selected_반_유해)
         
         with st.expander(f"[{selected_반_유해} - 유해요인조사표]", expanded=True):
             st.markdown("#### 가. 조사개요")
             col1, col2 = st.columns(2)
+            st.session_state.setdefault(반_키("부서명", 경로_유해), selected_소속_유해)
+            st.session_state.setdefault(반_키("작업공정명", 경로_유해), selected_반_유해)
+            st.session_state.setdefault(반_키("작업명", 경로_유해), selected_반_유해)
             with col1:
-                조사일시 = st.text_input("조사일시", key=f"조사일시_{selected_반_유해}")
-                부서명 = st.text_input("부서명", value=selected_소속_유해, key=f"부서명_{selected_반_유해}")
+                조사일시 = st.text_input("조사일시", key=반_키("조사일시", 경로_유해))
+                부서명 = st.text_input("부서명", key=반_키("부서명", 경로_유해))
             with col2:
-                조사자 = st.text_input("조사자", key=f"조사자_{selected_반_유해}")
-                작업공정명 = st.text_input("작업공정명", value=selected_반_유해, key=f"작업공정명_{selected_반_유해}")
-            작업명_유해 = st.text_input("작업명(반)", value=selected_반_유해, key=f"작업명_{selected_반_유해}")
+                조사자 = st.text_input("조사자", key=반_키("조사자", 경로_유해))
+                작업공정명 = st.text_input("작업공정명", key=반_키("작업공정명", 경로_유해))
+            작업명_유해 = st.text_input("작업명(반)", key=반_키("작업명", 경로_유해))
             
             # 단위작업명 표시
             if 단위작업명_목록:
@@ -865,7 +3864,7 @@ with tabs[2]:
 
             st.markdown("#### 나. 작업장 상황조사")
 
-            def 상황조사행(항목명, 반):
+            def 상황조사행(항목명, 경로):
                 cols = st.columns([2, 5, 3])
                 with cols[0]:
                     st.markdown(f"<div style='text-align:center; font-weight:bold; padding-top:0.7em;'>{항목명}</div>", unsafe_allow_html=True)
@@ -873,40 +3872,28 @@ with tabs[2]:
                     상태 = st.radio(
                         label="",
                         options=["변화없음", "감소", "증가", "기타"],
-                        key=f"{항목명}_상태_{반}",
+                        key=반_키(f"{항목명}_상태", 경로),
                         horizontal=True,
                         label_visibility="collapsed"
                     )
                 with cols[2]:
                     if 상태 == "감소":
-                        st.text_input("감소 - 언제부터", key=f"{항목명}_감소_시작_{반}", placeholder="언제부터", label_visibility="collapsed")
+                        st.text_input("감소 - 언제부터", key=반_키(f"{항목명}_감소_시작", 경로), placeholder="언제부터", label_visibility="collapsed")
                     elif 상태 == "증가":
-                        st.text_input("증가 - 언제부터", key=f"{항목명}_증가_시작_{반}", placeholder="언제부터", label_visibility="collapsed")
+                        st.text_input("증가 - 언제부터", key=반_키(f"{항목명}_증가_시작", 경로), placeholder="언제부터", label_visibility="collapsed")
                     elif 상태 == "기타":
-                        st.text_input("기타 - 내용", key=f"{항목명}_기타_내용_{반}", placeholder="내용", label_visibility="collapsed")
+                        st.text_input("기타 - 내용", key=반_키(f"{항목명}_기타_내용", 경로), placeholder="내용", label_visibility="collapsed")
                     else:
                         st.markdown("&nbsp;", unsafe_allow_html=True)
 
-            for 항목 in ["작업설비", "작업량", "작업속도", "업무변화"]:
-                상황조사행(항목, selected_반_유해)
+            for 항목 in 상황조사_항목:
+                상황조사행(항목, 경로_유해)
                 st.markdown("<hr style='margin:0.5em 0;'>", unsafe_allow_html=True)
             
             st.markdown("---")
 
-# 작업부하와 작업빈도에서 숫자 추출하는 함수
-def extract_number(value):
-    if value and "(" in value and ")" in value:
-        return int(value.split("(")[1].split(")")[0])
-    return 0
-
-# 총점 계산 함수
-def calculate_total_score(row):
-    부하값 = extract_number(row["작업부하(A)"])
-    빈도값 = extract_number(row["작업빈도(B)"])
-    return 부하값 * 빈도값
-
 # 4. 작업조건조사 탭
-with tabs[3]:
+if active_tab == TAB_NAMES[3]:
     st.title("작업조건조사")
     
     # 계층적 선택
@@ -944,120 +3931,26 @@ with tabs[3]:
     
     if selected_회사_작업 and selected_소속_작업 and selected_반_작업:
         st.info(f"[선택] {selected_회사_작업} > {selected_소속_작업} > {selected_반_작업}")
+        경로_작업 = make_반경로(selected_회사_작업, selected_소속_작업, selected_반_작업)
+        기록_작업 = get_반기록(st.session_state, 경로_작업)
         
         # 선택된 반에 대한 1,2,3단계
         with st.container():
             # 1단계: 유해요인 기본조사
             st.subheader(f"1단계: 유해요인 기본조사 - [{selected_반_작업}]")
             col1, col2 = st.columns(2)
+            st.session_state.setdefault(반_키("1단계_작업공정", 경로_작업), selected_반_작업)
             with col1:
-                작업공정 = st.text_input("작업공정", value=selected_반_작업, key=f"1단계_작업공정_{selected_반_작업}")
+                작업공정 = st.text_input("작업공정", key=반_키("1단계_작업공정", 경로_작업))
             with col2:
-                작업내용 = st.text_input("작업내용", key=f"1단계_작업내용_{selected_반_작업}")
+                작업내용 = st.text_input("작업내용", key=반_키("1단계_작업내용", 경로_작업))
             
             st.markdown("---")
             
             # 2단계: 작업별 작업부하 및 작업빈도
             st.subheader(f"2단계: 작업별 작업부하 및 작업빈도 - [{selected_반_작업}]")
             
-            # 선택된 반에 해당하는 체크리스트 데이터 가져오기
-            checklist_data = []
-            if "checklist_df" in st.session_state and validate_dataframe(st.session_state.get("checklist_df")):
-                if not st.session_state["checklist_df"].empty:
-                    반_체크리스트 = st.session_state["checklist_df"][
-                        (st.session_state["checklist_df"]["회사명"] == selected_회사_작업) &
-                        (st.session_state["checklist_df"]["소속"] == selected_소속_작업) &
-                        (st.session_state["checklist_df"]["반"] == selected_반_작업)
-                    ]
-                    
-                    for idx, row in 반_체크리스트.iterrows():
-                        if row["단위작업명"]:
-                            부담작업호 = []
-                            for i in range(1, 12):
-                                if row[f"{i}호"] == "O(해당)":
-                                    부담작업호.append(f"{i}호")
-                                elif row[f"{i}호"] == "△(잠재위험)":
-                                    부담작업호.append(f"{i}호(잠재)")
-                            
-                            checklist_data.append({
-                                "단위작업명": row["단위작업명"],
-                                "부담작업(호)": ", ".join(부담작업호) if 부담작업호 else "미해당",
-                                "작업부하(A)": "",
-                                "작업빈도(B)": "",
-                                "총점": 0
-                            })
-            
-            # 데이터프레임 생성
-            if checklist_data:
-                data = pd.DataFrame(checklist_data)
-            else:
-                data = pd.DataFrame({
-                    "단위작업명": ["" for _ in range(3)],
-                    "부담작업(호)": ["" for _ in range(3)],
-                    "작업부하(A)": ["" for _ in range(3)],
-                    "작업빈도(B)": ["" for _ in range(3)],
-                    "총점": [0 for _ in range(3)],
-                })
-
-            부하옵션 = [
-                "",
-                "매우쉬움(1)", 
-                "쉬움(2)", 
-                "약간 힘듦(3)", 
-                "힘듦(4)", 
-                "매우 힘듦(5)"
-            ]
-            빈도옵션 = [
-                "",
-                "3개월마다(1)", 
-                "가끔(2)", 
-                "자주(3)", 
-                "계속(4)", 
-                "초과근무(5)"
-            ]
-
-            column_config = {
-                "작업부하(A)": st.column_config.SelectboxColumn("작업부하(A)", options=부하옵션, required=False),
-                "작업빈도(B)": st.column_config.SelectboxColumn("작업빈도(B)", options=빈도옵션, required=False),
-                "단위작업명": st.column_config.TextColumn("단위작업명"),
-                "부담작업(호)": st.column_config.TextColumn("부담작업(호)"),
-                "총점": st.column_config.TextColumn("총점(자동계산)", disabled=True),
-            }
-
-            # 데이터 편집
-            edited_df = st.data_editor(
-                data,
-                num_rows="dynamic",
-                use_container_width=True,
-                hide_index=True,
-                column_config=column_config,
-                key=f"작업조건_data_editor_{selected_반_작업}"
-            )
-            
-            # 편집된 데이터를 세션 상태에 저장
-            st.session_state[f"작업조건_data_{selected_반_작업}"] = edited_df
-            
-            # 총점 자동 계산 후 다시 표시
-            if not edited_df.empty:
-                display_df = edited_df.copy()
-                for idx in range(len(display_df)):
-                    display_df.at[idx, "총점"] = calculate_total_score(display_df.iloc[idx])
-                
-                st.markdown("##### 계산 결과")
-                st.dataframe(
-                    display_df,
-                    use_container_width=True,
-                    hide_index=True,
-                    column_config={
-                        "단위작업명": st.column_config.TextColumn("단위작업명"),
-                        "부담작업(호)": st.column_config.TextColumn("부담작업(호)"),
-                        "작업부하(A)": st.column_config.TextColumn("작업부하(A)"),
-                        "작업빈도(B)": st.column_config.TextColumn("작업빈도(B)"),
-                        "총점": st.column_config.NumberColumn("총점(자동계산)", format="%d"),
-                    }
-                )
-                
-                st.info("[도움말] 총점은 작업부하(A) × 작업빈도(B)로 자동 계산됩니다.")
+            작업조건_editor_fragment(경로_작업)
             
             # 3단계: 유해요인평가
             st.markdown("---")
@@ -1065,16 +3958,20 @@ with tabs[3]:
             
             # 작업명과 근로자수 입력
             col1, col2 = st.columns(2)
+            st.session_state.setdefault(반_키("3단계_작업명", 경로_작업), selected_반_작업)
             with col1:
-                평가_작업명 = st.text_input("작업명(반)", value=selected_반_작업, key=f"3단계_작업명_{selected_반_작업}")
+                평가_작업명 = st.text_input("작업명(반)", key=반_키("3단계_작업명", 경로_작업))
             with col2:
-                평가_근로자수 = st.text_input("근로자수", key=f"3단계_근로자수_{selected_반_작업}")
+                평가_근로자수 = st.text_input("근로자수", key=반_키("3단계_근로자수", 경로_작업))
             
             # 사진 업로드 및 설명 입력
             st.markdown("#### 작업 사진 및 설명")
             
             # 사진 개수 선택
-            num_photos = st.number_input("사진 개수", min_value=1, max_value=10, value=3, key=f"사진개수_{selected_반_작업}")
+            연결된_사진 = [i for i, ref in 기록_작업.사진.items() if ref]
+            사진개수_key = 반_키("사진개수", 경로_작업)
+            st.session_state.setdefault(사진개수_key, max([3] + 연결된_사진))
+            num_photos = st.number_input("사진 개수", min_value=1, max_value=PHOTO_MAX_PER_반, key=사진개수_key)
             
             # 각 사진별로 업로드와 설명 입력
             for i in range(num_photos):
@@ -1085,16 +3982,25 @@ with tabs[3]:
                     uploaded_file = st.file_uploader(
                         f"사진 {i+1} 업로드",
                         type=['png', 'jpg', 'jpeg'],
-                        key=f"사진_{i+1}_업로드_{selected_반_작업}"
+                        key=반_키(f"사진_{i+1}_업로드", 경로_작업)
                     )
+                    사진_key = 반_키(f"사진_{i+1}_파일", 경로_작업)
+                    forget_photo_uploads(사진_key, [uploaded_file])
                     if uploaded_file:
-                        st.image(uploaded_file, caption=f"사진 {i+1}", use_column_width=True)
+                        ref = store_uploaded_photo(uploaded_file, 사진_key)
+                        if ref:
+                            기록_작업.사진[i + 1] = ref
+                    if 기록_작업.사진.get(i + 1):
+                        show_photo(기록_작업.사진[i + 1], f"사진 {i+1}")
+                        if st.button("사진 삭제", key=f"{사진_key}_삭제"):
+                            기록_작업.사진.pop(i + 1, None)
+                            st.rerun()
                 
                 with col2:
                     photo_description = st.text_area(
                         f"사진 {i+1} 설명",
                         height=150,
-                        key=f"사진_{i+1}_설명_{selected_반_작업}",
+                        key=반_키(f"사진_{i+1}_설명", 경로_작업),
                         placeholder="이 사진에 대한 설명을 입력하세요..."
                     )
                 
@@ -1108,7 +4014,8 @@ with tabs[3]:
             부담작업_정보 = []
             부담작업_힌트 = {}  # 단위작업명별 부담작업 정보 저장
             
-            if 'display_df' in locals() and not display_df.empty:
+            display_df = 기록_작업.작업조건
+            if validate_dataframe(display_df) and not display_df.empty:
                 for idx, row in display_df.iterrows():
                     if row["단위작업명"] and row["부담작업(호)"] and row["부담작업(호)"] != "미해당":
                         부담작업_정보.append({
@@ -1118,12 +4025,11 @@ with tabs[3]:
                         부담작업_힌트[row["단위작업명"]] = row["부담작업(호)"]
             
             # 원인분석 항목 초기화
-            원인분석_key = f"원인분석_항목_{selected_반_작업}"
-            if 원인분석_key not in st.session_state:
-                st.session_state[원인분석_key] = []
+            if 기록_작업.원인분석 is None:
+                기록_작업.원인분석 = []
                 # 부담작업 정보를 기반으로 초기 항목 생성
                 for info in 부담작업_정보:
-                    st.session_state[원인분석_key].append({
+                    기록_작업.원인분석.append({
                         "단위작업명": info["단위작업명"],
                         "부담작업호": info["부담작업호"],
                         "유형": "",
@@ -1134,8 +4040,8 @@ with tabs[3]:
             # 추가/삭제 버튼
             col1, col2, col3 = st.columns([6, 1, 1])
             with col2:
-                if st.button("[추가]", key=f"원인분석_추가_{selected_반_작업}", use_container_width=True):
-                    st.session_state[원인분석_key].append({
+                if st.button("[추가]", key=반_키("원인분석_추가", 경로_작업), use_container_width=True):
+                    기록_작업.원인분석.append({
                         "단위작업명": "",
                         "부담작업호": "",
                         "유형": "",
@@ -1144,9 +4050,9 @@ with tabs[3]:
                     })
                     st.rerun()
             with col3:
-                if st.button("[삭제]", key=f"원인분석_삭제_{selected_반_작업}", use_container_width=True):
-                    if len(st.session_state[원인분석_key]) > 0:
-                        st.session_state[원인분석_key].pop()
+                if st.button("[삭제]", key=반_키("원인분석_삭제", 경로_작업), use_container_width=True):
+                    if len(기록_작업.원인분석) > 0:
+                        기록_작업.원인분석.pop()
                         st.rerun()
             
             # 유형별 관련 부담작업 매핑
@@ -1158,7 +4064,7 @@ with tabs[3]:
             }
             
             # 각 유해요인 항목 처리
-            hazard_entries_to_process = st.session_state[원인분석_key]
+            hazard_entries_to_process = 기록_작업.원인분석
             
             for k, hazard_entry in enumerate(hazard_entries_to_process):
                 st.markdown(f"**유해요인 원인분석 항목 {k+1}**")
@@ -1170,7 +4076,7 @@ with tabs[3]:
                     hazard_entry["단위작업명"] = st.text_input(
                         "단위작업명", 
                         value=hazard_entry.get("단위작업명", ""), 
-                        key=f"원인분석_단위작업명_{k}_{selected_반_작업}"
+                        key=반_키(f"원인분석_단위작업명_{k}", 경로_작업)
                     )
                 
                 with col2:
@@ -1196,7 +4102,7 @@ with tabs[3]:
                     hazard_entry["비고"] = st.text_input(
                         "비고", 
                         value=hazard_entry.get("비고", ""), 
-                        key=f"원인분석_비고_{k}_{selected_반_작업}"
+                        key=반_키(f"원인분석_비고_{k}", 경로_작업)
                     )
                 
                 # 유해요인 유형 선택
@@ -1207,7 +4113,7 @@ with tabs[3]:
                     f"[{k+1}] 유해요인 유형 선택", 
                     hazard_type_options, 
                     index=selected_hazard_type_index, 
-                    key=f"hazard_type_{k}_{selected_반_작업}",
+                    key=반_키(f"hazard_type_{k}", 경로_작업),
                     help="선택한 단위작업의 부담작업 유형에 맞는 항목을 선택하세요"
                 )
 
@@ -1217,7 +4123,7 @@ with tabs[3]:
                 st.markdown("---")
 
 # 5. 정밀조사 탭
-with tabs[4]:
+if active_tab == TAB_NAMES[4]:
     st.title("정밀조사")
     
     # 세션 상태 초기화
@@ -1260,47 +4166,28 @@ with tabs[4]:
                     accept_multiple_files=True,
                     key=f"정밀_사진_{조사명}"
                 )
-                if 정밀_사진:
+                사진목록_key = f"정밀_사진_목록_{조사명}"
+                forget_photo_uploads(사진목록_key, 정밀_사진 or [])
+                for photo in 정밀_사진 or []:
+                    link_uploaded_photo(photo, 사진목록_key, multiple=True)
+                if st.session_state.get(사진목록_key):
                     cols = st.columns(3)
-                    for photo_idx, photo in enumerate(정밀_사진):
+                    for photo_idx, ref in enumerate(list(st.session_state[사진목록_key])):
                         with cols[photo_idx % 3]:
-                            st.image(photo, caption=f"사진 {photo_idx+1}", use_column_width=True)
+                            show_photo(ref, f"사진 {photo_idx+1}")
+                            if st.button("사진 삭제", key=f"{사진목록_key}_{photo_idx}_삭제"):
+                                st.session_state[사진목록_key] = [r for r in st.session_state[사진목록_key] if r != ref]
+                                st.rerun()
                 
                 st.markdown("---")
                 
                 # 작업별로 관련된 유해요인에 대한 원인분석
                 st.markdown("#### ■ 작업별로 관련된 유해요인에 대한 원인분석")
                 
-                정밀_원인분석_data = []
-                for i in range(7):
-                    정밀_원인분석_data.append({
-                        "작업분석 및 평가도구": "",
-                        "분석결과": "",
-                        "만점": ""
-                    })
-                
-                정밀_원인분석_df = pd.DataFrame(정밀_원인분석_data)
-                
-                정밀_원인분석_config = {
-                    "작업분석 및 평가도구": st.column_config.TextColumn("작업분석 및 평가도구", width=350),
-                    "분석결과": st.column_config.TextColumn("분석결과", width=250),
-                    "만점": st.column_config.TextColumn("만점", width=150)
-                }
-                
-                정밀_원인분석_edited = st.data_editor(
-                    정밀_원인분석_df,
-                    use_container_width=True,
-                    hide_index=True,
-                    column_config=정밀_원인분석_config,
-                    num_rows="dynamic",
-                    key=f"정밀_원인분석_{조사명}"
-                )
-                
-                # 데이터 세션 상태에 저장
-                st.session_state[f"정밀_원인분석_data_{조사명}"] = 정밀_원인분석_edited
+                정밀_원인분석_fragment(조사명)
 
 # 6. 증상조사 분석 탭
-with tabs[5]:
+if active_tab == TAB_NAMES[5]:
     st.title("근골격계 자기증상 분석")
     
     # 반 목록 가져오기 (모든 반)
@@ -1309,105 +4196,54 @@ with tabs[5]:
         if not st.session_state["checklist_df"].empty:
             전체_반_목록 = st.session_state["checklist_df"]["반"].dropna().unique().tolist()
     
+    # 설문 원자료 가져오기 (응답자 1명당 1행 → 4개 표 자동 집계)
+    with st.expander("[설문 원자료 가져오기]"):
+        st.markdown("""
+        **원자료 형식 (CSV 또는 Excel, 응답자 1명당 1행)**
+        - 반, 나이, 성별(남/여), 근속년수, 현재작업기간(년), 이전작업기간(년), 육체적부담
+        - 부위별 `{부위}_기간`, `{부위}_강도`, `{부위}_빈도` (부위: 목, 어깨, 팔/팔꿈치, 손/손목/손가락, 허리, 다리/발)
+        - 척도 응답은 보기 문구 또는 보기 번호(1부터)로 입력
+        """)
+        예시 = pd.DataFrame([["반 이름", 35, "남", 5, 2, 1, "약간 힘듦"] + ["1주일~1달 미만", "중간 통증", "1달에 1번"] * len(증상_부위)],
+                          columns=증상조사_원자료_컬럼)
+        st.download_button(
+            label="[원자료 양식 다운로드]",
+            data=예시.to_csv(index=False).encode("utf-8-sig"),
+            file_name="증상조사_원자료_양식.csv",
+            mime="text/csv"
+        )
+        
+        설문_파일 = st.file_uploader("설문 원자료 파일 선택", type=['csv', 'xlsx', 'xls'], key="증상조사_원자료")
+        if 설문_파일 is not None and st.button("[집계 반영]", use_container_width=True):
+            try:
+                설문 = read_symptom_survey(설문_파일)
+                # 저장값을 집계 결과로 바꾸면 아래 표들이 새 원본으로 다시 구성됨
+                for 표, 집계표 in aggregate_symptom_survey(설문, 전체_반_목록).items():
+                    st.session_state[f"{표}_data_저장"] = 집계표
+                st.success(f"[집계 완료] 응답자 {len(설문):,}명, {설문['반'].nunique()}개 반의 자료를 반영했습니다.")
+            except Exception as e:
+                st.error(f"설문 원자료 처리 중 오류가 발생했습니다: {str(e)}")
+    
     # 1. 기초현황
     st.subheader("1. 기초현황")
     
-    # 반별 데이터 자동 생성
-    기초현황_columns = ["반", "응답자(명)", "나이", "근속년수", "남자(명)", "여자(명)", "합계"]
-    
-    if 전체_반_목록:
-        # 반 목록을 기반으로 데이터 생성
-        기초현황_data_rows = []
-        for 반 in 전체_반_목록:
-            기초현황_data_rows.append([반, "", "평균(세)", "평균(년)", "", "", ""])
-        기초현황_data = pd.DataFrame(기초현황_data_rows, columns=기초현황_columns)
-    else:
-        기초현황_data = pd.DataFrame(
-            columns=기초현황_columns,
-            data=[["", "", "평균(세)", "평균(년)", "", "", ""] for _ in range(3)]
-        )
-    
-    기초현황_edited = st.data_editor(
-        기초현황_data,
-        hide_index=True,
-        use_container_width=True,
-        num_rows="dynamic",
-        key="기초현황_data"
-    )
+    symptom_editor_fragment("기초현황", "기초현황_data", 전체_반_목록, num_rows="dynamic")
     
     # 2. 작업기간
     st.subheader("2. 작업기간")
     st.markdown("##### 현재 작업기간 / 이전 작업기간")
     
-    작업기간_columns = ["반", "<1년", "<3년", "<5년", "≥5년", "무응답", "합계", "이전<1년", "이전<3년", "이전<5년", "이전≥5년", "이전무응답", "이전합계"]
-    
-    if 전체_반_목록:
-        # 반 목록을 기반으로 데이터 생성
-        작업기간_data_rows = []
-        for 반 in 전체_반_목록:
-            작업기간_data_rows.append([반] + [""] * 12)
-        작업기간_data = pd.DataFrame(작업기간_data_rows, columns=작업기간_columns)
-    else:
-        작업기간_data = pd.DataFrame(
-            columns=작업기간_columns,
-            data=[[""] * 13 for _ in range(3)]
-        )
-    
-    작업기간_edited = st.data_editor(
-        작업기간_data,
-        hide_index=True,
-        use_container_width=True,
-        num_rows="dynamic",
-        key="작업기간_data"
-    )
+    symptom_editor_fragment("작업기간", "작업기간_data", 전체_반_목록, num_rows="dynamic")
     
     # 3. 육체적 부담정도
     st.subheader("3. 육체적 부담정도")
-    육체적부담_columns = ["반", "전혀 힘들지 않음", "견딜만 함", "약간 힘듦", "힘듦", "매우 힘듦", "합계"]
-    
-    if 전체_반_목록:
-        # 반 목록을 기반으로 데이터 생성
-        육체적부담_data_rows = []
-        for 반 in 전체_반_목록:
-            육체적부담_data_rows.append([반] + [""] * 6)
-        육체적부담_data = pd.DataFrame(육체적부담_data_rows, columns=육체적부담_columns)
-    else:
-        육체적부담_data = pd.DataFrame(
-            columns=육체적부담_columns,
-            data=[["", "", "", "", "", "", ""] for _ in range(3)]
-        )
-    
-    육체적부담_edited = st.data_editor(
-        육체적부담_data,
-        hide_index=True,
-        use_container_width=True,
-        num_rows="dynamic",
-        key="육체적부담_data"
-    )
     
-    # 세션 상태에 저장
-    st.session_state["기초현황_data_저장"] = 기초현황_edited
-    st.session_state["작업기간_data_저장"] = 작업기간_edited
-    st.session_state["육체적부담_data_저장"] = 육체적부담_edited
+    symptom_editor_fragment("육체적부담", "육체적부담_data", 전체_반_목록, num_rows="dynamic")
     
     # 4. 근골격계 통증 호소자 분포
     st.subheader("4. 근골격계 통증 호소자 분포")
     
-    if 전체_반_목록:
-        # 컬럼 정의
-        통증호소자_columns = ["반", "구분", "목", "어깨", "팔/팔꿈치", "손/손목/손가락", "허리", "다리/발", "전체"]
-        
-        # 데이터 생성
-        통증호소자_data = []
-        
-        for 반 in 전체_반_목록:
-            # 각 반에 대해 정상, 관리대상자, 통증호소자 3개 행 추가
-            통증호소자_data.append([반, "정상", "", "", "", "", "", "", ""])
-            통증호소자_data.append(["", "관리대상자", "", "", "", "", "", "", ""])
-            통증호소자_data.append(["", "통증호소자", "", "", "", "", "", "", ""])
-        
-        통증호소자_df = pd.DataFrame(통증호소자_data, columns=통증호소자_columns)
-        
+    if 전체_반_목록 or validate_dataframe(st.session_state.get("통증호소자_data_저장")):
         # 컬럼 설정
         column_config = {
             "반": st.column_config.TextColumn("반", disabled=True, width=150),
@@ -1421,27 +4257,17 @@ with tabs[5]:
             "전체": st.column_config.TextColumn("전체", width=80)
         }
         
-        통증호소자_edited = st.data_editor(
-            통증호소자_df,
-            hide_index=True,
-            use_container_width=True,
-            column_config=column_config,
-            key="통증호소자_data_editor",
-            disabled=["반", "구분"]
-        )
-        
-        # 세션 상태에 저장
-        st.session_state["통증호소자_data_저장"] = 통증호소자_edited
+        symptom_editor_fragment("통증호소자", "통증호소자_data_editor", 전체_반_목록,
+                                column_config=column_config, disabled=["반", "구분"])
     else:
         st.info("체크리스트에 데이터를 입력하면 자동으로 표가 생성됩니다.")
         
         # 빈 데이터프레임 표시
-        통증호소자_columns = ["반", "구분", "목", "어깨", "팔/팔꿈치", "손/손목/손가락", "허리", "다리/발", "전체"]
-        빈_df = pd.DataFrame(columns=통증호소자_columns)
+        빈_df = pd.DataFrame(columns=증상조사_표_컬럼["통증호소자"])
         st.dataframe(빈_df, use_container_width=True)
 
 # 7. 작업환경개선계획서 탭
-with tabs[6]:
+if active_tab == TAB_NAMES[6]:
     st.title("작업환경개선계획서")
     
     # 컬럼 정의
@@ -1463,34 +4289,17 @@ with tabs[6]:
         # 체크리스트 데이터 기반으로 초기 데이터 생성
         if "checklist_df" in st.session_state and validate_dataframe(st.session_state.get("checklist_df")):
             if not st.session_state["checklist_df"].empty:
-                개선계획_data_rows = []
-                for _, row in st.session_state["checklist_df"].iterrows():
-                    if row["회사명"] and row["소속"] and row["반"] and row["단위작업명"]:
-                        # 부담작업이 있는 경우만 추가
-                        부담작업_있음 = False
-                        for i in range(1, 12):
-                            if row[f"{i}호"] in ["O(해당)", "△(잠재위험)"]:
-                                부담작업_있음 = True
-                                break
-                        
-                        if 부담작업_있음:
-                            개선계획_data_rows.append([
-                                row["회사명"],
-                                row["소속"],
-                                row["반"],
-                                row["단위작업명"],
-                                "",  # 문제점
-                                "",  # 근로자의견
-                                "",  # 개선방안
-                                "",  # 추진일정
-                                "",  # 개선비용
-                                ""   # 개선우선순위
-                            ])
+                checklist = st.session_state["checklist_df"]
                 
-                # 데이터가 있으면 사용, 없으면 빈 행 5개
-                if 개선계획_data_rows:
-                    개선계획_data = pd.DataFrame(개선계획_data_rows, columns=개선계획_columns)
-                else:
+                # 계층 정보가 모두 있고 부담작업(O/△)이 있는 단위작업만 추가
+                유효 = checklist[["회사명", "소속", "반", "단위작업명"]].astype(bool).all(axis=1).to_numpy()
+                대상 = checklist[유효 & has_부담작업(encode_ho_matrix(checklist))]
+                개선계획_data = pd.DataFrame("", index=range(len(대상)), columns=개선계획_columns)
+                for col in ["회사명", "소속", "반", "단위작업명"]:
+                    개선계획_data[col] = 대상[col].to_numpy()
+                
+                # 데이터가 없으면 빈 행 5개
+                if 개선계획_data.empty:
                     개선계획_data = pd.DataFrame(
                         columns=개선계획_columns,
                         data=[["", "", "", "", "", "", "", "", "", ""] for _ in range(5)]
@@ -1525,17 +4334,7 @@ with tabs[6]:
     }
     
     # 데이터 편집기
-    개선계획_edited = st.data_editor(
-        st.session_state["개선계획_data_저장"],
-        hide_index=True,
-        use_container_width=True,
-        num_rows="dynamic",
-        column_config=개선계획_config,
-        key="개선계획_data"
-    )
-    
-    # 세션 상태에 저장
-    st.session_state["개선계획_data_저장"] = 개선계획_edited
+    개선계획_editor_fragment(개선계획_config)
     
     # 도움말
     with st.expander("[작성 도움말]"):
@@ -1563,6 +4362,52 @@ with tabs[6]:
                 st.session_state["개선계획_data_저장"] = st.session_state["개선계획_data_저장"].iloc[:-1]
                 st.rerun()
     
+    # 사업장 전체 위험도 순위
+    st.markdown("---")
+    with st.expander("[사업장 전체 위험도 순위]"):
+        st.info("모든 반의 작업조건조사 총점(작업부하 × 작업빈도)과 부담작업 수를 한 번에 평가하여 개선우선순위를 정합니다.")
+        
+        평가_대상_옵션 = ["현재 세션"] + [f"{s['workplace']} - {s['saved_at']}" for s in saved_sessions]
+        평가_대상 = st.selectbox("평가 대상", 평가_대상_옵션, key="위험도_평가대상")
+        
+        try:
+            if 평가_대상 == "현재 세션":
+                평가_작업조건 = collect_작업조건_tables(st.session_state)
+                평가_체크리스트 = st.session_state.get("checklist_df")
+            else:
+                session_info = saved_sessions[평가_대상_옵션.index(평가_대상) - 1]
+                평가_작업조건, 평가_체크리스트 = load_saved_risk_inputs(
+                    session_info["backend"], session_info["session_id"], session_info["filename"], session_info["saved_at"]
+                )
+            
+            위험도_순위 = build_risk_ranking(평가_작업조건, 평가_체크리스트)
+        except Exception as e:
+            위험도_순위 = None
+            st.error(f"위험도 평가 중 오류 발생: {str(e)}")
+        
+        if 위험도_순위 is not None and 위험도_순위.empty:
+            st.info("작업조건조사에서 작업부하/작업빈도를 입력하면 순위가 표시됩니다.")
+        elif 위험도_순위 is not None:
+            st.markdown(f"##### 단위작업 순위 ({len(위험도_순위)}개)")
+            st.dataframe(위험도_순위, use_container_width=True, hide_index=True)
+            
+            요약_단위 = st.radio("요약 단위", ["회사", "소속", "반"], horizontal=True, key="위험도_요약단위")
+            요약_컬럼 = {"회사": ["회사명"], "소속": ["회사명", "소속"], "반": ["회사명", "소속", "반"]}[요약_단위]
+            st.dataframe(summarize_risk_ranking(위험도_순위, 요약_컬럼), use_container_width=True, hide_index=True)
+            
+            if 평가_대상 == "현재 세션" and st.button("[개선우선순위 반영]", key="개선우선순위_반영"):
+                # 개선계획서의 (회사명, 소속, 반, 단위작업명)이 같은 행에 순위 기록
+                개선계획 = st.session_state["개선계획_data_저장"].copy()
+                순위_키 = 위험도_순위.drop_duplicates(subset=["회사명", "소속", "반", "단위작업명"])
+                순위_키 = 순위_키.set_index(["회사명", "소속", "반", "단위작업명"])["순위"]
+                행_키 = pd.MultiIndex.from_frame(개선계획[["회사명", "소속", "반", "단위작업명"]].astype(object))
+                순위값 = 순위_키.reindex(행_키).to_numpy()
+                반영 = pd.notna(순위값)
+                개선계획.loc[반영, "개선우선순위"] = [f"{int(v)}순위" for v in 순위값[반영]]
+                st.session_state["개선계획_data_저장"] = 개선계획
+                st.success(f"[반영 완료] {int(반영.sum())}개 단위작업에 개선우선순위를 기록했습니다.")
+                st.rerun()
+    
     # 전체 보고서 다운로드
     st.markdown("---")
     st.subheader("[전체 보고서 다운로드]")
@@ -1573,88 +4418,26 @@ with tabs[6]:
         # 엑셀 다운로드 버튼
         if st.button("[전체 Excel 보고서 다운로드]", use_container_width=True):
             try:
-                output = BytesIO()
-                
-                # 반 목록 다시 가져오기
-                반_목록_다운로드 = get_반_목록()
-                
-                with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                    # 사업장 개요 정보
-                    overview_data = {
-                        "항목": ["사업장명", "소재지", "업종", "예비조사일", "본조사일", "수행기관", "성명"],
-                        "내용": [
-                            st.session_state.get("사업장명", ""),
-                            st.session_state.get("소재지", ""),
-                            st.session_state.get("업종", ""),
-                            str(st.session_state.get("예비조사", "")),
-                            str(st.session_state.get("본조사", "")),
-                            st.session_state.get("수행기관", ""),
-                            st.session_state.get("성명", "")
-                        ]
-                    }
-                    overview_df = pd.DataFrame(overview_data)
-                    overview_df.to_excel(writer, sheet_name='사업장개요', index=False)
-                    
-                    # 체크리스트
-                    if "checklist_df" in st.session_state and validate_dataframe(st.session_state.get("checklist_df")):
-                        if not st.session_state["checklist_df"].empty:
-                            st.session_state["checklist_df"].to_excel(writer, sheet_name='체크리스트', index=False)
-                    
-                    # 유해요인조사표 데이터 저장 (반별로)
-                    for 반 in 반_목록_다운로드:
-                        조사표_data = []
-                        
-                        # 조사개요
-                        조사표_data.append(["조사개요"])
-                        조사표_data.append(["조사일시", st.session_state.get(f"조사일시_{반}", "")])
-                        조사표_data.append(["부서명", st.session_state.get(f"부서명_{반}", "")])
-                        조사표_data.append(["조사자", st.session_state.get(f"조사자_{반}", "")])
-                        조사표_data.append(["작업공정명", st.session_state.get(f"작업공정명_{반}", "")])
-                        조사표_data.append(["작업명(반)", st.session_state.get(f"작업명_{반}", "")])
-                        조사표_data.append([])  # 빈 행
-                        
-                        # 작업장 상황조사
-                        조사표_data.append(["작업장 상황조사"])
-                        조사표_data.append(["항목", "상태", "세부사항"])
-                        
-                        for 항목 in ["작업설비", "작업량", "작업속도", "업무변화"]:
-                            상태 = st.session_state.get(f"{항목}_상태_{반}", "변화없음")
-                            세부사항 = ""
-                            if 상태 == "감소":
-                                세부사항 = st.session_state.get(f"{항목}_감소_시작_{반}", "")
-                            elif 상태 == "증가":
-                                세부사항 = st.session_state.get(f"{항목}_증가_시작_{반}", "")
-                            elif 상태 == "기타":
-                                세부사항 = st.session_state.get(f"{항목}_기타_내용_{반}", "")
-                            
-                            조사표_data.append([항목, 상태, 세부사항])
-                        
-                        if 조사표_data:
-                            조사표_df = pd.DataFrame(조사표_data)
-                            safe_반 = str(반).replace('/', '_').replace('\\', '_')[:31]
-                            sheet_name = f'유해요인_{safe_반}'
-                            조사표_df.to_excel(writer, sheet_name=sheet_name, index=False, header=False)
-                    
-                    # 나머지 데이터도 동일하게 처리...
-                    
-                output.seek(0)
-                st.download_button(
-                    label="[Excel 다운로드]",
-                    data=output,
-                    file_name=f"근골격계_유해요인조사_{st.session_state.get('workplace', '')}_{datetime.now().strftime('%Y%m%d')}.xlsx",
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                )
-                
-                st.success("[다운로드 준비 완료] Excel 보고서가 생성되었습니다!")
-                
+                job = submit_report_job("xlsx", st.session_state.get("session_id"), st.session_state)
+                report_jobs = dict(st.session_state.get("report_jobs", {}))
+                report_jobs["xlsx"] = job["path"]
+                st.session_state["report_jobs"] = report_jobs
             except Exception as e:
                 st.error(f"Excel 파일 생성 중 오류가 발생했습니다: {str(e)}")
                 st.info("데이터를 입력한 후 다시 시도해주세요.")
+        show_report_job("xlsx")
     
     with col2:
-        # PDF 보고서 생성 버튼 (기존 코드와 동일)
+        # PDF 보고서 생성 버튼
         if PDF_AVAILABLE:
             if st.button("[PDF 보고서 생성]", use_container_width=True):
-                st.info("PDF 생성 기능은 준비 중입니다.")
+                try:
+                    job = submit_report_job("pdf", st.session_state.get("session_id"), st.session_state)
+                    report_jobs = dict(st.session_state.get("report_jobs", {}))
+                    report_jobs["pdf"] = job["path"]
+                    st.session_state["report_jobs"] = report_jobs
+                except Exception as e:
+                    st.error(f"PDF 파일 생성 중 오류가 발생했습니다: {str(e)}")
+            show_report_job("pdf")
         else:
             st.info("PDF 생성 기능을 사용하려면 reportlab 라이브러리를 설치하세요: pip install reportlab")